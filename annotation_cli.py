@@ -0,0 +1,239 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Check and summarize a dataset without opening the annotation interface.
+
+    python -m annotation_cli validate Datasets/dataset.json -c categories.json
+    python -m annotation_cli stats Datasets/dataset.json -c categories.json
+    python -m annotation_cli export Datasets/dataset.json -c categories.json -o coco.json.gz --gzip
+
+Frames and per-frame annotations are located the same way as in the
+interface: relative to the folder containing the dataset file directory,
+under `Annotations/<category_set>/<video>/<frame>.json`. Every video is
+processed by its own worker of a process pool.
+"""
+import argparse
+import json
+import os
+import sys
+
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from libs.annotation_store import ANNOTATION_STORES, create_annotation_store
+from libs.coco_export import export_coco
+from libs.dataset_paths import annotation_directory, annotation_path, dataset_root_path
+from libs.frame_source import frame_exists, frame_path
+from libs.json_stream import iter_json_events
+
+
+def load_categories(file_name):
+    with open(file_name) as f:
+        data = json.load(f)
+    if 'category' not in data:
+        raise ValueError('Invalid category file %s.' % file_name)
+    return data
+
+
+def load_dataset(file_name):
+    """Return the dataset keys other than `images`, and the images grouped by video id."""
+    data = {}
+    videos = OrderedDict()
+    for event, key, value in iter_json_events(file_name, ('images',)):
+        if event == 'key':
+            data[key] = value
+        elif event == 'item':
+            videos.setdefault(value.get('video_id'), []).append(value)
+    return data, videos
+
+
+class VideoTask(object):
+    """Everything a worker needs to process the frames of one video."""
+
+    def __init__(self, root_directory_path, category_set_name, video_name, images, store_name,
+                 category_ids, second_category_ids=None, third_category_ids=None, check_frames=True):
+        self.root_directory_path = root_directory_path
+        self.category_set_name = category_set_name
+        self.video_name = video_name
+        self.images = images
+        self.store_name = store_name
+        self.category_ids = category_ids
+        self.second_category_ids = second_category_ids
+        self.third_category_ids = third_category_ids
+        self.check_frames = check_frames
+
+
+def process_video(task):
+    """Validate and summarize the frames of one video.
+
+    Runs in a worker process, so it only returns plain data: missing frame
+    paths, dangling category ids, box counts per category and per-track
+    spans.
+    """
+    result = {'video': task.video_name,
+              'frames': len(task.images),
+              'annotated_frames': 0,
+              'missing_frames': [],
+              'dangling': [],
+              'categories': Counter(),
+              'tracks': {}}
+    store = create_annotation_store(task.store_name)
+    directory = annotation_directory(task.root_directory_path, task.category_set_name, task.video_name)
+    try:
+        for image in task.images:
+            path = frame_path(task.root_directory_path, image)
+            if task.check_frames and not frame_exists(path):
+                result['missing_frames'].append(path)
+            frame_annotation_path = annotation_path(directory, path)
+            if not store.exists(frame_annotation_path):
+                continue
+            annotations = store.load(frame_annotation_path)
+            if isinstance(annotations, dict):
+                annotations = list(annotations.values())
+            result['annotated_frames'] += 1
+            for annotation in annotations:
+                for key, ids in (('category_id', task.category_ids),
+                                 ('second_category_id', task.second_category_ids),
+                                 ('third_category_id', task.third_category_ids)):
+                    value = annotation.get(key)
+                    if ids is not None and value is not None and value not in ids:
+                        result['dangling'].append((frame_annotation_path, key, value))
+                result['categories'][annotation.get('category_id')] += 1
+                track_id = annotation.get('track_id', annotation.get('video_ins_id'))
+                span = result['tracks'].get(track_id)
+                if span is None:
+                    result['tracks'][track_id] = [1, image['id'], image['id'], annotation.get('category_id')]
+                else:
+                    span[0] += 1
+                    span[1] = min(span[1], image['id'])
+                    span[2] = max(span[2], image['id'])
+    finally:
+        store.close()
+    return result
+
+
+def run_tasks(tasks, workers):
+    """Process the tasks in a process pool, returning the results in task order."""
+    results = [None] * len(tasks)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(process_video, task): i for i, task in enumerate(tasks)}
+        for done, future in enumerate(as_completed(futures), 1):
+            results[futures[future]] = future.result()
+            sys.stderr.write('\r%d/%d videos' % (done, len(tasks)))
+            sys.stderr.flush()
+    if tasks:
+        sys.stderr.write('\n')
+    return results
+
+
+def make_tasks(args):
+    categories = load_categories(args.categories)
+    second_categories = load_categories(args.second_categories) if args.second_categories else None
+    third_categories = load_categories(args.third_categories) if args.third_categories else None
+
+    data, images_by_video = load_dataset(args.dataset)
+    if not ('info' in data and 'root_dir' in data['info']):
+        raise ValueError('Invalid dataset file.')
+    root_directory_path = dataset_root_path(args.dataset)
+    names = {video['id']: video['name'] for video in data.get('videos') or []}
+
+    def ids(category_data):
+        return None if category_data is None else set(c['id'] for c in category_data['category'])
+
+    tasks = [VideoTask(root_directory_path, categories['name'], names.get(video_id), images, args.store,
+                       ids(categories), ids(second_categories), ids(third_categories),
+                       check_frames=not getattr(args, 'skip_frames', False))
+             for video_id, images in images_by_video.items()]
+    return data, categories, tasks
+
+
+def validate(args):
+    _, _, tasks = make_tasks(args)
+    results = run_tasks(tasks, args.workers)
+    problems = 0
+    for result in results:
+        for path in result['missing_frames']:
+            print('missing frame: %s' % path)
+        for path, key, value in result['dangling']:
+            print('dangling %s %s: %s' % (key, value, path))
+        problems += len(result['missing_frames']) + len(result['dangling'])
+    print('%d videos, %d frames, %d problems' % (len(results), sum(r['frames'] for r in results), problems))
+    return 1 if problems else 0
+
+
+def stats(args):
+    _, categories, tasks = make_tasks(args)
+    results = run_tasks(tasks, args.workers)
+    names = {c['id']: c['name'] for c in categories['category']}
+
+    counts = Counter()
+    for result in results:
+        counts.update(result['categories'])
+    print('%-30s %10s' % ('category', 'boxes'))
+    for category_id, count in counts.most_common():
+        print('%-30s %10d' % (names.get(category_id, category_id), count))
+
+    print('')
+    print('%-20s %10s %10s %10s %10s %-20s' % ('video', 'track', 'boxes', 'first', 'last', 'category'))
+    for result in results:
+        for track_id, (count, first, last, category_id) in sorted(result['tracks'].items(), key=lambda t: str(t[0])):
+            print('%-20s %10s %10d %10s %10s %-20s' % (result['video'], track_id, count, first, last,
+                                                      names.get(category_id, category_id)))
+
+    print('')
+    print('%d videos, %d frames, %d annotated frames, %d boxes, %d tracks' % (
+        len(results),
+        sum(r['frames'] for r in results),
+        sum(r['annotated_frames'] for r in results),
+        sum(counts.values()),
+        sum(len(r['tracks']) for r in results)))
+    return 0
+
+
+def export(args):
+    data, categories, tasks = make_tasks(args)
+    videos = [(task.video_name,
+               annotation_directory(task.root_directory_path, task.category_set_name, task.video_name),
+               task.images) for task in tasks]
+    num_images, num_annotations = export_coco(args.output, data, categories['category'], videos, args.store,
+                                              args.workers, args.gzip, args.shard_by_video)
+    print('%d images, %d annotations written to %s' % (num_images, num_annotations, args.output))
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='annotation_cli', description=__doc__.split('\n')[0])
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.required = True
+    for name, function, help in (('validate', validate, 'report missing frames and dangling category ids'),
+                                 ('stats', stats, 'count boxes per category and per track'),
+                                 ('export', export, 'write every annotation into a single COCO file')):
+        subparser = subparsers.add_parser(name, help=help)
+        subparser.set_defaults(function=function)
+        subparser.add_argument('dataset', help='dataset json file')
+        subparser.add_argument('-c', '--categories', required=True,
+                               help='category file, whose name is the annotation category set')
+        subparser.add_argument('--second-categories', help='second category file')
+        subparser.add_argument('--third-categories', help='third category file')
+        subparser.add_argument('--store', choices=sorted(ANNOTATION_STORES), default='json',
+                               help='annotation store the frames were saved with')
+        subparser.add_argument('-j', '--workers', type=int, default=os.cpu_count(),
+                               help='worker processes, one video at a time each')
+        if name == 'stats':
+            subparser.add_argument('--skip-frames', action='store_true',
+                                   help='do not check that the frames exist')
+        if name == 'export':
+            subparser.add_argument('-o', '--output', required=True,
+                                   help='COCO json file to write, or directory with --shard-by-video')
+            subparser.add_argument('--gzip', action='store_true', help='gzip the written files')
+            subparser.add_argument('--shard-by-video', action='store_true',
+                                   help='write one COCO file per video into the output directory')
+    args = parser.parse_args(argv)
+    try:
+        return args.function(args)
+    except (IOError, OSError, ValueError) as e:
+        sys.stderr.write('%s\n' % e)
+        return 2
+
+
+if __name__ == '__main__':
+    sys.exit(main())
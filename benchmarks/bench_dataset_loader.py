@@ -0,0 +1,74 @@
+"""Time-to-first-frame and total load time of dataset files.
+
+Compares `json.load` of the whole file with the streaming reader used by
+`DatasetLoader`. Frame existence checks are not included.
+
+    python benchmarks/bench_dataset_loader.py [num_images ...]
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from libs.json_stream import iter_json_events
+
+FIRST_BATCH_SIZE = 256
+FRAMES_PER_VIDEO = 1000
+
+
+def write_dataset(file_name, num_images):
+    num_videos = (num_images + FRAMES_PER_VIDEO - 1) // FRAMES_PER_VIDEO
+    data = {
+        'info': {'root_dir': os.path.dirname(os.path.dirname(file_name))},
+        'videos': [{'id': i, 'name': 'video_%05d' % i} for i in range(num_videos)],
+        'images': [{'id': i,
+                    'video_id': i // FRAMES_PER_VIDEO,
+                    'file_name': 'Images/video_%05d/%06d.jpg' % (i // FRAMES_PER_VIDEO, i % FRAMES_PER_VIDEO),
+                    'width': 1920,
+                    'height': 1080,
+                    'has_gt': False} for i in range(num_images)],
+    }
+    with open(file_name, 'w') as f:
+        json.dump(data, f)
+
+
+def bench_json_load(file_name):
+    start = time.perf_counter()
+    with open(file_name) as f:
+        data = json.load(f)
+    total = time.perf_counter() - start
+    assert data['images']
+    return total, total
+
+
+def bench_stream(file_name):
+    start = time.perf_counter()
+    first = None
+    count = 0
+    for event, key, value in iter_json_events(file_name, ('images',)):
+        if event == 'item':
+            count += 1
+            if count == FIRST_BATCH_SIZE:
+                first = time.perf_counter() - start
+    total = time.perf_counter() - start
+    return first, total
+
+
+def main(argv):
+    sizes = [int(a) for a in argv] or [10000, 100000, 500000]
+    print('%10s  %-12s %14s %12s' % ('images', 'loader', 'first frame', 'total'))
+    with tempfile.TemporaryDirectory() as root:
+        os.makedirs(os.path.join(root, 'Datasets'))
+        for size in sizes:
+            file_name = os.path.join(root, 'Datasets', 'dataset_%d.json' % size)
+            write_dataset(file_name, size)
+            for name, bench in (('json.load', bench_json_load), ('stream', bench_stream)):
+                first, total = bench(file_name)
+                print('%10d  %-12s %12.3f s %10.3f s' % (size, name, first, total))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,56 @@
+"""Existence checks of dataset frames: one `os.path.exists` per frame, as
+`DatasetLoader` does by default, against `scan_missing_frames`, which reads
+each video directory once. The gap grows with the latency of the file
+system, run it on network storage to see it:
+
+    python benchmarks/bench_frame_scan.py [directory] [num_frames]
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from libs.dataset_loader import scan_missing_frames
+
+FRAMES_PER_VIDEO = 1000
+# One frame in this many is listed but not written
+MISSING_EVERY = 100
+
+
+def make_frames(root, num_frames):
+    paths = []
+    for i in range(num_frames):
+        directory = os.path.join(root, 'Images', 'video_%05d' % (i // FRAMES_PER_VIDEO))
+        if i % FRAMES_PER_VIDEO == 0:
+            os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, '%06d.jpg' % (i % FRAMES_PER_VIDEO))
+        if i % MISSING_EVERY:
+            open(path, 'wb').close()
+        paths.append(path)
+    return paths
+
+
+def main(argv):
+    directory = argv[0] if argv else None
+    num_frames = int(argv[1]) if len(argv) > 1 else 100000
+    with tempfile.TemporaryDirectory(dir=directory) as root:
+        paths = make_frames(root, num_frames)
+
+        start = time.perf_counter()
+        missing = [path for path in paths if not os.path.exists(path)]
+        stat_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        scanned = [path for batch in scan_missing_frames(paths) for path in batch]
+        scan_time = time.perf_counter() - start
+
+        assert sorted(missing) == sorted(scanned)
+        print('%d frames, %d missing' % (num_frames, len(missing)))
+        print('%-12s %8.3f s' % ('exists', stat_time))
+        print('%-12s %8.3f s' % ('scandir', scan_time))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,82 @@
+"""Paint time of the QPainter canvas and of the OpenGL canvas.
+
+Each canvas shows a frame with random boxes and is repainted and read back
+(`grab` for the QPainter canvas, `grabFramebuffer` for the OpenGL view) so
+both timings include rasterization. Without a GPU, run it on Mesa llvmpipe:
+
+    LIBGL_ALWAYS_SOFTWARE=1 xvfb-run python benchmarks/bench_gl_canvas.py [num_boxes ...]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt5.QtGui import QColor, QImage, QPixmap
+from PyQt5.QtWidgets import QApplication
+
+from views.canvas import Canvas
+from views.gl_canvas import GLCanvas, opengl_available
+from views.shape import Shape
+
+FRAME_SIZE = 1920, 1080
+VIEWPORT = 1280, 720
+REPEAT = 20
+
+
+def make_shapes(num_boxes):
+    random.seed(num_boxes)
+    shapes = []
+    for i in range(num_boxes):
+        x = random.uniform(0, FRAME_SIZE[0] - 100)
+        y = random.uniform(0, FRAME_SIZE[1] - 100)
+        shape = Shape(category='car', track_id=str(i))
+        shape.setBox(x, y, x + random.uniform(10, 100), y + random.uniform(10, 100))
+        shape.close()
+        shapes.append(shape)
+    return shapes
+
+
+def make_canvas(canvas_class, image, shapes):
+    canvas = canvas_class()
+    canvas.resize(*VIEWPORT)
+    canvas.show()
+    canvas.loadPixmap(QPixmap.fromImage(image), image)
+    canvas.load_shapes(shapes)
+    canvas.scale = min(float(VIEWPORT[0]) / FRAME_SIZE[0], float(VIEWPORT[1]) / FRAME_SIZE[1])
+    QApplication.processEvents()
+    return canvas
+
+
+def timed(render):
+    render()
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        render()
+    return (time.perf_counter() - start) / REPEAT
+
+
+def main(argv):
+    app = QApplication(sys.argv[:1])
+    if not opengl_available():
+        print('No OpenGL context, try LIBGL_ALWAYS_SOFTWARE=1')
+        return
+    image = QImage(FRAME_SIZE[0], FRAME_SIZE[1], QImage.Format_RGB32)
+    image.fill(QColor(90, 120, 150))
+    print('%8s %12s %12s' % ('boxes', 'qpainter', 'opengl'))
+    for num_boxes in [int(a) for a in argv] or [100, 1000, 5000]:
+        shapes = make_shapes(num_boxes)
+        canvas = make_canvas(Canvas, image, shapes)
+        raster_time = timed(canvas.grab)
+        canvas.close()
+        canvas = make_canvas(GLCanvas, image, shapes)
+        canvas.placeView()
+        gl_time = timed(canvas.view.grabFramebuffer)
+        canvas.close()
+        print('%8d %9.1f ms %9.1f ms' % (num_boxes, raster_time * 1000, gl_time * 1000))
+    app.quit()
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
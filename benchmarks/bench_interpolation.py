@@ -0,0 +1,53 @@
+"""Time to fill a track between keyframes.
+
+Every frame of the span is a separate annotation list, as read from the
+per-frame files; only the interpolation itself is timed, not the store.
+
+    python benchmarks/bench_interpolation.py [span ...]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from libs.interpolation import INTERPOLATION_METHODS, fill_track
+
+NUM_KEYFRAMES = (2, 10, 100)
+
+
+def make_frames(span, num_keyframes):
+    keyframes = set(random.sample(range(1, span - 1), num_keyframes - 2)) | {0, span - 1}
+    frames = []
+    for position in range(span):
+        annotations = None
+        if position in keyframes:
+            annotations = [{'id': 1,
+                            'track_id': '1',
+                            'category_id': 1,
+                            'bbox': {'x': random.uniform(0, 1000),
+                                     'y': random.uniform(0, 500),
+                                     'w': random.uniform(20, 200),
+                                     'h': random.uniform(20, 200)}}]
+        frames.append((position, annotations))
+    return frames
+
+
+def main(argv):
+    spans = [int(a) for a in argv] or [1000, 10000, 100000]
+    print('%8s %10s %-8s %10s' % ('frames', 'keyframes', 'method', 'time'))
+    for span in spans:
+        for num_keyframes in NUM_KEYFRAMES:
+            random.seed(span + num_keyframes)
+            frames = make_frames(span, num_keyframes)
+            for method in INTERPOLATION_METHODS:
+                start = time.perf_counter()
+                changed = fill_track(frames, '1', method)
+                elapsed = time.perf_counter() - start
+                assert len(changed) == span - num_keyframes
+                print('%8d %10d %-8s %8.3f s' % (span, num_keyframes, method, elapsed))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
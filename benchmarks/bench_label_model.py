@@ -0,0 +1,101 @@
+"""uid lookups, bulk removal and bulk visibility changes of the label list.
+
+The "scan" columns replay what the model did before it kept a uid -> row
+index: a linear search per lookup, one removal per row and one
+dataChanged per row. A `QTableView` is attached so view updates are
+included.
+
+    QT_QPA_PLATFORM=offscreen python benchmarks/bench_label_model.py [num_rows ...]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt5.QtCore import QModelIndex
+from PyQt5.QtWidgets import QApplication, QTableView
+
+from views.label_list_table_model import LabelListTableModel
+
+NUM_REMOVED = 1000
+
+
+def make_model(view, num_rows):
+    model = LabelListTableModel()
+    model.extend([LabelListTableModel.make_row('uid-%d' % i, 'car', i, i) for i in range(num_rows)])
+    view.setModel(model)
+    QApplication.processEvents()
+    return model
+
+
+def scan_row(model, uid):
+    for row, data_row in enumerate(model.table_data):
+        if data_row['uid'] == uid:
+            return row
+    return -1
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    function(*args)
+    QApplication.processEvents()
+    return time.perf_counter() - start
+
+
+def lookup_scan(model, uids):
+    for uid in uids:
+        scan_row(model, uid)
+
+
+def lookup_index(model, uids):
+    for uid in uids:
+        model.get_row(uid)
+
+
+def remove_scan(model, uids):
+    for uid in uids:
+        row = scan_row(model, uid)
+        model.beginRemoveRows(QModelIndex(), row, row)
+        del model.table_data[row]
+        model.endRemoveRows()
+
+
+def remove_index(model, uids):
+    model.remove_rows(uids)
+
+
+def toggle_scan(model, visible):
+    for row, data_row in enumerate(model.table_data):
+        data_row['visible'] = visible
+        index = model.index(row, 0)
+        model.dataChanged.emit(index, index)
+
+
+def toggle_index(model, visible):
+    model.toggle_visible_all(visible)
+
+
+def main(argv):
+    app = QApplication(sys.argv[:1])
+    view = QTableView()
+    view.show()
+    sizes = [int(a) for a in argv] or [10000]
+    print('%8s  %-24s %10s %10s' % ('rows', 'operation', 'scan', 'index'))
+    for size in sizes:
+        random.seed(size)
+        uids = ['uid-%d' % i for i in range(size)]
+        removed = random.sample(uids, min(NUM_REMOVED, size))
+        for name, scan, index, arg in (('get_row every uid', lookup_scan, lookup_index, uids),
+                                       ('remove %d rows' % len(removed), remove_scan, remove_index, removed),
+                                       ('toggle visible all', toggle_scan, toggle_index, False)):
+            scan_time = timed(scan, make_model(view, size), arg)
+            index_time = timed(index, make_model(view, size), arg)
+            print('%8d  %-24s %8.3f s %8.3f s' % (size, name, scan_time, index_time))
+    view.close()
+    app.quit()
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,79 @@
+"""Hover and click lookup time with and without the canvas spatial index.
+
+Boxes are scattered over a 1920x1080 frame. The linear scan mirrors the
+reversed walk over `Canvas.shapes` that hit-testing used before
+`GridIndex`.
+
+    python benchmarks/bench_spatial_index.py [num_shapes ...]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from libs.spatial_index import GridIndex
+
+WIDTH = 1920
+HEIGHT = 1080
+NUM_QUERIES = 2000
+EPSILON = 11.0
+
+
+def make_boxes(num_shapes):
+    boxes = []
+    for _ in range(num_shapes):
+        w = random.uniform(10, 200)
+        h = random.uniform(10, 200)
+        x = random.uniform(0, WIDTH - w)
+        y = random.uniform(0, HEIGHT - h)
+        boxes.append((x, y, x + w, y + h))
+    return boxes
+
+
+def linear_query(boxes, x, y, radius):
+    result = []
+    for box in reversed(boxes):
+        x1, y1, x2, y2 = box
+        if x1 - radius <= x <= x2 + radius and y1 - radius <= y <= y2 + radius:
+            result.append(box)
+    return result
+
+
+def bench(num_shapes):
+    random.seed(num_shapes)
+    boxes = make_boxes(num_shapes)
+    points = [(random.uniform(0, WIDTH), random.uniform(0, HEIGHT)) for _ in range(NUM_QUERIES)]
+
+    start = time.perf_counter()
+    expected = [linear_query(boxes, x, y, EPSILON) for x, y in points]
+    linear = time.perf_counter() - start
+
+    start = time.perf_counter()
+    index = GridIndex()
+    for box in boxes:
+        index.insert(box, box)
+    build = time.perf_counter() - start
+
+    start = time.perf_counter()
+    found = [index.query(x, y, EPSILON) for x, y in points]
+    grid = time.perf_counter() - start
+
+    assert found == expected
+    return linear, build, grid
+
+
+def main(argv):
+    sizes = [int(arg) for arg in argv] or [10, 100, 1000, 5000]
+    print('%8s %14s %14s %14s' % ('shapes', 'linear us/q', 'grid us/q', 'build ms'))
+    for num_shapes in sizes:
+        linear, build, grid = bench(num_shapes)
+        print('%8d %14.2f %14.2f %14.2f' % (num_shapes,
+                                            1e6 * linear / NUM_QUERIES,
+                                            1e6 * grid / NUM_QUERIES,
+                                            1e3 * build))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
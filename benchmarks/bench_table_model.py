@@ -0,0 +1,63 @@
+"""Row insert throughput of the file list model.
+
+Compares appending rows one by one with a `layoutChanged` per row, as the
+models used to do, against a single `extend` per batch. A `QTableView` is
+attached so the cost of the view relayout is included.
+
+    QT_QPA_PLATFORM=offscreen python benchmarks/bench_table_model.py [num_rows ...]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt5.QtWidgets import QApplication, QTableView
+
+from views.file_list_table_model import FileListTableModel
+
+BATCH_SIZE = 1024
+
+
+def make_rows(num_rows):
+    return [FileListTableModel.make_row(i, False, 'Images/video/%06d.jpg' % i) for i in range(num_rows)]
+
+
+def bench_per_row(view, rows):
+    model = FileListTableModel()
+    view.setModel(model)
+    start = time.perf_counter()
+    for row in rows:
+        model.table_data.append(row)
+        model.layoutChanged.emit()
+    QApplication.processEvents()
+    return time.perf_counter() - start
+
+
+def bench_extend(view, rows):
+    model = FileListTableModel()
+    view.setModel(model)
+    start = time.perf_counter()
+    for i in range(0, len(rows), BATCH_SIZE):
+        model.extend(rows[i:i + BATCH_SIZE])
+    QApplication.processEvents()
+    return time.perf_counter() - start
+
+
+def main(argv):
+    app = QApplication(sys.argv[:1])
+    view = QTableView()
+    view.show()
+    sizes = [int(a) for a in argv] or [1000, 10000, 50000]
+    print('%10s  %-10s %10s %14s' % ('rows', 'insert', 'time', 'rows/s'))
+    for size in sizes:
+        rows = make_rows(size)
+        for name, bench in (('per row', bench_per_row), ('extend', bench_extend)):
+            elapsed = bench(view, rows)
+            print('%10d  %-10s %8.3f s %14.0f' % (size, name, elapsed, size / elapsed))
+    view.close()
+    app.quit()
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,83 @@
+"""Paint time of a zoomed out viewport over a large image.
+
+The "full" column draws the exposed part of the full resolution pixmap, as
+the canvas does without a pyramid; the "pyramid" column draws the tiles of
+the closest downscaled level.
+
+    QT_QPA_PLATFORM=offscreen python benchmarks/bench_tile_pyramid.py [width height]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt5.QtCore import QRectF, Qt
+from PyQt5.QtGui import QColor, QImage, QPainter, QPixmap
+from PyQt5.QtWidgets import QApplication
+
+from libs.tile_pyramid import PyramidBuilder, TilePyramid, pyramid_level
+
+VIEWPORT = 1280, 800
+SCALES = (1.0, 0.5, 0.25, 0.125, 0.0625)
+REPEAT = 10
+
+
+def make_image(width, height):
+    image = QImage(width, height, QImage.Format_RGB32)
+    painter = QPainter(image)
+    for i in range(0, width, 64):
+        painter.fillRect(i, 0, 32, height, QColor(i % 256, (i // 3) % 256, 128))
+    painter.end()
+    return image
+
+
+def paint(target, scale, draw):
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        p = QPainter(target)
+        p.setRenderHint(QPainter.SmoothPixmapTransform)
+        p.scale(scale, scale)
+        draw(p, QRectF(0, 0, VIEWPORT[0] / scale, VIEWPORT[1] / scale))
+        p.end()
+    return (time.perf_counter() - start) / REPEAT
+
+
+def main(argv):
+    app = QApplication(sys.argv[:1])
+    width, height = [int(a) for a in argv] if argv else (7680, 4320)
+    image = make_image(width, height)
+    pixmap = QPixmap.fromImage(image)
+
+    start = time.perf_counter()
+    builder = PyramidBuilder(image)
+    levels = []
+    builder.built.connect(levels.extend, Qt.DirectConnection)
+    builder.run()
+    print('pyramid of %dx%d built in %.3f s, %d levels' % (width, height, time.perf_counter() - start, len(levels)))
+    pyramid = TilePyramid(pixmap.size(), levels)
+
+    def draw_full(p, exposed):
+        source = exposed.toAlignedRect().intersected(pixmap.rect())
+        p.drawPixmap(QRectF(source), pixmap, QRectF(source))
+
+    target = QPixmap(*VIEWPORT)
+    print('%8s  %6s %10s %10s' % ('scale', 'level', 'full', 'pyramid'))
+    for scale in SCALES:
+        level = pyramid_level(scale, len(levels))
+
+        def draw_pyramid(p, exposed):
+            if level > 0:
+                pyramid.draw(p, level, exposed.intersected(QRectF(pixmap.rect())))
+            else:
+                draw_full(p, exposed)
+
+        # First pass converts the tiles to pixmaps
+        paint(target, scale, draw_pyramid)
+        print('%8.4f  %6d %7.1f ms %7.1f ms' % (scale, level, paint(target, scale, draw_full) * 1000,
+                                                paint(target, scale, draw_pyramid) * 1000))
+    app.quit()
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
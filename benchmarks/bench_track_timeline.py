@@ -0,0 +1,72 @@
+"""Cost of the track timeline of one video: building the track x frame
+presence array, saving a frame, and binning the tracks and their gaps to
+the width of the dock, which is all a redraw after a save needs.
+
+    python benchmarks/bench_track_timeline.py [num_frames] [num_tracks] [width]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from libs.track_presence import TrackPresence
+
+# Frames between the first and the last box of a track
+TRACK_SPAN = (50, 2000)
+# Chance that a frame inside a track has no box
+GAP_RATE = 0.02
+
+
+class FrameTracks(object):
+    """Track ids by frame path, as the annotation index gives them."""
+
+    def __init__(self, tracks):
+        self.tracks = tracks
+
+    def frame_tracks(self, path):
+        return self.tracks.get(path, ())
+
+
+def make_tracks(paths, num_tracks):
+    tracks = {}
+    for track in range(num_tracks):
+        span = random.randint(*TRACK_SPAN)
+        first = random.randrange(max(1, len(paths) - span))
+        for path in paths[first:first + span]:
+            if random.random() >= GAP_RATE:
+                tracks.setdefault(path, []).append(str(track))
+    return tracks
+
+
+def timed(function, repeat=1):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = function()
+    return result, (time.perf_counter() - start) / repeat
+
+
+def main(argv):
+    num_frames = int(argv[0]) if argv else 20000
+    num_tracks = int(argv[1]) if len(argv) > 1 else 500
+    width = int(argv[2]) if len(argv) > 2 else 1200
+    paths = ['video/%06d.jpg' % i for i in range(num_frames)]
+    index = FrameTracks(make_tracks(paths, num_tracks))
+
+    presence, build_time = timed(lambda: TrackPresence.from_index(index, paths))
+    save_time = timed(lambda: presence.set_frame(random.choice(paths), random.sample(presence.track_ids, 20)), 100)[1]
+
+    def redraw():
+        presence.gap_cache = None
+        return presence.bins(width)
+    redraw_time = timed(redraw, 10)[1]
+
+    print('%d frames, %d tracks, %d pixels wide' % (num_frames, len(presence), width))
+    print('%-10s %10.1f ms' % ('build', 1000 * build_time))
+    print('%-10s %10.3f ms' % ('save', 1000 * save_time))
+    print('%-10s %10.1f ms' % ('redraw', 1000 * redraw_time))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,286 @@
+import hashlib
+import os
+import pickle
+import shlex
+import threading
+
+from collections import defaultdict
+
+from PyQt5.QtCore import *
+
+from libs.annotation_store import SqliteAnnotationStore, create_annotation_store
+from libs.constants import DEFAULT_CACHE_DIR
+from libs.dataset_paths import annotation_path
+from libs.interpolation import annotation_track_id, is_track_id
+
+INDEX_FIELDS = ('category_id', 'second_category_id', 'third_category_id', 'track_id', 'trackable')
+
+
+def annotation_keys(annotations):
+    """(field, value) pairs of the annotations of a frame. `annotated` tells
+    whether the frame has any box."""
+    keys = {('annotated', bool(annotations))}
+    for annotation in annotations:
+        for field in INDEX_FIELDS:
+            if field == 'track_id':
+                value = annotation_track_id(annotation)
+                # Untracked boxes are not one track
+                if not is_track_id(value):
+                    continue
+            elif field == 'trackable':
+                value = annotation.get(field, True)
+            else:
+                value = annotation.get(field)
+            if value is not None:
+                keys.add((field, value))
+    return frozenset(keys)
+
+
+def parse_frame_query(text):
+    """Split a query such as `track_id=17 category="traffic light"` into
+    (field, value) string pairs, all of which must match."""
+    terms = []
+    for term in shlex.split(text):
+        field, separator, value = term.partition('=')
+        if not separator or not field or not value:
+            raise ValueError('Expected field=value, got %s' % term)
+        terms.append((field.strip().lower(), value.strip()))
+    return terms
+
+
+def parse_query_bool(value):
+    if value.lower() in ('1', 'true', 'yes', 'y'):
+        return True
+    if value.lower() in ('0', 'false', 'no', 'n'):
+        return False
+    raise ValueError('Expected yes or no, got %s' % value)
+
+
+def query_category_id(value, names_to_categories):
+    """Category id of a query value, given by name or by id."""
+    if value in names_to_categories:
+        return names_to_categories[value]['id']
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError('Unknown category %s' % value)
+
+
+def frame_annotation_keys(annotations):
+    if isinstance(annotations, dict):
+        annotations = list(annotations.values())
+    return annotation_keys(annotations)
+
+
+def annotation_index_path(dataset_file_name, category_set_name, store_name):
+    key = '%s|%s|%s' % (os.path.abspath(dataset_file_name), category_set_name, store_name)
+    return os.path.join(DEFAULT_CACHE_DIR, 'index', hashlib.sha1(key.encode('utf-8')).hexdigest() + '.pickle')
+
+
+class AnnotationIndex(object):
+    """Inverted index from (field, value) to the frames whose annotations
+    have it, e.g. ('track_id', '17') or ('annotated', False).
+
+    Frames are keyed by path. Each indexed frame, or video store, keeps the
+    stamp (mtime, size) of the annotations it was read from, so that a
+    cached index only rereads what changed. Frames edited in this session
+    are up to date whatever their files say, the writes may still be queued.
+    """
+    version = 2
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.postings = defaultdict(set)
+        self.frame_keys = {}
+        self.stamps = {}
+        self.edited = set()
+
+    def __len__(self):
+        return len(self.frame_keys)
+
+    def stamp(self, key):
+        return self.stamps.get(key)
+
+    def update(self, frame, annotations, stamp=None):
+        keys = frame_annotation_keys(annotations)
+        with self.lock:
+            self._set_keys(frame, keys, stamp)
+
+    def edit(self, frame, annotations):
+        """Index the annotations of a frame as they are being saved."""
+        keys = frame_annotation_keys(annotations)
+        with self.lock:
+            self._set_keys(frame, keys, None)
+            self.edited.add(frame)
+
+    def update_unless_edited(self, frame, annotations, stamp=None):
+        """Index annotations read from the store, unless the frame was edited
+        since; checked under the lock so that a save can not slip in between."""
+        keys = frame_annotation_keys(annotations)
+        with self.lock:
+            if frame not in self.edited:
+                self._set_keys(frame, keys, stamp)
+
+    def is_edited(self, frame):
+        return frame in self.edited
+
+    def remove(self, frame):
+        """Forget a frame, which then counts as not annotated."""
+        with self.lock:
+            self._remove(frame)
+
+    def remove_unless_edited(self, frame):
+        with self.lock:
+            if frame not in self.edited:
+                self._remove(frame)
+
+    def _set_keys(self, frame, keys, stamp):
+        for key in self.frame_keys.get(frame, ()):
+            self.postings[key].discard(frame)
+        for key in keys:
+            self.postings[key].add(frame)
+        self.frame_keys[frame] = keys
+        self.stamps[frame] = stamp
+
+    def _remove(self, frame):
+        for key in self.frame_keys.pop(frame, ()):
+            self.postings[key].discard(frame)
+        self.stamps.pop(frame, None)
+
+    def frame_tracks(self, frame):
+        with self.lock:
+            return [value for field, value in self.frame_keys.get(frame, ()) if field == 'track_id']
+
+    def set_stamp(self, key, stamp):
+        with self.lock:
+            self.stamps[key] = stamp
+
+    def query(self, criteria, frames):
+        """The frames of `frames` matching every (field, value) of `criteria`."""
+        result = set(frames)
+        with self.lock:
+            for field, value in criteria:
+                if field == 'annotated' and not value:
+                    # Frames never indexed have no annotation file
+                    result.difference_update(self.postings[('annotated', True)])
+                else:
+                    result.intersection_update(self.postings.get((field, value), ()))
+        return result
+
+    def save(self, path):
+        with self.lock:
+            # Edited frames are read again next time, once their writes are done
+            stamps = {key: stamp for key, stamp in self.stamps.items() if key not in self.edited}
+            state = (self.version, self.frame_keys, stamps)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp_path = '%s.%d.tmp' % (path, os.getpid())
+            with open(temp_path, 'wb') as f:
+                pickle.dump(state, f, pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)
+
+    def load(self, path):
+        """Add the frames of a saved index that were not indexed since."""
+        try:
+            with open(path, 'rb') as f:
+                version, frame_keys, stamps = pickle.load(f)
+        except Exception:
+            # A missing, truncated or outdated cache is only a cache miss
+            return False
+        if version != self.version:
+            return False
+        with self.lock:
+            for frame, keys in frame_keys.items():
+                if frame in self.frame_keys:
+                    continue
+                self.frame_keys[frame] = keys
+                for key in keys:
+                    self.postings[key].add(frame)
+            for key, stamp in stamps.items():
+                self.stamps.setdefault(key, stamp)
+        return True
+
+
+def file_stamp(stat):
+    return stat.st_mtime_ns, stat.st_size
+
+
+def index_json_video(index, store, directory, frames):
+    """Index the frames of a video stored as one json file per frame, reading
+    the directory once and only the files whose stamp changed."""
+    try:
+        with os.scandir(directory) as entries:
+            stamps = {entry.name: file_stamp(entry.stat()) for entry in entries if entry.name.endswith('.json')}
+    except OSError:
+        stamps = {}
+    for frame in frames:
+        # Saves from the user win, also when they happen while the file is read
+        if index.is_edited(frame):
+            continue
+        path = annotation_path(directory, frame)
+        stamp = stamps.get(os.path.basename(path))
+        if stamp is None:
+            index.remove_unless_edited(frame)
+        elif index.stamp(frame) != stamp:
+            try:
+                index.update_unless_edited(frame, store.load(path), stamp)
+            except (OSError, ValueError):
+                index.remove_unless_edited(frame)
+
+
+def index_sqlite_video(index, store, directory, frames):
+    """Index the frames of a video stored in one sqlite file, read again
+    only when the file changed."""
+    database_path = directory + '.sqlite'
+    try:
+        stamp = file_stamp(os.stat(database_path))
+    except OSError:
+        stamp = None
+    if stamp is not None and index.stamp(database_path) == stamp:
+        return
+    stored = set(store.frames(directory))
+    for frame in frames:
+        if index.is_edited(frame):
+            continue
+        path = annotation_path(directory, frame)
+        if os.path.splitext(os.path.basename(path))[0] in stored:
+            index.update_unless_edited(frame, store.load(path))
+        else:
+            index.remove_unless_edited(frame)
+    index.set_stamp(database_path, stamp)
+
+
+class AnnotationIndexer(QThread):
+    """Bring an annotation index up to date on a worker thread.
+
+    `videos` lists (annotation directory, frame paths) per video. The saved
+    index is loaded first, then every video is checked in turn, so queries
+    see more of the dataset as `progress` is emitted.
+    """
+    progress = pyqtSignal(int, int)
+    indexed = pyqtSignal()
+
+    def __init__(self, index, cache_path, videos, store_name, parent=None):
+        super(AnnotationIndexer, self).__init__(parent)
+        self.index = index
+        self.cache_path = cache_path
+        self.videos = videos
+        self.store_name = store_name
+
+    def run(self):
+        self.index.load(self.cache_path)
+        store = create_annotation_store(self.store_name)
+        index_video = index_sqlite_video if isinstance(store, SqliteAnnotationStore) else index_json_video
+        try:
+            for i, (directory, frames) in enumerate(self.videos):
+                if self.isInterruptionRequested():
+                    break
+                index_video(self.index, store, directory, frames)
+                self.progress.emit(i + 1, len(self.videos))
+        finally:
+            store.close()
+        try:
+            self.index.save(self.cache_path)
+        except OSError:
+            pass
+        if not self.isInterruptionRequested():
+            self.indexed.emit()
@@ -0,0 +1,147 @@
+import glob
+import json
+import os
+import sqlite3
+import threading
+
+
+class AnnotationStore(object):
+    """Storage of the annotations of a frame.
+
+    Frames are addressed by the per-frame json path built by
+    `MainWindow.generate_annotation_path`, i.e.
+    `Annotations/<category_set>/<video>/<frame>.json`, whatever the backend.
+    """
+
+    def exists(self, annotation_path):
+        raise NotImplementedError
+
+    def load(self, annotation_path):
+        raise NotImplementedError
+
+    def save(self, annotation_path, annotations):
+        raise NotImplementedError
+
+    def save_many(self, items):
+        for annotation_path, annotations in items:
+            self.save(annotation_path, annotations)
+
+    def close(self):
+        pass
+
+
+class JsonAnnotationStore(AnnotationStore):
+    """One json file per frame."""
+
+    def exists(self, annotation_path):
+        return os.path.exists(annotation_path)
+
+    def load(self, annotation_path):
+        with open(annotation_path) as f:
+            return json.load(f)
+
+    def save(self, annotation_path, annotations):
+        # Write next to the target and rename, so a frame is never left half written
+        temp_path = annotation_path + '.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(annotations, f)
+        os.replace(temp_path, annotation_path)
+
+
+class SqliteAnnotationStore(AnnotationStore):
+    """All frames of a video in a single `<video>.sqlite` file next to the
+    video annotation directory, indexed by frame name."""
+
+    def __init__(self):
+        self.connections = {}
+        self.lock = threading.RLock()
+
+    @staticmethod
+    def split(annotation_path):
+        video_path, file_name = os.path.split(annotation_path)
+        return video_path + '.sqlite', os.path.splitext(file_name)[0]
+
+    def connection(self, database_path):
+        connection = self.connections.get(database_path)
+        if connection is None:
+            connection = sqlite3.connect(database_path, check_same_thread=False)
+            connection.execute('CREATE TABLE IF NOT EXISTS annotations '
+                               '(frame TEXT PRIMARY KEY, data TEXT NOT NULL)')
+            self.connections[database_path] = connection
+        return connection
+
+    def exists(self, annotation_path):
+        database_path, frame = self.split(annotation_path)
+        if database_path not in self.connections and not os.path.exists(database_path):
+            return False
+        with self.lock:
+            row = self.connection(database_path).execute(
+                'SELECT 1 FROM annotations WHERE frame = ?', (frame,)).fetchone()
+        return row is not None
+
+    def load(self, annotation_path):
+        database_path, frame = self.split(annotation_path)
+        with self.lock:
+            row = self.connection(database_path).execute(
+                'SELECT data FROM annotations WHERE frame = ?', (frame,)).fetchone()
+        if row is None:
+            raise KeyError(annotation_path)
+        return json.loads(row[0])
+
+    def save(self, annotation_path, annotations):
+        self.save_many([(annotation_path, annotations)])
+
+    def save_many(self, items):
+        frames = {}
+        for annotation_path, annotations in items:
+            database_path, frame = self.split(annotation_path)
+            frames.setdefault(database_path, []).append((frame, json.dumps(annotations)))
+        with self.lock:
+            for database_path, rows in frames.items():
+                connection = self.connection(database_path)
+                with connection:
+                    connection.executemany('INSERT OR REPLACE INTO annotations (frame, data) VALUES (?, ?)', rows)
+
+    def frames(self, video_path):
+        database_path = video_path + '.sqlite'
+        if database_path not in self.connections and not os.path.exists(database_path):
+            return []
+        with self.lock:
+            rows = self.connection(database_path).execute('SELECT frame FROM annotations ORDER BY frame').fetchall()
+        return [row[0] for row in rows]
+
+    def import_json(self, video_path):
+        """Copy the per-frame json files of a video directory into its store."""
+        items = []
+        for annotation_path in sorted(glob.glob(os.path.join(video_path, '*.json'))):
+            with open(annotation_path) as f:
+                items.append((annotation_path, json.load(f)))
+        self.save_many(items)
+        return len(items)
+
+    def export_json(self, video_path):
+        """Write every frame of a video store back as per-frame json files."""
+        if not os.path.exists(video_path):
+            os.makedirs(video_path)
+        frames = self.frames(video_path)
+        for frame in frames:
+            annotation_path = os.path.join(video_path, frame + '.json')
+            with open(annotation_path, 'w') as f:
+                json.dump(self.load(annotation_path), f)
+        return len(frames)
+
+    def close(self):
+        with self.lock:
+            for connection in self.connections.values():
+                connection.close()
+            self.connections.clear()
+
+
+ANNOTATION_STORES = {
+    'json': JsonAnnotationStore,
+    'sqlite': SqliteAnnotationStore,
+}
+
+
+def create_annotation_store(name):
+    return ANNOTATION_STORES[name]()
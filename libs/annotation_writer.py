@@ -0,0 +1,80 @@
+import threading
+import time
+
+from collections import OrderedDict
+
+from PyQt5.QtCore import *
+
+
+class AnnotationWriter(QThread):
+    """Write frame annotations to the annotation store on a worker thread.
+
+    Writes queued for a frame that has not been written yet replace the
+    queued annotations, so only the latest state of a frame hits the disk.
+    """
+    written = pyqtSignal(str, float)
+    failed = pyqtSignal(str, str)
+
+    def __init__(self, store, parent=None):
+        super(AnnotationWriter, self).__init__(parent)
+        self.store = store
+        self.queue = OrderedDict()
+        self.writing = None
+        self.stopping = False
+        self.condition = threading.Condition()
+
+    def submit(self, annotation_path, annotations):
+        with self.condition:
+            self.queue[annotation_path] = annotations
+            self.condition.notify_all()
+
+    def pending(self, annotation_path):
+        """Annotations of a frame that are not on disk yet, None otherwise."""
+        with self.condition:
+            if annotation_path in self.queue:
+                return self.queue[annotation_path]
+            if self.writing is not None and self.writing[0] == annotation_path:
+                return self.writing[1]
+            return None
+
+    def depth(self):
+        with self.condition:
+            return len(self.queue) + (self.writing is not None)
+
+    def flush(self):
+        """Block until every queued write is on disk."""
+        with self.condition:
+            while self.queue or self.writing is not None:
+                if not self.isRunning():
+                    return
+                self.condition.wait()
+
+    def set_store(self, store):
+        self.flush()
+        self.store = store
+
+    def stop(self):
+        with self.condition:
+            self.stopping = True
+            self.condition.notify_all()
+        self.wait()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.queue and not self.stopping:
+                    self.condition.wait()
+                if not self.queue:
+                    return
+                self.writing = self.queue.popitem(last=False)
+            annotation_path, annotations = self.writing
+            start = time.time()
+            try:
+                self.store.save(annotation_path, annotations)
+            except Exception as e:
+                self.failed.emit(annotation_path, str(e))
+            else:
+                self.written.emit(annotation_path, time.time() - start)
+            with self.condition:
+                self.writing = None
+                self.condition.notify_all()
@@ -0,0 +1,85 @@
+import numpy as np
+
+from PyQt5.QtCore import *
+from PyQt5.QtGui import *
+
+# Frames are matched at this size at most, in pixels along the longest side
+TRACKING_SIZE = 640
+# Fraction of the box size searched around its previous position
+SEARCH_MARGIN = 0.5
+MIN_TEMPLATE_SIZE = 4
+
+
+def image_to_gray(image, scale):
+    """Grayscale float array of `image` resized by `scale`."""
+    width = max(1, int(image.width() * scale))
+    height = max(1, int(image.height() * scale))
+    image = image.scaled(width, height, Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+    image = image.convertToFormat(QImage.Format_Grayscale8)
+    bits = image.constBits()
+    bits.setsize(image.byteCount())
+    array = np.frombuffer(bits, np.uint8).reshape(image.height(), image.bytesPerLine())
+    return array[:, :image.width()].astype(np.float64)
+
+
+def match_template(window, template):
+    """Offset (dy, dx) of `template` inside `window` with the smallest sum of
+    squared differences, from FFT cross-correlation and integral images."""
+    h, w = template.shape
+    height, width = window.shape
+    correlation = np.fft.irfft2(np.fft.rfft2(window) * np.conj(np.fft.rfft2(template, window.shape)),
+                                window.shape)
+    squares = np.pad(np.cumsum(np.cumsum(window ** 2, 0), 1), ((1, 0), (1, 0)), 'constant')
+    energy = squares[h:, w:] - squares[:-h, w:] - squares[h:, :-w] + squares[:-h, :-w]
+    ssd = energy - 2 * correlation[:height - h + 1, :width - w + 1]
+    dy, dx = np.unravel_index(np.argmin(ssd), ssd.shape)
+    return int(dy), int(dx)
+
+
+def track_box(previous, current, box, scale):
+    """Move `box` (x1, y1, x2, y2), in full resolution pixels, from the
+    `previous` to the `current` downscaled frame. Boxes too small to match
+    are returned unchanged."""
+    x1, y1, x2, y2 = [v * scale for v in box]
+    height, width = previous.shape
+    tx1, ty1 = max(0, int(round(x1))), max(0, int(round(y1)))
+    tx2, ty2 = min(width, int(round(x2)) + 1), min(height, int(round(y2)) + 1)
+    if tx2 - tx1 < MIN_TEMPLATE_SIZE or ty2 - ty1 < MIN_TEMPLATE_SIZE:
+        return box
+    template = previous[ty1:ty2, tx1:tx2]
+
+    margin = max(MIN_TEMPLATE_SIZE, int(SEARCH_MARGIN * max(tx2 - tx1, ty2 - ty1)))
+    wx1, wy1 = max(0, tx1 - margin), max(0, ty1 - margin)
+    wx2, wy2 = min(width, tx2 + margin), min(height, ty2 + margin)
+    dy, dx = match_template(current[wy1:wy2, wx1:wx2], template)
+    shift_x = (wx1 + dx - tx1) / scale
+    shift_y = (wy1 + dy - ty1) / scale
+    return box[0] + shift_x, box[1] + shift_y, box[2] + shift_x, box[3] + shift_y
+
+
+class BoxTracker(QThread):
+    """Follow boxes from one frame to the next by template matching.
+
+    `tracked` delivers (uid, box before, box after) for every box, with
+    boxes as (x1, y1, x2, y2) in image pixels.
+    """
+    tracked = pyqtSignal(object)
+
+    def __init__(self, previous_image, image, boxes, parent=None):
+        super(BoxTracker, self).__init__(parent)
+        self.previous_image = previous_image
+        self.image = image
+        self.boxes = boxes
+
+    def run(self):
+        if self.previous_image.size() != self.image.size():
+            return
+        scale = min(1.0, float(TRACKING_SIZE) / max(self.image.width(), self.image.height()))
+        previous = image_to_gray(self.previous_image, scale)
+        current = image_to_gray(self.image, scale)
+        result = []
+        for uid, box in self.boxes:
+            if self.isInterruptionRequested():
+                return
+            result.append((uid, box, track_box(previous, current, box, scale)))
+        self.tracked.emit(result)
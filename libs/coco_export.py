@@ -0,0 +1,177 @@
+import glob
+import gzip
+import json
+import os
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from libs.annotation_store import SqliteAnnotationStore, create_annotation_store
+
+
+def coco_annotation(annotation):
+    """Convert a saved frame annotation, whose `bbox` is a dict, to COCO."""
+    bbox = annotation['bbox']
+    return {'image_id': annotation.get('image_id'),
+            'category_id': annotation['category_id'],
+            'bbox': [bbox['x'], bbox['y'], bbox['w'], bbox['h']],
+            'area': bbox['w'] * bbox['h'],
+            'iscrowd': annotation.get('iscrowd', 0),
+            'segmentation': annotation.get('segmentation', []),
+            'track_id': annotation.get('track_id', annotation.get('video_ins_id'))}
+
+
+def load_video_annotations(directory, store_name):
+    """COCO annotations of every frame saved under a video annotation directory.
+
+    Runs in a worker process of `export_coco`.
+    """
+    store = create_annotation_store(store_name)
+    try:
+        if isinstance(store, SqliteAnnotationStore):
+            paths = [os.path.join(directory, frame + '.json') for frame in store.frames(directory)]
+        else:
+            paths = sorted(glob.glob(os.path.join(directory, '*.json')))
+        annotations = []
+        for path in paths:
+            frame_annotations = store.load(path)
+            if isinstance(frame_annotations, dict):
+                frame_annotations = frame_annotations.values()
+            annotations.extend(coco_annotation(a) for a in frame_annotations)
+        return annotations
+    finally:
+        store.close()
+
+
+class CocoWriter(object):
+    """Write a COCO file one key or array item at a time.
+
+    The file is written next to its destination and renamed on `close`, so
+    an interrupted export never leaves a truncated file behind.
+    """
+
+    def __init__(self, file_name, compress=False):
+        self.file_name = file_name
+        self.temp_file_name = file_name + '.tmp'
+        if compress:
+            self.f = gzip.open(self.temp_file_name, 'wt')
+        else:
+            self.f = open(self.temp_file_name, 'w')
+        self.encoder = json.JSONEncoder()
+        self.keys = 0
+        self.items = None
+        self.f.write('{')
+
+    def write_key(self, key):
+        if self.keys:
+            self.f.write(', ')
+        self.keys += 1
+        self.f.write('%s: ' % self.encoder.encode(key))
+
+    def write_value(self, key, value):
+        self.write_key(key)
+        self.f.write(self.encoder.encode(value))
+
+    def begin_array(self, key):
+        self.write_key(key)
+        self.f.write('[')
+        self.items = 0
+
+    def write_item(self, value):
+        if self.items:
+            self.f.write(', ')
+        self.items += 1
+        self.f.write(self.encoder.encode(value))
+
+    def end_array(self):
+        self.f.write(']')
+        self.items = None
+
+    def close(self):
+        self.f.write('}')
+        self.f.close()
+        os.replace(self.temp_file_name, self.file_name)
+
+    def abort(self):
+        self.f.close()
+        os.remove(self.temp_file_name)
+
+
+def export_coco(output, data, categories, videos, store_name='json', workers=None, compress=False,
+                shard_by_video=False):
+    """Merge the per-frame annotations of a dataset into COCO files.
+
+    `data` holds the dataset keys other than `images`, and `videos` lists
+    (name, annotation directory, image rows) per video. The annotations of
+    each video are read by a process pool worker and written in video
+    order; at most two videos per worker are read ahead of the one being
+    written, so memory does not grow with the dataset. With
+    `shard_by_video`, `output` is a directory that receives one
+    `<video>.json` per video. Annotations are numbered from 1 in the order
+    they are written, since the ids saved with the frames are only unique
+    within a frame. Returns the number of images and annotations written.
+    """
+    suffix = '.json.gz' if compress else '.json'
+    if shard_by_video and not os.path.exists(output):
+        os.makedirs(output)
+
+    def write_header(writer, video_rows):
+        writer.write_value('info', data.get('info', {}))
+        writer.write_value('videos', video_rows)
+        writer.write_value('categories', categories)
+
+    def write_images(writer, images):
+        writer.begin_array('images')
+        for image in images:
+            writer.write_item({k: v for k, v in image.items() if k != 'index'})
+        writer.end_array()
+
+    num_images = 0
+    num_annotations = 0
+    writer = None
+    try:
+        if not shard_by_video:
+            writer = CocoWriter(output, compress)
+            write_header(writer, data.get('videos', []))
+            for _, _, images in videos:
+                num_images += len(images)
+            write_images(writer, (image for _, _, images in videos for image in images))
+            writer.begin_array('annotations')
+
+        video_rows = {video['name']: video for video in data.get('videos') or []}
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            window = 2 * (workers or os.cpu_count() or 1)
+            pending = iter(videos)
+            futures = deque((name, images, executor.submit(load_video_annotations, directory, store_name))
+                            for name, directory, images in islice(pending, window))
+            while futures:
+                name, images, future = futures.popleft()
+                annotations = future.result()
+                # One more video is read ahead for each one written
+                for next_name, directory, next_images in islice(pending, 1):
+                    futures.append((next_name, next_images,
+                                    executor.submit(load_video_annotations, directory, store_name)))
+                if shard_by_video:
+                    writer = CocoWriter(os.path.join(output, (name or 'images') + suffix), compress)
+                    write_header(writer, [video_rows[name]] if name in video_rows else [])
+                    write_images(writer, images)
+                    num_images += len(images)
+                    writer.begin_array('annotations')
+                for annotation in annotations:
+                    num_annotations += 1
+                    annotation['id'] = num_annotations
+                    writer.write_item(annotation)
+                if shard_by_video:
+                    writer.end_array()
+                    writer.close()
+                    writer = None
+
+        if not shard_by_video:
+            writer.end_array()
+            writer.close()
+            writer = None
+    finally:
+        if writer is not None:
+            writer.abort()
+    return num_images, num_annotations
@@ -1,3 +1,5 @@
+import os
+
 from PyQt5.QtGui import *
 
 # region Setting keys
@@ -13,6 +15,16 @@ SETTING_AUTO_SAVE = 'autosave'
 SETTING_SINGLE_CLASS = 'singleclass'
 SETTING_DRAW_SQUARE = 'draw/square'
 SETTING_FONT_SIZE = 'draw/fontSize'
+SETTING_ANNOTATION_STORE = 'annotation/store'
+SETTING_DATASET_JOURNAL = 'dataset/journal'
+SETTING_LAZY_FRAME_CHECK = 'dataset/lazyFrameCheck'
+SETTING_SCAN_MISSING_FRAMES = 'dataset/scanMissingFrames'
+SETTING_PROPAGATE_BOXES = 'annotation/propagate'
+SETTING_TRACK_BOXES = 'annotation/track'
+SETTING_PRE_ANNOTATE = 'annotation/preAnnotate'
+SETTING_DETECTOR = 'detector/name'
+SETTING_DETECTOR_OPTIONS = 'detector/options'
+SETTING_CANVAS_RENDERER = 'canvas/renderer'
 # endregion
 
 # region default values
@@ -24,4 +36,16 @@ DEFAULT_VERTEX_FILL_COLOR = QColor(0, 255, 0, 255)
 DEFAULT_HVERTEX_FILL_COLOR = QColor(255, 0, 0)
 DEFAULT_LINE_THICKNESS = 1
 DEFAULT_FONT_SIZE = 10
+DEFAULT_IMAGE_CACHE_SIZE = 512 * 1024 * 1024
+DEFAULT_PREFETCH_NEXT = 4
+DEFAULT_PREFETCH_PREVIOUS = 2
+DEFAULT_ANNOTATION_STORE = 'json'
+DEFAULT_DATASET_SAVE_DELAY = 1000
+DEFAULT_DETECTOR = 'opencv'
+DEFAULT_CANVAS_RENDERER = 'raster'
+DEFAULT_DETECTION_AHEAD = 8
+DEFAULT_DETECTION_WORKERS = max(1, (os.cpu_count() or 2) // 2)
+DEFAULT_THUMBNAIL_SIZE = 96
+DEFAULT_THUMBNAIL_COUNT = 1024
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.labelImgCache')
 # endregion
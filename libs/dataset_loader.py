@@ -0,0 +1,119 @@
+import os
+
+from collections import defaultdict
+
+from PyQt5.QtCore import *
+
+from libs.dataset_paths import dataset_root_path
+from libs.frame_source import ImageFileSource, VideoFileSource, frame_exists, frame_path, get_frame_source, \
+    split_video_frame_path
+from libs.json_stream import iter_json_events
+
+FIRST_BATCH_SIZE = 256
+MAX_BATCH_SIZE = 8192
+
+
+class DatasetLoader(QThread):
+    """Parse a dataset file on a worker thread.
+
+    `header_loaded` is emitted with the keys read so far once the `images`
+    array is reached, then `images_loaded` delivers batches of
+    (path, data_row) for the frames that exist on disk, or for every frame
+    without `check_frames`. `loading_finished` carries the whole dataset,
+    including every row of `images`.
+    """
+    header_loaded = pyqtSignal(object)
+    images_loaded = pyqtSignal(object)
+    loading_finished = pyqtSignal(object)
+    loading_failed = pyqtSignal(str)
+
+    def __init__(self, file_name, check_frames=True, parent=None):
+        super(DatasetLoader, self).__init__(parent)
+        self.file_name = file_name
+        self.check_frames = check_frames
+        # Frames are always resolved against the folder containing the
+        # dataset file directory, see MainWindow.accept_dataset.
+        self.root_directory_path = dataset_root_path(file_name)
+
+    def run(self):
+        data = {}
+        images = None
+        batch = []
+        batch_size = FIRST_BATCH_SIZE
+        try:
+            for event, key, value in iter_json_events(self.file_name, ('images',)):
+                if self.isInterruptionRequested():
+                    return
+                if event == 'key':
+                    data[key] = value
+                elif event == 'start':
+                    images = []
+                    self.header_loaded.emit(dict(data))
+                else:
+                    images.append(value)
+                    path = frame_path(self.root_directory_path, value)
+                    if self.check_frames and not frame_exists(path):
+                        continue
+                    batch.append((path, value))
+                    if len(batch) >= batch_size:
+                        self.images_loaded.emit(batch)
+                        batch = []
+                        batch_size = min(2 * batch_size, MAX_BATCH_SIZE)
+        except Exception as e:
+            self.loading_failed.emit(str(e))
+            return
+
+        if batch:
+            self.images_loaded.emit(batch)
+        if images is not None:
+            data['images'] = images
+        self.loading_finished.emit(data)
+
+
+def scan_missing_frames(paths):
+    """Yield lists of the missing frames among `paths`, one list per
+    directory, reading each directory once with os.scandir instead of
+    checking every frame file. Frames of other frame sources are checked
+    one by one."""
+    directories = defaultdict(list)
+    others = []
+    for path in paths:
+        source = get_frame_source(path)
+        if isinstance(source, VideoFileSource):
+            file_path = split_video_frame_path(path)[0]
+        elif isinstance(source, ImageFileSource):
+            file_path = path
+        else:
+            others.append(path)
+            continue
+        directory, name = os.path.split(file_path)
+        directories[directory].append((name, path))
+
+    for directory, frames in directories.items():
+        try:
+            with os.scandir(directory or '.') as entries:
+                names = set(entry.name for entry in entries)
+        except OSError:
+            names = set()
+        missing = [path for name, path in frames if name not in names]
+        if missing:
+            yield missing
+    missing = [path for path in others if not frame_exists(path)]
+    if missing:
+        yield missing
+
+
+class FrameScanner(QThread):
+    """Look for missing frames on a worker thread; `frames_missing` delivers
+    them in batches as they are found."""
+    frames_missing = pyqtSignal(object)
+
+    def __init__(self, paths, parent=None):
+        super(FrameScanner, self).__init__(parent)
+        self.paths = paths
+
+    def run(self):
+        for missing in scan_missing_frames(self.paths):
+            if self.isInterruptionRequested():
+                return
+            self.frames_missing.emit(missing)
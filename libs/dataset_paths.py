@@ -0,0 +1,76 @@
+import os
+
+from collections import defaultdict
+
+
+def dataset_root_path(file_name):
+    """Folder containing the directory of a dataset file.
+
+    Frames and annotations of a dataset are always resolved against it,
+    whatever `info.root_dir` says.
+    """
+    return os.path.dirname(os.path.dirname(file_name.replace('\\', '/')))
+
+
+class VideoIndex(object):
+    """Video records by id, and the frame paths of each video in file list order."""
+
+    def __init__(self, videos=None):
+        self.videos = {}
+        self.frames = defaultdict(list)
+        # Frame path -> (video id, position in the frames of the video)
+        self.positions = {}
+        self.set_videos(videos)
+
+    def set_videos(self, videos):
+        self.videos = {video['id']: video for video in videos or ()}
+
+    def name(self, video_id):
+        video = self.videos.get(video_id)
+        return None if video is None else video['name']
+
+    def add_frame(self, video_id, path):
+        frames = self.frames[video_id]
+        self.positions[path] = video_id, len(frames)
+        frames.append(path)
+
+    def frame_paths(self, video_id):
+        return self.frames.get(video_id, [])
+
+    def position(self, path):
+        return self.positions.get(path)
+
+    def clear_frames(self):
+        self.frames.clear()
+        self.positions.clear()
+
+
+class DirectoryCache(object):
+    """Directories known to exist, so that each is checked or created once."""
+
+    def __init__(self):
+        self.directories = set()
+
+    def ensure(self, path):
+        if path not in self.directories:
+            if not os.path.exists(path):
+                os.makedirs(path)
+            self.directories.add(path)
+        return path
+
+    def clear(self):
+        self.directories.clear()
+
+
+def annotation_directory(root_directory_path, category_set_name, video_name=None):
+    """`Annotations/<category_set>[/<video>]` under the dataset root."""
+    path = os.path.join(root_directory_path, 'Annotations', category_set_name)
+    if video_name is not None:
+        path = os.path.join(path, video_name)
+    return path
+
+
+def annotation_path(annotation_directory_path, image_path):
+    """Per-frame annotation file of the frame at `image_path`."""
+    image_name, _ = os.path.splitext(os.path.basename(image_path))
+    return os.path.join(annotation_directory_path, image_name + '.json')
@@ -0,0 +1,117 @@
+import json
+import os
+import time
+
+from PyQt5.QtCore import *
+
+
+def write_dataset(file_name, data, images):
+    """Write the dataset with `images` as its image list.
+
+    Records are encoded one at a time without the `index` bookkeeping key,
+    and the file is replaced atomically once complete. `images` is written
+    last so that the streaming loader sees `info` and `videos` first.
+    """
+    encoder = json.JSONEncoder()
+    temp_file_name = file_name + '.tmp'
+    with open(temp_file_name, 'w') as f:
+        f.write('{')
+        for key, value in data.items():
+            if key == 'images':
+                continue
+            f.write('%s: %s, ' % (encoder.encode(key), encoder.encode(value)))
+        f.write('"images": [')
+        for i, image in enumerate(images):
+            if i:
+                f.write(', ')
+            f.write(encoder.encode({k: v for k, v in image.items() if k != 'index'}))
+        f.write(']}')
+    os.replace(temp_file_name, file_name)
+
+
+def journal_path(file_name):
+    return file_name + '.journal'
+
+
+def append_journal(file_name, entries):
+    """Persist single image changes without rewriting the dataset."""
+    with open(journal_path(file_name), 'a') as f:
+        for entry in entries:
+            f.write(json.dumps(entry) + '\n')
+        f.flush()
+
+
+def read_journal(file_name):
+    """Return image id -> latest has_gt recorded in the journal."""
+    changes = {}
+    path = journal_path(file_name)
+    if not os.path.exists(path):
+        return changes
+    with open(path) as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # An interrupted append leaves a truncated last line
+                continue
+            changes[entry['id']] = entry['has_gt']
+    return changes
+
+
+def journal_size(file_name):
+    try:
+        return os.path.getsize(journal_path(file_name))
+    except OSError:
+        return 0
+
+
+def truncate_journal(file_name, size):
+    """Drop the first `size` bytes of the journal, the changes a completed
+    save already contains, keeping those appended since."""
+    path = journal_path(file_name)
+    if not os.path.exists(path):
+        return
+    with open(path, 'rb') as f:
+        f.seek(size)
+        rest = f.read()
+    if not rest:
+        os.remove(path)
+        return
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(rest)
+    os.replace(temp_path, path)
+
+
+def clear_journal(file_name):
+    path = journal_path(file_name)
+    if os.path.exists(path):
+        os.remove(path)
+
+
+class DatasetWriter(QThread):
+    """Write a dataset on a worker thread. Each record is copied, without
+    `index`, as it is encoded; the values of the records may change
+    meanwhile, their keys and the `images` list must not.
+
+    `journal_size` is the size of the journal when the records were taken,
+    the part of it that the written file makes obsolete.
+    """
+    saved = pyqtSignal(str, float)
+    failed = pyqtSignal(str)
+
+    def __init__(self, file_name, data, images, journal_size=0, parent=None):
+        super(DatasetWriter, self).__init__(parent)
+        self.file_name = file_name
+        self.data = data
+        self.images = images
+        self.journal_size = journal_size
+
+    def run(self):
+        start = time.time()
+        try:
+            write_dataset(self.file_name, self.data, self.images)
+        except Exception as e:
+            self.failed.emit(str(e))
+            return
+        self.saved.emit(self.file_name, time.time() - start)
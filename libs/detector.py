@@ -0,0 +1,259 @@
+import hashlib
+import json
+import multiprocessing
+import os
+import random
+
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from PyQt5.QtCore import *
+
+from libs.constants import DEFAULT_CACHE_DIR
+from libs.frame_source import split_video_frame_path
+
+try:
+    import cv2
+except ImportError:
+    cv2 = None
+
+
+class Detector(object):
+    """Produces candidate boxes for a frame.
+
+    `detect` returns a list of {'category_id', 'score', 'bbox': [x, y, w, h]}
+    in image pixels, where category ids are those of the loaded category
+    file. Detectors are created inside worker processes from their name and
+    keyword options, see `create_detector`.
+    """
+    name = None
+
+    @property
+    def version(self):
+        """Changes whenever the same frame could get different boxes."""
+        raise NotImplementedError
+
+    def detect(self, path):
+        raise NotImplementedError
+
+
+class FakeDetector(Detector):
+    """Deterministic pseudo-random boxes, for tests and demonstrations."""
+    name = 'fake'
+
+    def __init__(self, category_ids=(1,), num_boxes=3, width=640, height=480):
+        self.category_ids = list(category_ids)
+        self.num_boxes = num_boxes
+        self.width = width
+        self.height = height
+
+    @property
+    def version(self):
+        return '1|%s|%d|%d|%d' % (self.category_ids, self.num_boxes, self.width, self.height)
+
+    def detect(self, path):
+        generator = random.Random(path)
+        detections = []
+        for _ in range(self.num_boxes):
+            w = generator.uniform(0.1, 0.4) * self.width
+            h = generator.uniform(0.1, 0.4) * self.height
+            detections.append({'category_id': generator.choice(self.category_ids),
+                               'score': generator.uniform(0.5, 1.0),
+                               'bbox': [generator.uniform(0, self.width - w), generator.uniform(0, self.height - h),
+                                        w, h]})
+        return detections
+
+
+class OpenCvDetector(Detector):
+    """A detection network (ONNX, TensorFlow, Caffe, ...) run on the CPU with
+    OpenCV DNN. The network must output SSD-style rows of
+    (image, class id, score, x1, y1, x2, y2) in relative coordinates, with
+    class ids matching the category ids."""
+    name = 'opencv'
+
+    def __init__(self, model, config='', input_size=300, scale=1.0, mean=(0, 0, 0), swap_rb=True,
+                 score_threshold=0.5):
+        if cv2 is None:
+            raise ImportError('OpenCV (cv2) is required to run detection models')
+        self.model = model
+        self.net = cv2.dnn.readNet(model, config)
+        self.net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+        self.net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+        self.input_size = input_size
+        self.scale = scale
+        self.mean = mean
+        self.swap_rb = swap_rb
+        self.score_threshold = score_threshold
+        with open(model, 'rb') as f:
+            self.model_hash = hashlib.sha1(f.read()).hexdigest()
+
+    @property
+    def version(self):
+        return '%s|%s|%s|%s|%s|%s' % (self.model_hash, self.input_size, self.scale, self.mean, self.swap_rb,
+                                      self.score_threshold)
+
+    def read(self, path):
+        video_frame = split_video_frame_path(path)
+        if video_frame is None:
+            return cv2.imread(path)
+        container_path, index = video_frame
+        capture = cv2.VideoCapture(container_path)
+        try:
+            capture.set(cv2.CAP_PROP_POS_FRAMES, index)
+            ok, image = capture.read()
+            return image if ok else None
+        finally:
+            capture.release()
+
+    def detect(self, path):
+        image = self.read(path)
+        if image is None:
+            return []
+        height, width = image.shape[:2]
+        blob = cv2.dnn.blobFromImage(image, self.scale, (self.input_size, self.input_size), self.mean,
+                                     swapRB=self.swap_rb)
+        self.net.setInput(blob)
+        detections = []
+        for _, class_id, score, x1, y1, x2, y2 in self.net.forward().reshape(-1, 7):
+            if score < self.score_threshold:
+                continue
+            x1, x2 = max(0.0, x1) * width, min(1.0, x2) * width
+            y1, y2 = max(0.0, y1) * height, min(1.0, y2) * height
+            detections.append({'category_id': int(class_id),
+                               'score': float(score),
+                               'bbox': [float(x1), float(y1), float(x2 - x1), float(y2 - y1)]})
+        return detections
+
+
+DETECTORS = {
+    FakeDetector.name: FakeDetector,
+    OpenCvDetector.name: OpenCvDetector,
+}
+
+
+def register_detector(detector_class):
+    DETECTORS[detector_class.name] = detector_class
+
+
+def create_detector(name, options):
+    return DETECTORS[name](**options)
+
+
+def frame_hash(path):
+    """Content hash of a frame; frames inside a video container are
+    identified by the container file state and the frame number."""
+    video_frame = split_video_frame_path(path)
+    if video_frame is not None:
+        container_path, index = video_frame
+        stat = os.stat(container_path)
+        key = '%s|%d|%d|%d' % (os.path.abspath(container_path), stat.st_mtime_ns, stat.st_size, index)
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(partial(f.read, 1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def detection_cache_path(detector, path):
+    key = '%s|%s|%s' % (detector.name, detector.version, frame_hash(path))
+    key = hashlib.sha1(key.encode('utf-8')).hexdigest()
+    return os.path.join(DEFAULT_CACHE_DIR, 'detections', key[:2], key + '.json')
+
+
+# One detector per worker process, created on first use
+_detectors = {}
+
+
+def detect_frame(name, options, path):
+    """Candidate boxes of a frame, from the disk cache when the same detector
+    version already ran on the same frame content. Runs in a worker process."""
+    key = (name, json.dumps(options, sort_keys=True))
+    detector = _detectors.get(key)
+    if detector is None:
+        detector = _detectors[key] = create_detector(name, options)
+
+    cache_path = detection_cache_path(detector, path)
+    if os.path.exists(cache_path):
+        with open(cache_path) as f:
+            return json.load(f)
+    detections = detector.detect(path)
+    if not os.path.exists(os.path.dirname(cache_path)):
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    temp_path = '%s.%d.tmp' % (cache_path, os.getpid())
+    with open(temp_path, 'w') as f:
+        json.dump(detections, f)
+    os.replace(temp_path, cache_path)
+    return detections
+
+
+class DetectionPrefetcher(QObject):
+    """Run a detector ahead of the user on a process pool.
+
+    Results are kept per frame path and announced with `detected`.
+    """
+    detected = pyqtSignal(str, object)
+    failed = pyqtSignal(str, str)
+    # Futures complete on a pool thread; results are handed to the GUI thread through this signal
+    _completed = pyqtSignal(int, str, object, str)
+
+    def __init__(self, workers, parent=None):
+        super(DetectionPrefetcher, self).__init__(parent)
+        self.workers = workers
+        self.executor = None
+        self.name = None
+        self.options = None
+        self.generation = 0
+        self.results = {}
+        self.pending = {}
+        self._completed.connect(self.on_completed)
+
+    def set_detector(self, name, options):
+        self.stop()
+        self.name = name
+        self.options = options
+        self.generation += 1
+        self.results.clear()
+
+    def result(self, path):
+        return self.results.get(path)
+
+    def prefetch(self, paths):
+        if self.name is None:
+            return
+        if self.executor is None:
+            # Forking a process that runs Qt is unsafe
+            self.executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                mp_context=multiprocessing.get_context('spawn'))
+        for path in paths:
+            if path in self.results or path in self.pending:
+                continue
+            future = self.pending[path] = self.executor.submit(detect_frame, self.name, self.options, path)
+            future.add_done_callback(partial(self.on_done, self.generation, path))
+
+    def on_done(self, generation, path, future):
+        if future.cancelled():
+            return
+        try:
+            self._completed.emit(generation, path, future.result(), '')
+        except Exception as e:
+            self._completed.emit(generation, path, None, str(e) or type(e).__name__)
+
+    def on_completed(self, generation, path, detections, error):
+        if generation != self.generation:
+            return
+        self.pending.pop(path, None)
+        if error:
+            self.failed.emit(path, error)
+            return
+        self.results[path] = detections
+        self.detected.emit(path, detections)
+
+    def stop(self):
+        if self.executor is None:
+            return
+        for future in self.pending.values():
+            future.cancel()
+        self.pending.clear()
+        self.executor.shutdown(wait=False)
+        self.executor = None
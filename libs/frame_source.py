@@ -0,0 +1,269 @@
+import hashlib
+import json
+import os
+import threading
+
+from bisect import bisect_right
+from collections import OrderedDict
+
+from PyQt5.QtGui import *
+
+from libs.constants import DEFAULT_CACHE_DIR
+from libs.utils import read
+
+try:
+    import av
+except ImportError:
+    av = None
+
+VIDEO_EXTENSIONS = ('.mp4', '.mkv', '.avi', '.mov', '.webm')
+
+# Decoded frames kept by each video decoder, so that requests arriving a
+# little out of order from a thread pool do not seek back
+DECODER_BUFFER_SIZE = 16
+
+
+def frame_path(root_directory_path, data_row):
+    """Path of a dataset frame.
+
+    Frames stored inside a video container carry a `frame_index` and get the
+    virtual path `<container>/<frame_index>`, so that annotation and canvas
+    file names are derived the same way as for extracted frames.
+    """
+    path = os.path.join(root_directory_path, data_row['file_name'])
+    if 'frame_index' in data_row:
+        path = os.path.join(path, '%06d' % data_row['frame_index'])
+    return path
+
+
+def split_video_frame_path(path):
+    container_path, frame_name = os.path.split(path)
+    if os.path.splitext(container_path)[1].lower() in VIDEO_EXTENSIONS and frame_name.isdigit():
+        return container_path, int(frame_name)
+    return None
+
+
+class FrameSource(object):
+
+    def accepts(self, path):
+        raise NotImplementedError
+
+    def exists(self, path):
+        raise NotImplementedError
+
+    def load(self, path, reader=None):
+        """Return the decoded frame as a QImage, null if it can not be read.
+
+        `reader` names a caller that reads frames in its own order, e.g. a
+        prefetcher; sources decoding sequentially keep separate state for it.
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """Release what was opened for the frames read so far."""
+
+
+class ImageFileSource(FrameSource):
+    """One image file per frame."""
+
+    def accepts(self, path):
+        return True
+
+    def exists(self, path):
+        return os.path.exists(path)
+
+    def load(self, path, reader=None):
+        return QImage.fromData(read(path, b''))
+
+
+class VideoDecoder(object):
+    """Sequential decoder of one video container.
+
+    Frames following the last decoded one are reached by decoding forward;
+    anything else seeks to the closest preceding keyframe first, unless it
+    is one of the last decoded frames, which are kept.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.container = av.open(path)
+        self.stream = self.container.streams.video[0]
+        self.stream.thread_type = 'AUTO'
+        index = load_keyframe_index(path)
+        self.pts = index['pts']
+        self.keyframes = index['keyframes']
+        self.pts_to_index = {pts: i for i, pts in enumerate(self.pts)}
+        self.frames = None
+        self.position = -1
+        # Position -> last decoded frames
+        self.decoded = OrderedDict()
+
+    def __len__(self):
+        return len(self.pts)
+
+    def keyframe_before(self, index):
+        i = bisect_right(self.keyframes, index) - 1
+        return self.keyframes[i] if i >= 0 else 0
+
+    def seek(self, index):
+        self.container.seek(self.pts[self.keyframe_before(index)], stream=self.stream,
+                            backward=True, any_frame=False)
+        self.frames = self.container.decode(self.stream)
+        self.position = -1
+
+    def frame(self, index):
+        if not 0 <= index < len(self.pts):
+            return QImage()
+        with self.lock:
+            if self.container is None:
+                return QImage()
+            frame = self.decoded.get(index)
+            if frame is not None:
+                self.decoded.move_to_end(index)
+                return frame_to_image(frame)
+            # The next frame is always decoded forward, even when it is a keyframe
+            if self.frames is None or index <= self.position or \
+                    (index > self.position + 1 and self.keyframe_before(index) > self.position):
+                self.seek(index)
+            for frame in self.frames:
+                position = self.pts_to_index.get(frame.pts)
+                if position is None:
+                    continue
+                self.position = position
+                self.decoded[position] = frame
+                if len(self.decoded) > DECODER_BUFFER_SIZE:
+                    self.decoded.popitem(last=False)
+                if position >= index:
+                    return frame_to_image(frame)
+            self.frames = None
+            return QImage()
+
+    def close(self):
+        with self.lock:
+            if self.container is not None:
+                self.container.close()
+            self.container = None
+            self.frames = None
+            self.decoded.clear()
+
+
+class VideoFileSource(FrameSource):
+    """Frames decoded straight from video containers, see `frame_path`.
+
+    Each reader gets its own decoder per container: the frames opened by the
+    user, the prefetched ones and the thumbnails are asked for in different
+    orders, and one shared decoder would keep seeking between them.
+    """
+
+    def __init__(self):
+        self.decoders = {}
+        self.containers = {}
+        self.lock = threading.Lock()
+
+    def accepts(self, path):
+        return split_video_frame_path(path) is not None
+
+    def exists(self, path):
+        container_path, _ = split_video_frame_path(path)
+        exists = self.containers.get(container_path)
+        if exists is None:
+            exists = self.containers[container_path] = os.path.isfile(container_path)
+        return exists
+
+    def decoder(self, container_path, reader=None):
+        with self.lock:
+            decoder = self.decoders.get((container_path, reader))
+            if decoder is None:
+                decoder = self.decoders[(container_path, reader)] = VideoDecoder(container_path)
+            return decoder
+
+    def load(self, path, reader=None):
+        container_path, index = split_video_frame_path(path)
+        if av is None or not self.exists(path):
+            return QImage()
+        try:
+            return self.decoder(container_path, reader).frame(index)
+        except Exception:
+            return QImage()
+
+    def close(self):
+        with self.lock:
+            for decoder in self.decoders.values():
+                decoder.close()
+            self.decoders.clear()
+            self.containers.clear()
+
+
+def frame_to_image(frame):
+    array = frame.to_ndarray(format='rgb24')
+    height, width = array.shape[:2]
+    return QImage(array.data, width, height, 3 * width, QImage.Format_RGB888).copy()
+
+
+def keyframe_index_path(path):
+    stat = os.stat(path)
+    key = '%s|%d|%d' % (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+    return os.path.join(DEFAULT_CACHE_DIR, 'keyframes',
+                        hashlib.sha1(key.encode('utf-8')).hexdigest() + '.json')
+
+
+def load_keyframe_index(path):
+    """Presentation timestamps of every frame and the frame numbers of the
+    keyframes, cached on disk next to the other caches."""
+    index_path = keyframe_index_path(path)
+    if os.path.exists(index_path):
+        with open(index_path) as f:
+            return json.load(f)
+
+    pts = []
+    keyframe_pts = []
+    container = av.open(path)
+    try:
+        stream = container.streams.video[0]
+        for packet in container.demux(stream):
+            if packet.pts is None:
+                continue
+            pts.append(packet.pts)
+            if packet.is_keyframe:
+                keyframe_pts.append(packet.pts)
+    finally:
+        container.close()
+    pts.sort()
+    pts_to_index = {p: i for i, p in enumerate(pts)}
+    index = {'pts': pts,
+             'keyframes': sorted(pts_to_index[p] for p in keyframe_pts)}
+
+    if not os.path.exists(os.path.dirname(index_path)):
+        os.makedirs(os.path.dirname(index_path))
+    with open(index_path, 'w') as f:
+        json.dump(index, f)
+    return index
+
+
+frame_sources = [VideoFileSource(), ImageFileSource()]
+
+
+def register_frame_source(source):
+    """Give `source` priority over the built-in frame sources."""
+    frame_sources.insert(0, source)
+
+
+def get_frame_source(path):
+    for source in frame_sources:
+        if source.accepts(path):
+            return source
+
+
+def frame_exists(path):
+    return get_frame_source(path).exists(path)
+
+
+def load_frame(path, reader=None):
+    return get_frame_source(path).load(path, reader)
+
+
+def close_frame_sources():
+    """Close the containers opened so far, e.g. when another dataset is opened."""
+    for source in frame_sources:
+        source.close()
@@ -0,0 +1,103 @@
+import threading
+
+from collections import OrderedDict
+
+from PyQt5.QtGui import *
+from PyQt5.QtCore import *
+
+from libs.frame_source import frame_exists, load_frame
+
+
+class ImageCache(object):
+    """LRU of decoded images, bounded by their size in bytes."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.images = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def __contains__(self, path):
+        with self.lock:
+            return path in self.images
+
+    def get(self, path):
+        with self.lock:
+            image = self.images.get(path)
+            if image is None:
+                self.misses += 1
+                return None
+            self.images.move_to_end(path)
+            self.hits += 1
+            return image
+
+    def put(self, path, image):
+        if image.isNull() or image.byteCount() > self.max_bytes:
+            return
+        with self.lock:
+            if path in self.images:
+                self.size -= self.images.pop(path).byteCount()
+            self.images[path] = image
+            self.size += image.byteCount()
+            while self.size > self.max_bytes:
+                _, evicted = self.images.popitem(last=False)
+                self.size -= evicted.byteCount()
+
+    def clear(self):
+        with self.lock:
+            self.images.clear()
+            self.size = 0
+
+
+class ImageDecodeTask(QRunnable):
+
+    def __init__(self, prefetcher, path):
+        super(ImageDecodeTask, self).__init__()
+        self.prefetcher = prefetcher
+        self.path = path
+
+    def run(self):
+        prefetcher = self.prefetcher
+        with prefetcher.lock:
+            if self.path in prefetcher.running:
+                return
+            prefetcher.running.add(self.path)
+        try:
+            if self.path not in prefetcher.cache:
+                image = load_frame(self.path, 'prefetch')
+                prefetcher.cache.put(self.path, image)
+                # Frames are not checked up front when the dataset is opened with lazy checks
+                if image.isNull() and not frame_exists(self.path):
+                    prefetcher.frame_missing.emit(self.path)
+        finally:
+            with prefetcher.lock:
+                prefetcher.running.discard(self.path)
+
+
+class ImagePrefetcher(QObject):
+    """Decode the frames around the current one on a thread pool."""
+    frame_missing = pyqtSignal(str)
+
+    def __init__(self, cache, parent=None):
+        super(ImagePrefetcher, self).__init__(parent)
+        self.cache = cache
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max(1, min(4, QThread.idealThreadCount() - 1)))
+        self.running = set()
+        self.lock = threading.Lock()
+
+    def prefetch(self, paths):
+        # Frames queued for an older position are not worth decoding anymore.
+        self.pool.clear()
+        with self.lock:
+            running = set(self.running)
+        for path in paths:
+            if path in running or path in self.cache:
+                continue
+            self.pool.start(ImageDecodeTask(self, path))
+
+    def stop(self):
+        self.pool.clear()
+        self.pool.waitForDone()
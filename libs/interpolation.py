@@ -0,0 +1,101 @@
+import numpy as np
+
+INTERPOLATION_METHODS = ('linear', 'spline')
+
+BBOX_KEYS = ('x', 'y', 'w', 'h')
+
+
+def annotation_track_id(annotation):
+    return str(annotation.get('track_id', annotation.get('video_ins_id')))
+
+
+def is_track_id(track_id):
+    """False for boxes outside any track: no id, an empty one or the default -1."""
+    return track_id is not None and str(track_id).strip() not in ('', '-1', 'None')
+
+
+def natural_spline(x, y, t):
+    """Evaluate the natural cubic splines through (x, y[:, j]) at `t`, for every column j."""
+    n = len(x)
+    h = np.diff(x)
+    # Second derivatives at the knots, zero at both ends
+    a = np.zeros((n, n))
+    a[0, 0] = a[-1, -1] = 1.0
+    i = np.arange(1, n - 1)
+    a[i, i - 1] = h[:-1]
+    a[i, i] = 2 * (h[:-1] + h[1:])
+    a[i, i + 1] = h[1:]
+    b = np.zeros_like(y)
+    b[1:-1] = 6 * ((y[2:] - y[1:-1]) / h[1:, None] - (y[1:-1] - y[:-2]) / h[:-1, None])
+    m = np.linalg.solve(a, b)
+
+    k = np.clip(np.searchsorted(x, t, side='right') - 1, 0, n - 2)
+    hk = h[k][:, None]
+    left = (x[k + 1] - t)[:, None]
+    right = (t - x[k])[:, None]
+    return ((m[k] * left ** 3 + m[k + 1] * right ** 3) / (6 * hk)
+            + (y[k] / hk - m[k] * hk / 6) * left
+            + (y[k + 1] / hk - m[k + 1] * hk / 6) * right)
+
+
+def interpolate_boxes(key_positions, key_boxes, positions, method='linear'):
+    """Boxes (x, y, w, h) at `positions` from the boxes at sorted `key_positions`.
+
+    Spline interpolation needs three keyframes and falls back to linear
+    interpolation otherwise.
+    """
+    x = np.asarray(key_positions, dtype=float)
+    y = np.asarray(key_boxes, dtype=float)
+    t = np.asarray(positions, dtype=float)
+    if method == 'spline' and len(x) >= 3:
+        boxes = natural_spline(x, y, t)
+    else:
+        k = np.clip(np.searchsorted(x, t, side='right') - 1, 0, len(x) - 2)
+        weight = ((t - x[k]) / (x[k + 1] - x[k]))[:, None]
+        boxes = y[k] * (1 - weight) + y[k + 1] * weight
+    # Splines may overshoot between keyframes
+    boxes[:, 2:] = np.maximum(boxes[:, 2:], 1)
+    return boxes
+
+
+def fill_track(frames, track_id, method='linear'):
+    """Interpolate the boxes of a track between its keyframes.
+
+    `frames` lists (image_id, annotations) of a video in frame order, with
+    None for frames that were never saved. Boxes of the track that are not
+    marked `interpolated` are keyframes; every other frame between the
+    first and the last keyframe gets a new box, marked `interpolated`, that
+    copies the attributes of the previous keyframe. Returns
+    (position, annotations) of the frames that changed.
+    """
+    track_id = str(track_id)
+    key_positions = []
+    key_annotations = []
+    for position, (_, annotations) in enumerate(frames):
+        for annotation in annotations or ():
+            if annotation_track_id(annotation) == track_id and not annotation.get('interpolated'):
+                key_positions.append(position)
+                key_annotations.append(annotation)
+                break
+    if len(key_positions) < 2:
+        return []
+
+    keys = set(key_positions)
+    positions = np.array([p for p in range(key_positions[0], key_positions[-1] + 1) if p not in keys], dtype=int)
+    if not len(positions):
+        return []
+    key_boxes = [[annotation['bbox'][key] for key in BBOX_KEYS] for annotation in key_annotations]
+    boxes = interpolate_boxes(key_positions, key_boxes, positions, method)
+    previous = np.searchsorted(key_positions, positions) - 1
+
+    changed = []
+    for position, box, k in zip(positions.tolist(), boxes.tolist(), previous.tolist()):
+        image_id, annotations = frames[position]
+        annotation = dict(key_annotations[k])
+        annotation['bbox'] = dict(zip(BBOX_KEYS, box))
+        annotation['image_id'] = image_id
+        annotation['interpolated'] = True
+        annotations = [a for a in annotations or () if annotation_track_id(a) != track_id]
+        annotations.append(annotation)
+        changed.append((position, annotations))
+    return changed
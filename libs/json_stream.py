@@ -0,0 +1,108 @@
+import json
+
+CHUNK_SIZE = 1 << 16
+
+
+class JsonStreamReader(object):
+    """Incremental reader for a top-level json object.
+
+    Values of ordinary keys are decoded whole, while the items of the array
+    keys passed as `stream_keys` are yielded one by one, so a huge `images`
+    list never has to be held in memory at once.
+    """
+
+    def __init__(self, f, chunk_size=CHUNK_SIZE):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def fill(self, size=None):
+        if self.eof:
+            return False
+        chunk = self.f.read(size or self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in ' \t\r\n':
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.fill():
+                raise ValueError('Unexpected end of json file')
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError('Expecting %r at offset %d' % (char, self.pos))
+        self.pos += 1
+
+    def value(self):
+        self.peek()
+        size = self.chunk_size
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except ValueError:
+                value, end = None, -1
+            # A number at the very end of the buffer may still be truncated.
+            if end != -1 and (end < len(self.buffer) or self.eof):
+                self.pos = end
+                return value
+            if not self.fill(size):
+                if end != -1:
+                    self.pos = end
+                    return value
+                raise ValueError('Invalid json value at offset %d' % self.pos)
+            size *= 2
+
+    def items(self):
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            char = self.peek()
+            self.pos += 1
+            if char == ']':
+                return
+            if char != ',':
+                raise ValueError('Expecting "," or "]" at offset %d' % (self.pos - 1))
+
+    def events(self, stream_keys=()):
+        """Yield ('key', name, value) for ordinary keys. Arrays listed in
+        `stream_keys` yield ('start', name, None) followed by ('item', name, value)
+        for every element."""
+        self.expect('{')
+        if self.peek() == '}':
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(':')
+            if key in stream_keys and self.peek() == '[':
+                yield 'start', key, None
+                for item in self.items():
+                    yield 'item', key, item
+            else:
+                yield 'key', key, self.value()
+            char = self.peek()
+            self.pos += 1
+            if char == '}':
+                return
+            if char != ',':
+                raise ValueError('Expecting "," or "}" at offset %d' % (self.pos - 1))
+
+
+def iter_json_events(file_name, stream_keys=()):
+    with open(file_name) as f:
+        for event in JsonStreamReader(f).events(stream_keys):
+            yield event
@@ -0,0 +1,87 @@
+from collections import defaultdict
+
+DEFAULT_CELL_SIZE = 128
+
+
+class GridIndex(object):
+    """Uniform grid over axis-aligned rectangles (x1, y1, x2, y2).
+
+    Items also keep the order they were inserted in, so lookups can return
+    the topmost item first like a reversed scan of the canvas shapes.
+    """
+
+    def __init__(self, cell_size=DEFAULT_CELL_SIZE):
+        self.cell_size = cell_size
+        self.cells = defaultdict(set)
+        self.items = {}
+        self.order = {}
+        self.sequence = 0
+
+    def __len__(self):
+        return len(self.items)
+
+    def __contains__(self, item):
+        return item in self.items
+
+    def cell_keys(self, x1, y1, x2, y2):
+        size = self.cell_size
+        for cx in range(int(x1 // size), int(x2 // size) + 1):
+            for cy in range(int(y1 // size), int(y2 // size) + 1):
+                yield cx, cy
+
+    def insert(self, item, rect):
+        if item in self.items:
+            self.update(item, rect)
+            return
+        self.sequence += 1
+        self.order[item] = self.sequence
+        self.add(item, rect)
+
+    def add(self, item, rect):
+        x1, y1, x2, y2 = rect
+        rect = min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2)
+        cells = list(self.cell_keys(*rect))
+        for key in cells:
+            self.cells[key].add(item)
+        self.items[item] = rect, cells
+
+    def update(self, item, rect):
+        """Move a known item; unknown items are ignored."""
+        if item not in self.items:
+            return
+        self.discard(item)
+        self.add(item, rect)
+
+    def discard(self, item):
+        _, cells = self.items.pop(item)
+        for key in cells:
+            bucket = self.cells[key]
+            bucket.discard(item)
+            if not bucket:
+                del self.cells[key]
+
+    def remove(self, item):
+        if item not in self.items:
+            return
+        self.discard(item)
+        del self.order[item]
+
+    def clear(self):
+        self.cells.clear()
+        self.items.clear()
+        self.order.clear()
+
+    def query(self, x, y, radius=0):
+        """Items whose rectangle, grown by `radius`, contains (x, y), topmost first."""
+        found = set()
+        for key in self.cell_keys(x - radius, y - radius, x + radius, y + radius):
+            bucket = self.cells.get(key)
+            if bucket:
+                found.update(bucket)
+        result = []
+        for item in found:
+            x1, y1, x2, y2 = self.items[item][0]
+            if x1 - radius <= x <= x2 + radius and y1 - radius <= y <= y2 + radius:
+                result.append(item)
+        result.sort(key=self.order.__getitem__, reverse=True)
+        return result
@@ -0,0 +1,130 @@
+import hashlib
+import os
+import threading
+
+from collections import OrderedDict
+
+from PyQt5.QtGui import *
+from PyQt5.QtCore import *
+
+from libs.constants import DEFAULT_CACHE_DIR
+from libs.frame_source import load_frame, split_video_frame_path
+
+
+def thumbnail_cache_path(path):
+    """Disk cache entry of a frame thumbnail, keyed by the path, mtime and size
+    of the frame file, or of its container and frame number for videos."""
+    video_frame = split_video_frame_path(path)
+    file_path, index = video_frame if video_frame is not None else (path, -1)
+    stat = os.stat(file_path)
+    key = '%s|%d|%d|%d' % (os.path.abspath(file_path), stat.st_mtime_ns, stat.st_size, index)
+    key = hashlib.sha1(key.encode('utf-8')).hexdigest()
+    return os.path.join(DEFAULT_CACHE_DIR, 'thumbnails', key[:2], key + '.jpg')
+
+
+def make_thumbnail(path, size):
+    """Thumbnail of a frame fitting in `size` x `size`. Image files are
+    decoded at reduced size directly, which JPEG does much faster."""
+    if split_video_frame_path(path) is None:
+        reader = QImageReader(path)
+        source_size = reader.size()
+        if source_size.isValid():
+            reader.setScaledSize(source_size.scaled(size, size, Qt.KeepAspectRatio))
+            image = reader.read()
+            if not image.isNull():
+                return image
+    image = load_frame(path, 'thumbnail')
+    if image.isNull():
+        return image
+    return image.scaled(size, size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+
+
+class ThumbnailTask(QRunnable):
+
+    def __init__(self, loader, path):
+        super(ThumbnailTask, self).__init__()
+        self.loader = loader
+        self.path = path
+
+    def run(self):
+        loader = self.loader
+        with loader.lock:
+            loader.running.add(self.path)
+        image = QImage()
+        try:
+            cache_path = thumbnail_cache_path(self.path)
+            if os.path.exists(cache_path):
+                image = QImage(cache_path)
+            if image.isNull():
+                image = make_thumbnail(self.path, loader.size)
+                if not image.isNull():
+                    if not os.path.exists(os.path.dirname(cache_path)):
+                        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+                    temp_path = '%s.%d.tmp' % (cache_path, threading.get_ident())
+                    if image.save(temp_path, 'JPG', 85):
+                        os.replace(temp_path, cache_path)
+        except OSError:
+            pass
+        finally:
+            loader.store(self.path, image)
+
+
+class ThumbnailLoader(QObject):
+    """Thumbnails read from the disk cache, or generated on a thread pool.
+
+    Only the `max_count` most recently used thumbnails are kept in memory,
+    whatever the number of frames.
+    """
+    thumbnail_loaded = pyqtSignal(str)
+
+    def __init__(self, max_count, size, parent=None):
+        super(ThumbnailLoader, self).__init__(parent)
+        self.max_count = max_count
+        self.size = size
+        self.thumbnails = OrderedDict()
+        self.pending = set()
+        self.running = set()
+        self.priority = 0
+        self.lock = threading.Lock()
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max(1, min(2, QThread.idealThreadCount() - 1)))
+
+    def thumbnail(self, path):
+        """The thumbnail of `path`, or None after queueing it."""
+        with self.lock:
+            image = self.thumbnails.get(path)
+            if image is not None:
+                self.thumbnails.move_to_end(path)
+                return image
+            if path in self.pending:
+                return None
+            self.pending.add(path)
+        # Most recently requested first, they are the ones on screen
+        self.priority += 1
+        self.pool.start(ThumbnailTask(self, path), self.priority)
+        return None
+
+    def store(self, path, image):
+        with self.lock:
+            self.pending.discard(path)
+            self.running.discard(path)
+            self.thumbnails[path] = image
+            while len(self.thumbnails) > self.max_count:
+                self.thumbnails.popitem(last=False)
+        self.thumbnail_loaded.emit(path)
+
+    def cancel(self):
+        """Drop the queued requests, e.g. after scrolling them out of view."""
+        self.pool.clear()
+        with self.lock:
+            self.pending = set(self.running)
+        self.priority = 0
+
+    def clear(self):
+        self.cancel()
+        with self.lock:
+            self.thumbnails.clear()
+
+    def stop(self):
+        self.pool.clear()
+        self.pool.waitForDone()
@@ -0,0 +1,84 @@
+from collections import OrderedDict
+
+from PyQt5.QtGui import *
+from PyQt5.QtCore import *
+
+# Images whose longest side is at most this are drawn directly
+PYRAMID_MIN_SIZE = 2048
+TILE_SIZE = 512
+# Tile pixmaps kept in video memory, about 128MB at 32 bits per pixel
+MAX_TILES = 128
+
+
+def pyramid_level(scale, level_count):
+    """The coarsest level still drawn at or above its resolution at `scale`.
+    Level 0 is the full resolution image, each level halves the previous one."""
+    level = 0
+    while level < level_count and scale <= 0.5 ** (level + 1):
+        level += 1
+    return level
+
+
+class TilePyramid(object):
+    """Halved copies of an image, drawn by tiles of `TILE_SIZE` pixels.
+
+    `levels[0]` is the image at half resolution. Tiles are converted to
+    pixmaps when first drawn and the `MAX_TILES` most recently drawn are kept.
+    """
+
+    def __init__(self, size, levels):
+        self.size = size
+        self.levels = levels
+        self.tiles = OrderedDict()
+
+    def tile(self, level, column, row):
+        key = level, column, row
+        pixmap = self.tiles.get(key)
+        if pixmap is not None:
+            self.tiles.move_to_end(key)
+            return pixmap
+        image = self.levels[level - 1]
+        pixmap = QPixmap.fromImage(image.copy(column * TILE_SIZE, row * TILE_SIZE, TILE_SIZE, TILE_SIZE))
+        self.tiles[key] = pixmap
+        while len(self.tiles) > MAX_TILES:
+            self.tiles.popitem(last=False)
+        return pixmap
+
+    def draw(self, p, level, exposed):
+        """Draw the tiles of `level` covering `exposed`, in full resolution image
+        coordinates, as the painter is set up for the full resolution image."""
+        image = self.levels[level - 1]
+        # Not exactly 2 ** level, levels with odd sizes were rounded down
+        factor_x = float(self.size.width()) / image.width()
+        factor_y = float(self.size.height()) / image.height()
+        first_column = max(0, int(exposed.left() / factor_x) // TILE_SIZE)
+        first_row = max(0, int(exposed.top() / factor_y) // TILE_SIZE)
+        last_column = min((image.width() - 1) // TILE_SIZE, int(exposed.right() / factor_x) // TILE_SIZE)
+        last_row = min((image.height() - 1) // TILE_SIZE, int(exposed.bottom() / factor_y) // TILE_SIZE)
+        for row in range(first_row, last_row + 1):
+            for column in range(first_column, last_column + 1):
+                tile = self.tile(level, column, row)
+                target = QRectF(column * TILE_SIZE * factor_x, row * TILE_SIZE * factor_y,
+                                tile.width() * factor_x, tile.height() * factor_y)
+                p.drawPixmap(target, tile, QRectF(tile.rect()))
+
+
+class PyramidBuilder(QThread):
+    """Downscale an image by halves until it fits in a tile; `built` delivers
+    the list of levels."""
+    built = pyqtSignal(object)
+
+    def __init__(self, image, parent=None):
+        super(PyramidBuilder, self).__init__(parent)
+        self.image = image
+
+    def run(self):
+        levels = []
+        image = self.image
+        while max(image.width(), image.height()) > TILE_SIZE:
+            if self.isInterruptionRequested():
+                return
+            image = image.scaled(max(1, image.width() // 2), max(1, image.height() // 2),
+                                 Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+            levels.append(image)
+        self.built.emit(levels)
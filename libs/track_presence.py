@@ -0,0 +1,92 @@
+import numpy as np
+
+from libs.interpolation import is_track_id
+
+# Rows are added by blocks, so that new tracks rarely copy the array
+TRACK_BLOCK = 64
+
+
+class TrackPresence(object):
+    """Which tracks have a box on which frames of a video, as a track x frame
+    boolean array.
+
+    Tracks get a row the first time they are seen, so building from the
+    frames in order lists them by first appearance; untracked boxes are
+    left out. Gaps are the frames between the first and the last box of a
+    track that have none.
+    """
+
+    def __init__(self, frame_paths):
+        self.frame_paths = list(frame_paths)
+        self.positions = {path: position for position, path in enumerate(self.frame_paths)}
+        self.track_ids = []
+        self.rows = {}
+        self.array = np.zeros((TRACK_BLOCK, len(self.frame_paths)), dtype=bool)
+        # Bumped on every change, views redraw when it moves
+        self.version = 0
+        self.gap_cache = None
+
+    @classmethod
+    def from_index(cls, index, frame_paths):
+        presence = cls(frame_paths)
+        for position, path in enumerate(presence.frame_paths):
+            for track_id in filter(is_track_id, index.frame_tracks(path)):
+                row = presence.track_row(track_id)
+                presence.array[row, position] = True
+        return presence
+
+    def __len__(self):
+        return len(self.track_ids)
+
+    @property
+    def frame_count(self):
+        return len(self.frame_paths)
+
+    @property
+    def presence(self):
+        return self.array[:len(self.track_ids)]
+
+    def track_row(self, track_id):
+        row = self.rows.get(track_id)
+        if row is None:
+            row = self.rows[track_id] = len(self.track_ids)
+            self.track_ids.append(track_id)
+            if row == len(self.array):
+                self.array = np.concatenate([self.array, np.zeros((TRACK_BLOCK, self.frame_count), dtype=bool)])
+        return row
+
+    def set_frame(self, path, track_ids):
+        """Replace the tracks of a frame. Returns False for a frame of another video."""
+        position = self.positions.get(path)
+        if position is None:
+            return False
+        self.array[:, position] = False
+        for track_id in filter(is_track_id, track_ids):
+            row = self.track_row(str(track_id))
+            self.array[row, position] = True
+        self.version += 1
+        self.gap_cache = None
+        return True
+
+    def gaps(self):
+        """Boolean array of the frames missing inside each track."""
+        if self.gap_cache is None:
+            presence = self.presence
+            present = presence.any(axis=1)
+            first = presence.argmax(axis=1)
+            last = self.frame_count - 1 - presence[:, ::-1].argmax(axis=1)
+            frames = np.arange(self.frame_count)
+            inside = (frames >= first[:, None]) & (frames <= last[:, None]) & present[:, None]
+            self.gap_cache = inside & ~presence
+        return self.gap_cache
+
+    def bins(self, count):
+        """Presence and gaps of every track over `count` equal runs of frames,
+        or one run per frame when there are fewer frames."""
+        count = max(1, min(count, self.frame_count))
+        starts = (np.arange(count) * self.frame_count) // count
+        if not self.frame_count or not len(self.track_ids):
+            empty = np.zeros((len(self.track_ids), count if self.frame_count else 0), dtype=bool)
+            return empty, empty
+        return (np.logical_or.reduceat(self.presence, starts, axis=1),
+                np.logical_or.reduceat(self.gaps(), starts, axis=1))
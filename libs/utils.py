@@ -1,5 +1,6 @@
 import hashlib
 
+from functools import lru_cache
 from math import sqrt
 
 from PyQt5.QtGui import *
@@ -47,7 +48,9 @@ def add_actions(widget, actions):
             widget.addAction(action)
 
 
+@lru_cache(maxsize=1024)
 def generate_color_by_text(text):
+    """The same (shared) color for the same text; callers must not modify it."""
     s = str(text)
     hashCode = int(hashlib.sha256(s.encode('utf-8')).hexdigest(), 16)
     r = int((hashCode / 255) % 255)
@@ -2,13 +2,11 @@
 # -*- coding: utf-8 -*-
 
 import json
-import numpy as np
 import os
 import platform
 import re
 import sys
 import uuid
-import copy
 
 from functools import partial
 from collections import defaultdict
@@ -22,6 +20,22 @@ import resources
 from views.create_palette import color_palette
 
 from libs.constants import *
+from libs.annotation_index import AnnotationIndex, AnnotationIndexer, annotation_index_path, parse_frame_query, \
+    parse_query_bool, query_category_id
+from libs.annotation_store import SqliteAnnotationStore, create_annotation_store
+from libs.annotation_writer import AnnotationWriter
+from libs.box_tracker import BoxTracker
+from libs.detector import DetectionPrefetcher
+from libs.dataset_loader import DatasetLoader, FrameScanner
+from libs.dataset_paths import DirectoryCache, VideoIndex, annotation_directory, \
+    annotation_path as frame_annotation_path, dataset_root_path
+from libs.dataset_writer import DatasetWriter, append_journal, clear_journal, journal_size, read_journal, \
+    truncate_journal, write_dataset
+from libs.frame_source import close_frame_sources, frame_exists, load_frame
+from libs.image_cache import ImageCache, ImagePrefetcher
+from libs.thumbnail_cache import ThumbnailLoader
+from libs.track_presence import TrackPresence
+from libs.interpolation import INTERPOLATION_METHODS, annotation_track_id, fill_track, is_track_id
 from libs.version import __version__
 from libs.settings import Settings
 from libs.string_bundle import StringBundle
@@ -29,15 +43,18 @@ from libs.utils import *
 from views.second_category_list_table_model import SecondCategoryListTableModel
 from views.third_category_list_table_model import ThirdCategoryListTableModel
 
-from views.canvas import Canvas
+from views.gl_canvas import CANVAS_RENDERERS, create_canvas
 from views.category_list_table_model import CategoryListTableModel
 from views.choose_category_dialog import ChooseCategoryDialog
 from views.color_dialog import ColorDialog
 from views.file_list_table_model import FileListTableModel
+from views.filmstrip import Filmstrip, FilmstripModel
+from views.video_tree_model import VideoTreeModel
 from views.label_dialog import LabelDialog
 from views.label_list_table_model import LabelListTableComboBoxDelegate, LabelListTableModel
 from views.shape import Shape
 from views.toolbar import ToolBar
+from views.track_timeline import TrackTimeline
 from views.zoom_widget import ZoomWidget
 
 __appname__ = 'Video Object Annotation Interface'
@@ -76,6 +93,18 @@ class MainWindow(QMainWindow):
     dataset_root_path = None
     image_file_path = None
     current_index = -1
+    video = None
+
+    # Dataset loading
+    dataset_loader = None
+    frame_scanner = None
+    annotation_indexer = None
+    box_tracker = None
+    dataset_accepted = False
+    dataset_pending_images = []
+    dataset_root_changed = False
+    dataset_first_image_opened = False
+    dataset_journal_replaying = False
 
     # Zoom
     zoom_level = 100
@@ -91,6 +120,9 @@ class MainWindow(QMainWindow):
     # Check data has changed or not
     dirty = False
 
+    # Duration of the last annotation write, in seconds
+    last_annotation_write_time = 0
+
     def __init__(self):
         super(MainWindow, self).__init__()
         self.setWindowTitle(__appname__)
@@ -107,6 +139,28 @@ class MainWindow(QMainWindow):
         self.data = None
 
         self.label_coordinates = QLabel('')
+        self.label_image_cache = QLabel('')
+        self.label_save_queue = QLabel('')
+
+        # Video records by id and frames by video, and the annotation directories already created
+        self.video_index = VideoIndex()
+        self.directories = DirectoryCache()
+
+        # Every frame of the dataset in file list order; the file list only shows the frames of the last search
+        self.all_image_paths = []
+        self.annotation_index = AnnotationIndex()
+        # Track x frame presence of the videos shown in the track timeline, made from the index
+        self.track_presences = {}
+
+        # Decoded frames around the current one
+        self.image_cache = ImageCache(DEFAULT_IMAGE_CACHE_SIZE)
+        self.image_prefetcher = ImagePrefetcher(self.image_cache, self)
+        self.image_prefetcher.frame_missing.connect(self.on_frame_missing)
+
+        # Candidate boxes of a detector, computed ahead of the current frame
+        self.detection_prefetcher = DetectionPrefetcher(DEFAULT_DETECTION_WORKERS, self)
+        self.detection_prefetcher.detected.connect(self.on_detected)
+        self.detection_prefetcher.failed.connect(self.on_detection_failed)
 
         # Initial Zoom
         self.zoom_widget = ZoomWidget()
@@ -124,6 +178,18 @@ class MainWindow(QMainWindow):
         self._noSelectionSlot = False
 
         self.palette = color_palette()
+        self.category_colors = {}
+
+        self.annotation_store = None
+        self.annotation_writer = None
+
+        # Background dataset saving, debounced while the user keeps editing
+        self.dataset_writer = None
+        self.dataset_save_pending = False
+        self.dataset_save_timer = QTimer(self)
+        self.dataset_save_timer.setSingleShot(True)
+        self.dataset_save_timer.setInterval(DEFAULT_DATASET_SAVE_DELAY)
+        self.dataset_save_timer.timeout.connect(self.start_dataset_save)
 
         # region Actions
         action = partial(new_action, self)
@@ -188,6 +254,24 @@ class MainWindow(QMainWindow):
         show_action = action(get_string('info'), self.show_info_dialog,
                              None, 'help', get_string('info'))
 
+        confirm_labels_action = action(get_string('confirmBoxes'), self.confirm_labels,
+                                       'Ctrl+Return', None, get_string('confirmBoxesDetail'))
+
+        choose_detector_model_action = action(get_string('chooseDetectorModel'), self.choose_detector_model,
+                                              None, 'open', get_string('chooseDetectorModelDetail'))
+
+        interpolate_track_action = action(get_string('interpolateTrack'), self.interpolate_track,
+                                          'Ctrl+T', None, get_string('interpolateTrackDetail'))
+
+        choose_canvas_renderer_action = action(get_string('chooseCanvasRenderer'), self.choose_canvas_renderer,
+                                               None, None, get_string('chooseCanvasRendererDetail'))
+
+        import_json_annotations_action = action(get_string('importJsonAnnotations'), self.import_json_annotations,
+                                                None, 'open', get_string('importJsonAnnotationsDetail'))
+
+        export_json_annotations_action = action(get_string('exportJsonAnnotations'), self.export_json_annotations,
+                                                None, 'save', get_string('exportJsonAnnotationsDetail'))
+
         # Zooms
         zoom_action = QWidgetAction(self)
         zoom_action.setDefaultWidget(self.zoom_widget)
@@ -211,6 +295,34 @@ class MainWindow(QMainWindow):
         self.auto_saving_option = action(get_string('autoSaveMode'), None, None, None, None,
                                          checkable=True)
 
+        # Annotation store : one sqlite file per video instead of one json file per frame
+        self.sqlite_store_option = action(get_string('sqliteStoreMode'), self.toggle_annotation_store, None, None, None,
+                                          checkable=True)
+
+        # Journal : record has_gt changes in a sidecar file instead of rewriting the dataset
+        self.journal_dataset_option = action(get_string('journalDatasetMode'), None, None, None, None,
+                                             checkable=True)
+
+        # Lazy frame checks : list every frame of the dataset file, and only check the frames when they are opened
+        self.lazy_frame_check_option = action(get_string('lazyFrameCheckMode'), None, None, None, None,
+                                              checkable=True)
+
+        # With lazy frame checks, look for the missing frames in the background once the dataset is loaded
+        self.scan_missing_frames_option = action(get_string('scanMissingFramesMode'), None, None, None, None,
+                                                 checkable=True)
+
+        # Propagation : carry the boxes over to the next frame when it has none
+        self.propagate_boxes_option = action(get_string('propagateBoxesMode'), None, None, None, None,
+                                             checkable=True)
+
+        # Refine the propagated boxes by template matching on a worker thread
+        self.track_boxes_option = action(get_string('trackBoxesMode'), None, None, None, None,
+                                         checkable=True)
+
+        # Pre-annotation : show the boxes of a detector on frames without annotations
+        self.pre_annotate_option = action(get_string('preAnnotateMode'), self.toggle_pre_annotation, None, None,
+                                          None, checkable=True)
+
         # Add option to enable/disable labels being displayed at the top of bounding boxes
         self.display_label_option = action(get_string('displayLabel'), self.toggle_display_label,
                                            'Ctrl+Shift+P', None, None, checkable=True)
@@ -307,6 +419,12 @@ class MainWindow(QMainWindow):
         # Create and add a widget for showing current file items
         file_list_layout = QVBoxLayout()
         file_list_layout.setContentsMargins(0, 0, 0, 0)
+        self.frame_search = QLineEdit()
+        self.frame_search.setPlaceholderText(get_string('searchFrames'))
+        self.frame_search.setToolTip(get_string('searchFramesDetail'))
+        self.frame_search.setClearButtonEnabled(True)
+        self.frame_search.returnPressed.connect(self.search_frames)
+        file_list_layout.addWidget(self.frame_search)
         file_list_layout.addWidget(self.file_list_table)
 
         file_list_container = QWidget()
@@ -319,13 +437,72 @@ class MainWindow(QMainWindow):
         self.addDockWidget(Qt.RightDockWidgetArea, file_list_dock)
         # endregion
 
+        # region Video Tree
+        self.video_tree_model = VideoTreeModel(file_list_table_model, self.video_index,
+                                               lambda row: self.image_paths[row],
+                                               lambda path: self.images_dict[path]['index'],
+                                               self)
+        self.video_tree = QTreeView()
+        self.video_tree.setModel(self.video_tree_model)
+        self.video_tree.setUniformRowHeights(True)
+        self.video_tree.doubleClicked.connect(self.on_video_tree_double_clicked)
+
+        video_tree_dock = QDockWidget(get_string('videoList'), self)
+        video_tree_dock.setObjectName('videoList')
+        video_tree_dock.setWidget(self.video_tree)
+        video_tree_dock.setFeatures(QDockWidget.DockWidgetFloatable)
+
+        self.addDockWidget(Qt.RightDockWidgetArea, video_tree_dock)
+        self.tabifyDockWidget(file_list_dock, video_tree_dock)
+        file_list_dock.raise_()
+        # endregion
+
+        # region Filmstrip
+        self.thumbnail_loader = ThumbnailLoader(DEFAULT_THUMBNAIL_COUNT, DEFAULT_THUMBNAIL_SIZE, self)
+        self.filmstrip = Filmstrip(self.thumbnail_loader)
+        filmstrip_model = FilmstripModel(self.thumbnail_loader,
+                                         lambda row: self.image_paths[row],
+                                         lambda path: self.images_dict[path].get('index') if path in self.images_dict else None,
+                                         self)
+        filmstrip_model.setSourceModel(file_list_table_model)
+        self.filmstrip.setModel(filmstrip_model)
+        self.filmstrip.clicked.connect(self.on_filmstrip_clicked)
+
+        filmstrip_dock = QDockWidget(get_string('filmstrip'), self)
+        filmstrip_dock.setObjectName('filmstrip')
+        filmstrip_dock.setWidget(self.filmstrip)
+        filmstrip_dock.setFeatures(QDockWidget.DockWidgetFloatable | QDockWidget.DockWidgetClosable)
+
+        self.addDockWidget(Qt.BottomDockWidgetArea, filmstrip_dock)
+        # endregion
+
+        # region Track Timeline
+        self.track_timeline = TrackTimeline()
+        self.track_timeline.frame_clicked.connect(self.on_track_timeline_clicked)
+        track_timeline_scroll = QScrollArea()
+        track_timeline_scroll.setWidget(self.track_timeline)
+        track_timeline_scroll.setWidgetResizable(True)
+
+        track_timeline_dock = QDockWidget(get_string('trackTimeline'), self)
+        track_timeline_dock.setObjectName('trackTimeline')
+        track_timeline_dock.setWidget(track_timeline_scroll)
+        track_timeline_dock.setFeatures(QDockWidget.DockWidgetFloatable | QDockWidget.DockWidgetClosable)
+
+        self.addDockWidget(Qt.BottomDockWidgetArea, track_timeline_dock)
+        self.tabifyDockWidget(filmstrip_dock, track_timeline_dock)
+        filmstrip_dock.raise_()
+        # endregion
+
         # region Canvas
 
-        self.canvas = Canvas(parent=self)
+        renderer_settings = Settings()
+        renderer_settings.load()
+        self.canvas = create_canvas(renderer_settings.get(SETTING_CANVAS_RENDERER, DEFAULT_CANVAS_RENDERER),
+                                    parent=self)
         self.canvas.zoom_request.connect(self.zoom_request)
         self.canvas.scroll_request.connect(self.scroll_request)
         self.canvas.new_shape.connect(self.new_shape)
-        self.canvas.shape_moved.connect(self.set_dirty)
+        self.canvas.shape_moved.connect(self.on_shape_moved)
         self.canvas.selection_changed.connect(self.shape_selection_changed)
         self.canvas.drawingPolygon.connect(self.toggle_drawing_sensitive)
 
@@ -352,12 +529,19 @@ class MainWindow(QMainWindow):
                                          save_label_list_action,
                                          save_dataset_action,
                                          export_canvas_action,
+                                         None,
+                                         import_json_annotations_action,
+                                         export_json_annotations_action,
+                                         choose_detector_model_action,
+                                         None,
                                          reset_all_action,
                                          quit_action))
 
         add_actions(self.menu('&Edit'), (create_shape_action,
                                          copy_shape_action,
                                          delete_shape_action,
+                                         interpolate_track_action,
+                                         confirm_labels_action,
                                          None,
                                          change_line_thickness_action,
                                          change_font_size_action,
@@ -365,7 +549,15 @@ class MainWindow(QMainWindow):
                                          self.draw_squares_option))
 
         add_actions(self.menu('&View'), (self.auto_saving_option,
+                                         self.sqlite_store_option,
+                                         self.journal_dataset_option,
+                                         self.lazy_frame_check_option,
+                                         self.scan_missing_frames_option,
+                                         self.propagate_boxes_option,
+                                         self.track_boxes_option,
+                                         self.pre_annotate_option,
                                          self.display_label_option,
+                                         choose_canvas_renderer_action,
                                          None,
                                          zoom_in_action,
                                          zoom_out_action,
@@ -381,7 +573,9 @@ class MainWindow(QMainWindow):
         # region Canvas Menus
         add_actions(self.canvas.menus[0], (create_shape_action,
                                            copy_shape_action,
-                                           delete_shape_action))
+                                           delete_shape_action,
+                                           interpolate_track_action,
+                                           confirm_labels_action))
         # endregion
 
         # region toolbox
@@ -420,6 +614,8 @@ class MainWindow(QMainWindow):
         # region Status Bar
         self.statusBar().showMessage('%s started.' % __appname__)
         self.statusBar().show()
+        self.statusBar().addPermanentWidget(self.label_save_queue)
+        self.statusBar().addPermanentWidget(self.label_image_cache)
         self.statusBar().addPermanentWidget(self.label_coordinates)
         # endregion
 
@@ -457,9 +653,9 @@ class MainWindow(QMainWindow):
         self.settings.load()
         settings = self.settings
         # Canvas and Shape
-        Shape.line_color = self.line_color = QColor(settings.get(SETTING_LINE_COLOR,
+        Shape.default_line_color = self.line_color = QColor(settings.get(SETTING_LINE_COLOR,
                                                                  DEFAULT_LINE_COLOR))
-        Shape.fill_color = self.fill_color = QColor(settings.get(SETTING_FILL_COLOR,
+        Shape.default_fill_color = self.fill_color = QColor(settings.get(SETTING_FILL_COLOR,
                                                                  DEFAULT_FILL_COLOR))
         self.canvas.setDrawingShapeToSquare(settings.get(SETTING_DRAW_SQUARE,
                                                          False))
@@ -487,6 +683,32 @@ class MainWindow(QMainWindow):
         self.draw_squares_option.setChecked(settings.get(SETTING_DRAW_SQUARE,
                                                          False))
 
+        # Dataset journal
+        self.journal_dataset_option.setChecked(settings.get(SETTING_DATASET_JOURNAL,
+                                                            False))
+
+        # Frame checks
+        self.lazy_frame_check_option.setChecked(settings.get(SETTING_LAZY_FRAME_CHECK,
+                                                             False))
+        self.scan_missing_frames_option.setChecked(settings.get(SETTING_SCAN_MISSING_FRAMES,
+                                                                True))
+
+        # Propagation
+        self.propagate_boxes_option.setChecked(settings.get(SETTING_PROPAGATE_BOXES,
+                                                            False))
+        self.track_boxes_option.setChecked(settings.get(SETTING_TRACK_BOXES,
+                                                        False))
+
+        # Pre-annotation
+        self.pre_annotate_option.setChecked(settings.get(SETTING_PRE_ANNOTATE,
+                                                         False))
+        self.toggle_pre_annotation()
+
+        # Annotation store
+        self.sqlite_store_option.setChecked(settings.get(SETTING_ANNOTATION_STORE,
+                                                         DEFAULT_ANNOTATION_STORE) == 'sqlite')
+        self.toggle_annotation_store()
+
     def no_shapes(self):
         return not self.uid_to_shapes_dict
 
@@ -535,6 +757,9 @@ class MainWindow(QMainWindow):
         self.label_list_table.model().toggle_visible_all(value)
 
     def reset_all(self):
+        self.stop_dataset_loader()
+        self.stop_frame_scanner()
+        self.stop_annotation_indexer()
         self.settings.reset()
         self.load_settings()
         self.reset_state()
@@ -542,6 +767,7 @@ class MainWindow(QMainWindow):
         self.names_to_categories_dict.clear()
         self.category_ids_to_names_dict.clear()
         self.category_list_table.model().clear()
+        self.category_colors = {}
 
         self.names_to_second_categories_dict.clear()
         self.second_category_ids_to_names_dict.clear()
@@ -556,7 +782,12 @@ class MainWindow(QMainWindow):
         self.current_image = None
         self.category_names = []
         self.image_paths = []
+        self.all_image_paths = []
         self.images_dict = {}
+        self.video_index.clear_frames()
+        self.annotation_index = AnnotationIndex()
+        self.track_presences = {}
+        self.track_timeline.setPresence(None)
         self.file_list_table.model().clear()
 
     # region Override Qt Events
@@ -582,6 +813,16 @@ class MainWindow(QMainWindow):
 
         if not self.may_continue():
             event.ignore()
+        else:
+            self.stop_dataset_loader()
+            self.stop_frame_scanner()
+            self.stop_annotation_indexer()
+            self.stop_box_tracker()
+            self.canvas.stopPyramidBuilder()
+            self.image_prefetcher.stop()
+            self.thumbnail_loader.stop()
+            self.detection_prefetcher.stop()
+            close_frame_sources()
 
         # Save settings
         settings = self.settings
@@ -593,8 +834,20 @@ class MainWindow(QMainWindow):
         settings[SETTING_DRAW_SQUARE] = self.draw_squares_option.isChecked()
         settings[SETTING_LINE_THICKNESS] = self.canvas.line_thickness
         settings[SETTING_FONT_SIZE] = self.canvas.font_size
+        settings[SETTING_ANNOTATION_STORE] = self.annotation_store_name()
+        settings[SETTING_DATASET_JOURNAL] = self.journal_dataset_option.isChecked()
+        settings[SETTING_LAZY_FRAME_CHECK] = self.lazy_frame_check_option.isChecked()
+        settings[SETTING_SCAN_MISSING_FRAMES] = self.scan_missing_frames_option.isChecked()
+        settings[SETTING_PROPAGATE_BOXES] = self.propagate_boxes_option.isChecked()
+        settings[SETTING_TRACK_BOXES] = self.track_boxes_option.isChecked()
+        settings[SETTING_PRE_ANNOTATE] = self.pre_annotate_option.isChecked()
         settings.save()
 
+        if event.isAccepted():
+            # Flush queued annotation writes before exiting
+            self.annotation_writer.stop()
+            self.annotation_store.close()
+
     # endregion
 
     # region Settings
@@ -607,7 +860,7 @@ class MainWindow(QMainWindow):
             return
 
         self.line_color = color
-        Shape.line_color = color
+        Shape.default_line_color = color
         self.canvas.setDrawingColor(color)
         self.canvas.update()
 
@@ -735,14 +988,10 @@ class MainWindow(QMainWindow):
         bar.setValue(bar.value() + bar.singleStep() * units)
 
     def generate_color(self, text):
-        if len(self.names_to_categories_dict) > 0:
-            id = self.names_to_categories_dict[text]['id']
-            if id > np.max(list(self.palette.keys())):
-                return generate_color_by_text(text)
-            else:
-                return QColor(self.palette[id][0], self.palette[id][1], self.palette[id][2], 200)
-        else:
+        color = self.category_colors.get(text)
+        if color is None:
             return generate_color_by_text(text)
+        return color
 
     def new_shape(self):
         text = None
@@ -832,7 +1081,13 @@ class MainWindow(QMainWindow):
 
     # region Labels
     def add_label(self, shape, id=-1, track_id=-1, trackable=True, second_category=None, third_category=None):
+        row = self.make_label_row(shape, id, track_id, trackable, second_category, third_category)
+        self.label_list_table.model().extend([row])
+
+    def make_label_row(self, shape, id=-1, track_id=-1, trackable=True, second_category=None, third_category=None,
+                       confirmed=True, interpolated=False):
         shape.paintLabel = self.display_label_option.isChecked()
+        shape.interpolated = interpolated
 
         uid = str(uuid.uuid4())
         self.uid_to_shapes_dict[uid] = shape
@@ -858,8 +1113,9 @@ class MainWindow(QMainWindow):
                     third_category = third_category_name
                     break
 
-        self.label_list_table.model().append(uid, shape.category, id, track_id, trackable=trackable, second_category=second_category,
-                                             third_category=third_category)
+        return LabelListTableModel.make_row(uid, shape.category, id, track_id, trackable=trackable,
+                                            second_category=second_category, third_category=third_category,
+                                            confirmed=confirmed, interpolated=interpolated)
 
     def remove_label(self, shape):
         if shape is None:
@@ -869,6 +1125,24 @@ class MainWindow(QMainWindow):
         del self.shapes_to_uids_dict[shape]
         del self.uid_to_shapes_dict[uid]
 
+    def annotation_store_name(self):
+        return 'sqlite' if self.sqlite_store_option.isChecked() else 'json'
+
+    def toggle_annotation_store(self):
+        store = create_annotation_store(self.annotation_store_name())
+        if self.annotation_writer is None:
+            self.annotation_writer = AnnotationWriter(store, self)
+            self.annotation_writer.written.connect(self.on_annotation_written)
+            self.annotation_writer.failed.connect(self.on_annotation_write_failed)
+            self.annotation_writer.start()
+        else:
+            self.annotation_writer.set_store(store)
+        if self.annotation_store is not None:
+            self.annotation_store.close()
+        self.annotation_store = store
+        if self.data is not None:
+            self.start_annotation_indexer()
+
     def toggle_display_label(self):
         for shape in self.canvas.shapes:
             shape.paintLabel = self.display_label_option.isChecked()
@@ -1016,18 +1290,33 @@ class MainWindow(QMainWindow):
 
         self.names_to_categories_dict.clear()
         self.category_ids_to_names_dict.clear()
-        self.category_list_table.model().clear()
+        rows = []
         for c in data['category']:
             if c['name'] in self.names_to_categories_dict:
                 continue
             self.names_to_categories_dict[c['name']] = c
             self.category_ids_to_names_dict[c['id']] = c['name']
             self.category_names.append(c['name'])
-            self.category_list_table.model().append(c['id'], c['name'])
+            rows.append(CategoryListTableModel.make_row(c['id'], c['name']))
+        self.category_list_table.model().reset_with(rows)
+        self.update_category_colors()
+        if self.data is not None:
+            self.start_annotation_indexer()
 
         self.label_list_table.setItemDelegateForColumn(
             4, LabelListTableComboBoxDelegate(self, self.category_names))
 
+    def update_category_colors(self):
+        """One shared color per category: the palette color of its id, or the
+        color of its name for ids outside the palette."""
+        self.category_colors = {}
+        for name, category in self.names_to_categories_dict.items():
+            rgb = self.palette.get(category['id'])
+            if rgb is None:
+                self.category_colors[name] = generate_color_by_text(name)
+            else:
+                self.category_colors[name] = QColor(rgb[0], rgb[1], rgb[2], 200)
+
     def set_second_category(self, data):
         if not self.category_set_name:
             self.category_set_name = data['name']
@@ -1038,13 +1327,15 @@ class MainWindow(QMainWindow):
         self.second_category_ids_to_names_dict.clear()
         self.second_category_names.clear()
 
+        rows = []
         for c in data['category']:
             if c['name'] in self.names_to_second_categories_dict:
                 continue
             self.names_to_second_categories_dict[c['name']] = c
             self.second_category_ids_to_names_dict[c['id']] = c['name']
             self.second_category_names.append(c['name'])
-            self.second_category_list_table.model().append(c['id'], c['name'])
+            rows.append(SecondCategoryListTableModel.make_row(c['id'], c['name']))
+        self.second_category_list_table.model().reset_with(rows)
 
         self.label_list_table.setItemDelegateForColumn(
             5, LabelListTableComboBoxDelegate(self, self.second_category_names))
@@ -1059,18 +1350,22 @@ class MainWindow(QMainWindow):
         self.third_category_ids_to_names_dict.clear()
         self.third_category_names.clear()
 
+        rows = []
         for c in data['category']:
             if c['name'] in self.names_to_third_categories_dict:
                 continue
             self.names_to_third_categories_dict[c['name']] = c
             self.third_category_ids_to_names_dict[c['id']] = c['name']
             self.third_category_names.append(c['name'])
-            self.third_category_list_table.model().append(c['id'], c['name'])
+            rows.append(ThirdCategoryListTableModel.make_row(c['id'], c['name']))
+        self.third_category_list_table.model().reset_with(rows)
 
         self.label_list_table.setItemDelegateForColumn(
             6, LabelListTableComboBoxDelegate(self, self.third_category_names))
 
     def filter_dataset_dialog(self):
+        if self.data is not None:
+            self.sync_has_gt()
         if self.image_file_path is not None:
             path = self.image_file_path
         else:
@@ -1082,7 +1377,7 @@ class MainWindow(QMainWindow):
         dirpath = dirpath.replace('\\', '/')
         idx_keep = []
         idx_remove = []
-        for idx, path in enumerate(self.image_paths):
+        for idx, path in enumerate(self.all_image_paths):
             dirname = os.path.dirname(path)
             dirname = dirname.replace('\\', '/')
             if dirname == dirpath:
@@ -1096,17 +1391,19 @@ class MainWindow(QMainWindow):
 
         self.current_image = None
         self.image_file_path = None
-        self.image_paths_temp = self.image_paths
+        self.image_paths_temp = self.all_image_paths
         self.image_paths = []
         self.file_list_table.model().clear()
 
         self.images_dict_temp = self.images_dict
         self.images_dict = {}
+        self.video_index.clear_frames()
         if len(idx_keep) == 0:
             self.image_paths = []
             self.file_list_table.model().clear()
             self.images_dict = {}
         else:
+            rows = []
             for idx in idx_keep:
                 path = self.image_paths_temp[idx]
 
@@ -1117,10 +1414,16 @@ class MainWindow(QMainWindow):
 
                 self.images_dict[path]['index'] = len(self.image_paths)
                 self.image_paths.append(path)
+                self.video_index.add_frame(image_dict.get('video_id'), path)
 
-                self.file_list_table.model().append(
-                    image_dict['id'], image_dict['has_gt'], image_dict['file_name'])
+                rows.append(FileListTableModel.make_row(
+                    image_dict['id'], image_dict['has_gt'], image_dict['file_name']))
+            self.file_list_table.model().reset_with(rows)
             self.open_next_image()
+        self.all_image_paths = list(self.image_paths)
+        self.frame_search.clear()
+        if self.data is not None:
+            self.set_dataset_images()
 
         self.dataset_info_path = os.path.dirname(self.dataset_info_path)
         if not os.path.exists(self.dataset_info_path):
@@ -1138,33 +1441,82 @@ class MainWindow(QMainWindow):
         file_name = QFileDialog.getOpenFileName(self,
                                                 '%s - Choose Json file' % __appname__,
                                                 path, filters)
+        if isinstance(file_name, (list, tuple)):
+            file_name = file_name[0]
         if not file_name:
             return
 
-        data = {}
-        try:
-            if isinstance(file_name, (list, tuple)):
-                file_name = file_name[0]
-            with open(file_name) as f:
-                data = json.load(f)
-        except Exception as e:
-            self.error_message(
-                u'<p><b>%s</b></p><p>Make sure <i>%s</i> is a valid json file.' % (e, file_name))
-            self.status('Error reading %s' % file_name)
+        if self.dataset_save_timer.isActive():
+            self.save_dataset()
+        self.wait_dataset_writer()
+        self.stop_dataset_loader()
+        self.stop_frame_scanner()
+        self.stop_annotation_indexer()
+        self.dataset_accepted = False
+        self.dataset_pending_images = []
+        self.dataset_loader = DatasetLoader(file_name, not self.lazy_frame_check_option.isChecked(), self)
+        self.dataset_loader.header_loaded.connect(self.on_dataset_header_loaded)
+        self.dataset_loader.images_loaded.connect(self.on_dataset_images_loaded)
+        self.dataset_loader.loading_finished.connect(self.on_dataset_loading_finished)
+        self.dataset_loader.loading_failed.connect(self.on_dataset_loading_failed)
+        self.dataset_loader.start()
+        self.status('Loading %s' % file_name, 0)
+
+    def stop_dataset_loader(self):
+        if self.dataset_loader is None:
+            return
+        loader = self.dataset_loader
+        self.dataset_loader = None
+        loader.requestInterruption()
+        loader.wait()
+
+    def start_frame_scanner(self):
+        self.stop_frame_scanner()
+        self.frame_scanner = FrameScanner(list(self.image_paths), self)
+        self.frame_scanner.frames_missing.connect(self.on_frames_missing)
+        self.frame_scanner.finished.connect(self.on_frame_scanner_finished)
+        self.frame_scanner.finished.connect(self.frame_scanner.deleteLater)
+        self.frame_scanner.start()
+
+    def on_frame_scanner_finished(self):
+        if self.sender() is self.frame_scanner:
+            self.frame_scanner = None
+
+    def stop_frame_scanner(self):
+        if self.frame_scanner is None:
             return
+        scanner = self.frame_scanner
+        self.frame_scanner = None
+        scanner.requestInterruption()
+        scanner.wait()
 
-        if not ('info' in data and 'root_dir' in data['info']):
-            self.error_message('Invalid dataset file.')
+    def on_frames_missing(self, paths):
+        if self.sender() is not self.frame_scanner:
             return
+        self.set_frames_missing(paths)
 
-        dataset_info_path = file_name
-        self.data = data
+    def on_frame_missing(self, path):
+        self.set_frames_missing([path])
+
+    def set_frames_missing(self, paths):
+        # Frames hidden by a search have no row
+        rows = [self.images_dict[path].get('index') for path in paths if path in self.images_dict]
+        self.file_list_table.model().set_missing([row for row in rows if row is not None])
+
+    def accept_dataset(self, data):
+        file_name = self.dataset_loader.file_name
+
+        if not ('info' in data and 'root_dir' in data['info']):
+            self.stop_dataset_loader()
+            self.error_message('Invalid dataset file.')
+            return False
 
         root_directory_path = data['info']['root_dir']
 
         if not os.path.exists(root_directory_path):
+            self.stop_dataset_loader()
             self.error_message('Dataset path is not exists.')
-            return
+            return False
         # clear canvas here
         self.shapes_to_uids_dict.clear()
         self.uid_to_shapes_dict.clear()
@@ -1172,57 +1524,279 @@ class MainWindow(QMainWindow):
         self.label_coordinates.clear()
 
         root_directory_path = root_directory_path.replace('\\', '/')
-        file_name = file_name.replace('\\', '/')
-        temp_path = os.path.dirname(os.path.dirname(file_name))
-
-        if temp_path != root_directory_path:
-            root_directory_path = temp_path
-            data['info']['root_dir'] = root_directory_path
-            with open(file_name, 'w') as f:
-                info = json.dumps(data)
-                f.write(info)
-                f.close()
-
-        self.dataset_root_path = root_directory_path
+        temp_path = dataset_root_path(file_name)
 
-        if 'images' not in data:
-            self.error_message('Invalid dataset file.')
-            return
+        # The dataset file is rewritten with the new root once every image has been read
+        self.dataset_root_changed = temp_path != root_directory_path
+        self.dataset_root_path = temp_path
 
-        if 'videos' in data:
-            self.video = data['videos']
-        else:
-            self.video = None
+        self.video = data.get('videos')
+        self.video_index.set_videos(self.video)
+        self.video_index.clear_frames()
+        self.directories.clear()
+        self.data = None
+        self.dataset_info_path = None
+        self.actions.save_dataset.setEnabled(False)
 
         self.image_paths = []
+        self.all_image_paths = []
         self.images_dict = {}
+        self.annotation_index = AnnotationIndex()
+        self.track_presences = {}
+        self.track_timeline.setPresence(None)
+        self.frame_search.clear()
         self.current_image = None
         self.image_file_path = None
+        self.dataset_first_image_opened = False
+        self.image_cache.clear()
+        # Containers and existence checks of the previous dataset
+        close_frame_sources()
 
         self.file_list_table.model().clear()
 
-        for data_row in data['images']:
-            path = os.path.join(root_directory_path, data_row['file_name'])
-            if not os.path.exists(path):
-                continue
+        self.dataset_accepted = True
+        return True
 
+    def add_dataset_images(self, images):
+        rows = []
+        for path, data_row in images:
             data_row['index'] = len(self.image_paths)
             self.images_dict[path] = data_row
             self.image_paths.append(path)
+            self.all_image_paths.append(path)
+            self.video_index.add_frame(data_row.get('video_id'), path)
 
-            self.file_list_table.model().append(self.images_dict[path]['id'],
-                                                self.images_dict[path]['has_gt'],
-                                                self.images_dict[path]['file_name'])
+            rows.append(FileListTableModel.make_row(data_row['id'],
+                                                    data_row['has_gt'],
+                                                    data_row['file_name']))
+        self.file_list_table.model().extend(rows)
 
-        self.information_message(
-            'Open dataset file <i>%s</i> successfully.' % file_name)
+        # Frames can only be annotated once the videos are known, since they decide the annotation path
+        if not self.dataset_first_image_opened and self.video is not None and self.image_paths:
+            self.dataset_first_image_opened = True
+            self.open_next_image()
+
+    def on_dataset_header_loaded(self, data):
+        if self.sender() is not self.dataset_loader:
+            return
+        if 'info' in data:
+            self.accept_dataset(data)
+
+    def on_dataset_images_loaded(self, images):
+        if self.sender() is not self.dataset_loader:
+            return
+        if self.dataset_accepted:
+            self.add_dataset_images(images)
+        else:
+            self.dataset_pending_images.extend(images)
+
+    def on_dataset_loading_finished(self, data):
+        if self.sender() is not self.dataset_loader:
+            return
+        if not self.dataset_accepted:
+            if not self.accept_dataset(data):
+                return
+            self.add_dataset_images(self.dataset_pending_images)
+            self.dataset_pending_images = []
 
-        self.dataset_info_path = dataset_info_path
+        file_name = self.dataset_loader.file_name
+        check_frames = self.dataset_loader.check_frames
+        self.dataset_loader = None
+
+        if 'images' not in data:
+            self.error_message('Invalid dataset file.')
+            return
+
+        if self.dataset_root_changed:
+            data['info']['root_dir'] = self.dataset_root_path
+            write_dataset(file_name, data, data['images'])
+
+        self.data = data
+        self.set_dataset_images()
+        if self.video is None and 'videos' in data:
+            self.video = data['videos']
+            self.video_index.set_videos(self.video)
+
+        self.status('Open dataset file %s successfully.' % file_name)
+        if not check_frames and self.scan_missing_frames_option.isChecked():
+            self.start_frame_scanner()
+
+        self.dataset_info_path = file_name
+        self.start_annotation_indexer()
+        self.replay_dataset_journal()
         self.actions.save_dataset.setEnabled(True)
-        self.open_next_image()
+        if not self.dataset_first_image_opened:
+            self.dataset_first_image_opened = True
+            self.open_next_image()
+
+    def on_dataset_loading_failed(self, message):
+        if self.sender() is not self.dataset_loader:
+            return
+        file_name = self.dataset_loader.file_name
+        self.dataset_loader = None
+        self.error_message(
+            u'<p><b>%s</b></p><p>Make sure <i>%s</i> is a valid json file.' % (message, file_name))
+        self.status('Error reading %s' % file_name)
+
+    def open_image_file_propagated(self, current_index, file_path):
+        """Open a neighbouring frame, carrying the boxes of the current frame
+        over when it has none and the propagation mode is on."""
+        previous_image = self.current_image
+        previous_frame = self.image
+        annotations = self.label_list_annotations() if self.current_image is not None else []
+
+        if not self.open_image_file(current_index, file_path):
+            return False
+        if not self.propagate_boxes_option.isChecked() or not annotations:
+            return True
+        if any(row['confirmed'] for row in self.label_list_table.model().table_data):
+            return True
+        if previous_image['video_id'] != self.current_image['video_id']:
+            return True
+
+        # Boxes carried over from the previous frame replace detector candidates
+        self.remove_unconfirmed_labels()
+        # Carried boxes are keyframes of their own
+        self.load_annotations([dict(a, image_id=self.current_image['id'], interpolated=False) for a in annotations])
+        self.set_dirty()
+        if self.track_boxes_option.isChecked():
+            self.start_box_tracker(previous_frame)
+        return True
+
+    def toggle_pre_annotation(self):
+        if not self.pre_annotate_option.isChecked():
+            self.detection_prefetcher.set_detector(None, None)
+            self.remove_unconfirmed_labels()
+            return
+        name = self.settings.get(SETTING_DETECTOR, DEFAULT_DETECTOR)
+        options = self.settings.get(SETTING_DETECTOR_OPTIONS, {})
+        if name == DEFAULT_DETECTOR and 'model' not in options:
+            # The model is asked for once, and kept in the settings
+            if not self.choose_detector_model():
+                self.pre_annotate_option.setChecked(False)
+            return
+        self.detection_prefetcher.set_detector(name, options)
+        if self.current_image is not None:
+            self.prefetch_detections(self.current_index)
+            self.load_detections()
+
+    def choose_canvas_renderer(self):
+        current = self.settings.get(SETTING_CANVAS_RENDERER, DEFAULT_CANVAS_RENDERER)
+        renderer, ok = QInputDialog.getItem(self, get_string('chooseCanvasRenderer'),
+                                            get_string('chooseCanvasRendererDetail'), CANVAS_RENDERERS,
+                                            CANVAS_RENDERERS.index(current) if current in CANVAS_RENDERERS else 0,
+                                            False)
+        if not ok or renderer == current:
+            return
+        self.settings[SETTING_CANVAS_RENDERER] = renderer
+        self.status('The %s renderer will be used after a restart' % renderer)
+
+    def choose_detector_model(self):
+        filters = 'Detection models (*.onnx *.pb *.caffemodel *.weights *.t7 *.net)'
+        file_name = QFileDialog.getOpenFileName(self, '%s - Choose detection model' % __appname__, '.', filters)
+        if isinstance(file_name, (list, tuple)):
+            file_name = file_name[0]
+        if not file_name:
+            return False
+        self.settings[SETTING_DETECTOR] = DEFAULT_DETECTOR
+        self.settings[SETTING_DETECTOR_OPTIONS] = {'model': file_name}
+        if not self.pre_annotate_option.isChecked():
+            self.pre_annotate_option.setChecked(True)
+        self.toggle_pre_annotation()
+        return True
+
+    def prefetch_detections(self, current_index):
+        if not self.pre_annotate_option.isChecked():
+            return
+        self.detection_prefetcher.prefetch(self.image_paths[current_index:current_index + 1 + DEFAULT_DETECTION_AHEAD])
+
+    def load_detections(self):
+        """Show the candidates of the detector on a frame without annotations."""
+        if not self.pre_annotate_option.isChecked() or self.image_file_path is None:
+            return
+        if self.label_list_table.model().rowCount(QModelIndex()) > 0:
+            return
+        detections = self.detection_prefetcher.result(self.image_file_path)
+        if not detections:
+            return
+        annotations = []
+        for detection in detections:
+            if detection['category_id'] not in self.category_ids_to_names_dict:
+                continue
+            x, y, w, h = detection['bbox']
+            annotations.append({'id': -1,
+                                'track_id': -1,
+                                'category_id': detection['category_id'],
+                                'bbox': {'x': x, 'y': y, 'w': w, 'h': h}})
+        self.load_annotations(annotations, confirmed=False)
+
+    def on_detected(self, path, detections):
+        if path == self.image_file_path:
+            self.load_detections()
+
+    def on_detection_failed(self, path, message):
+        self.status('Detection failed on %s: %s' % (os.path.basename(path), message))
+
+    def confirm_labels(self):
+        model = self.label_list_table.model()
+        model.update_rows({row['uid']: {'confirmed': True} for row in model.table_data if not row['confirmed']})
+
+    def remove_unconfirmed_labels(self):
+        model = self.label_list_table.model()
+        uids = [row['uid'] for row in model.table_data if not row['confirmed']]
+        if not uids:
+            return
+        model.remove_rows(uids)
+        for uid in uids:
+            shape = self.uid_to_shapes_dict.pop(uid)
+            del self.shapes_to_uids_dict[shape]
+        self.canvas.load_shapes([self.uid_to_shapes_dict[row['uid']] for row in model.table_data])
+
+    def start_box_tracker(self, previous_frame):
+        self.stop_box_tracker()
+        boxes = [(row['uid'], self.uid_to_shapes_dict[row['uid']].bounds())
+                 for row in self.label_list_table.model().table_data]
+        self.box_tracker = BoxTracker(previous_frame, self.image, boxes, self)
+        self.box_tracker.tracked.connect(self.on_boxes_tracked)
+        self.box_tracker.finished.connect(self.on_box_tracker_finished)
+        self.box_tracker.finished.connect(self.box_tracker.deleteLater)
+        self.box_tracker.start()
+
+    def on_box_tracker_finished(self):
+        # The tracker is deleted once finished, whether it tracked the boxes or gave up
+        if self.sender() is self.box_tracker:
+            self.box_tracker = None
+
+    def stop_box_tracker(self):
+        if self.box_tracker is None:
+            return
+        tracker = self.box_tracker
+        self.box_tracker = None
+        tracker.requestInterruption()
+        tracker.wait()
+
+    def on_boxes_tracked(self, boxes):
+        if self.sender() is not self.box_tracker:
+            return
+        self.box_tracker = None
+        for uid, before, after in boxes:
+            shape = self.uid_to_shapes_dict.get(uid)
+            # Leave boxes alone once the frame changed or the user moved them
+            if shape is None or shape.bounds() != before:
+                continue
+            shape.setBox(*after)
+            self.canvas.indexShape(shape)
+        self.canvas.update()
 
     def open_image_file(self, current_index, file_path=None):
         """Load the specified file, or the last opened file if None."""
+        # Frames are only checked here when the dataset was opened with lazy checks;
+        # the current frame stays open
+        if file_path is not None and not frame_exists(file_path):
+            self.set_frames_missing([file_path])
+            self.status('Missing %s' % file_path)
+            return False
+
         self.reset_state()
         self.image_file_path = None
         self.current_image = None
@@ -1231,17 +1805,23 @@ class MainWindow(QMainWindow):
         if file_path is None:
             return False
 
-        if not (file_path and os.path.exists(file_path)):
-            return False
-
         index = self.file_list_table.model().index(current_index, 0)
         self.file_list_table.model().setCurrentRow(current_index)
+        self.filmstrip.showFrame(current_index)
+        video_tree_index = self.video_tree_model.index_of_path(file_path)
+        self.video_tree.setCurrentIndex(video_tree_index)
+        self.video_tree.scrollTo(video_tree_index)
         self.current_index = current_index
 
-        image_data = read(file_path, None)
         self.canvas.verified = False
 
-        image = QImage.fromData(image_data)
+        image = self.image_cache.get(file_path)
+        if image is None:
+            image = load_frame(file_path)
+            self.image_cache.put(file_path, image)
+        self.prefetch_images(current_index)
+        self.update_image_cache_status()
+
         if image.isNull():
             self.error_message(
                 u'<p>Make sure <i>%s</i> is a valid image file.' % file_path)
@@ -1251,14 +1831,17 @@ class MainWindow(QMainWindow):
         self.image = image
         self.image_file_path = file_path
         self.current_image = self.images_dict[self.image_file_path]
+        self.show_track_timeline()
 
         # clear data
         self.set_clean()
 
         # drawing
-        self.canvas.loadPixmap(QPixmap.fromImage(image))
+        self.canvas.loadPixmap(QPixmap.fromImage(image), image)
         self.paint_canvas()
         self.open_annotation_file()
+        self.prefetch_detections(current_index)
+        self.load_detections()
 
         # focusing
         self.canvas.setEnabled(True)
@@ -1270,19 +1853,36 @@ class MainWindow(QMainWindow):
 
         return True
 
+    def prefetch_images(self, current_index):
+        next_paths = self.image_paths[current_index + 1:current_index + 1 + DEFAULT_PREFETCH_NEXT]
+        previous_paths = self.image_paths[max(0, current_index - DEFAULT_PREFETCH_PREVIOUS):current_index]
+        self.image_prefetcher.prefetch(next_paths + previous_paths[::-1])
+
+    def update_image_cache_status(self):
+        cache = self.image_cache
+        self.label_image_cache.setText('Cache: %d hits, %d misses, %d MB' %
+                                       (cache.hits, cache.misses, cache.size // (1024 * 1024)))
+
     def open_annotation_file(self):
         annotation_path = self.generate_annotation_path()
-        if not (annotation_path and os.path.exists(annotation_path)):
+        if not annotation_path:
             return
 
-        data = {}
-        with open(annotation_path) as in_file:
-            data = json.load(in_file)
+        # Annotations still waiting in the save queue are newer than the stored ones
+        data = self.annotation_writer.pending(annotation_path)
+        if data is None:
+            if not self.annotation_store.exists(annotation_path):
+                return
+            data = self.annotation_store.load(annotation_path)
 
         if isinstance(data, dict):
             data = data.values()
 
+        self.load_annotations(data)
+
+    def load_annotations(self, data, confirmed=True):
         shapes = []
+        rows = []
         for data_row in data:
             category = self.category_ids_to_names_dict[data_row['category_id']]
             if 'video_ins_id' in data_row.keys():
@@ -1298,11 +1898,9 @@ class MainWindow(QMainWindow):
             x_max = x + bbox['w'] - 1
             y_max = y + bbox['h'] - 1
 
-            shape.addPoint(QPointF(x, y))
-            shape.addPoint(QPointF(x_max, y))
-            shape.addPoint(QPointF(x_max, y_max))
-            shape.addPoint(QPointF(x, y_max))
+            shape.setBox(x, y, x_max, y_max)
             shape.close()
+            shape.confirmed = confirmed
 
             # color = generate_color_by_text(category)
             color = self.generate_color(category)
@@ -1326,14 +1924,17 @@ class MainWindow(QMainWindow):
             if 'trackable' not in data_row.keys():
                 data_row['trackable'] = True
 
-            self.add_label(shape,
-                           id=data_row['id'],
-                           track_id=data_row['track_id'],
-                           trackable=data_row['trackable'],
-                           second_category=second_category,
-                           third_category=third_category)
+            rows.append(self.make_label_row(shape,
+                                            id=data_row['id'],
+                                            track_id=data_row['track_id'],
+                                            trackable=data_row['trackable'],
+                                            second_category=second_category,
+                                            third_category=third_category,
+                                            confirmed=confirmed,
+                                            interpolated=bool(data_row.get('interpolated'))))
             shapes.append(shape)
 
+        self.label_list_table.model().extend(rows)
         self.canvas.load_shapes(shapes)
 
     # endregion
@@ -1356,19 +1957,22 @@ class MainWindow(QMainWindow):
         if not annotation_path:
             return
 
+        annotations = self.label_list_annotations()
+        self.annotation_writer.submit(annotation_path, annotations)
+        self.annotation_index.edit(self.image_file_path, annotations)
+        self.update_track_presence(self.current_image.get('video_id'), [(self.image_file_path, annotations)])
+        self.update_save_queue_status()
+
+        self.set_clean()
+
+    def label_list_annotations(self):
         result = []
         for s in self.label_list_table.model().table_data:
+            if not s['confirmed']:
+                continue
             uid = s['uid']
             shape = self.uid_to_shapes_dict[uid]
-            x_min = y_min = sys.maxsize
-            x_max = y_max = -sys.maxsize - 1
-            for p in shape.points:
-                x = p.x()
-                y = p.y()
-                x_min = min(x, x_min)
-                y_min = min(y, y_min)
-                x_max = max(x, x_max)
-                y_max = max(y, y_max)
+            x_min, y_min, x_max, y_max = shape.bounds()
 
             if s['second_category'] is None:
                 second_category = None
@@ -1380,7 +1984,7 @@ class MainWindow(QMainWindow):
             else:
                 third_category = self.names_to_third_categories_dict[s['third_category']]['id']
 
-            result.append({
+            annotation = {
                 'area': 0,
                 'id': s['id'],
                 'segmentation': [],
@@ -1397,37 +2001,196 @@ class MainWindow(QMainWindow):
                 'category_id': self.names_to_categories_dict[s['category']]['id'],
                 'second_category_id': second_category,
                 'third_category_id': third_category,
-            })
+            }
+            # Interpolated boxes stay so until edited, or they would become keyframes
+            if s['interpolated']:
+                annotation['interpolated'] = True
+            result.append(annotation)
+        return result
+
+    def on_annotation_written(self, annotation_path, elapsed):
+        self.update_save_queue_status(elapsed)
+
+    def on_annotation_write_failed(self, annotation_path, message):
+        self.update_save_queue_status()
+        self.error_message(u'<p><b>%s</b></p><p>Could not save <i>%s</i>.' % (message, annotation_path))
+
+    def update_save_queue_status(self, elapsed=None):
+        if elapsed is not None:
+            self.last_annotation_write_time = elapsed
+        self.label_save_queue.setText('Save queue: %d, last write %.0f ms' %
+                                      (self.annotation_writer.depth(), 1000 * self.last_annotation_write_time))
 
-        with open(annotation_path, 'w') as out_file:
-            json.dump(result, out_file)
+    def save_dataset(self):
+        if self.data is None:
+            return
 
-        self.set_clean()
-        self.statusBar().showMessage('Saved to  %s' % annotation_path)
+        self.dataset_save_timer.stop()
+        self.wait_dataset_writer()
+        self.sync_has_gt()
+        write_dataset(self.dataset_info_path, self.data, self.data['images'])
+        clear_journal(self.dataset_info_path)
+        self.statusBar().showMessage('Saved to  %s' % self.dataset_info_path)
         self.statusBar().show()
 
-    def save_dataset(self):
-        # data = {}
-        # with open(self.dataset_info_path, 'r') as f:
-        #     data = json.load(f)
+    def set_dataset_images(self):
+        """The records saved with the dataset: its frames that are listed, also
+        when hidden by a search. Only needed when they change."""
+        self.data['images'] = [self.images_dict[path] for path in self.all_image_paths]
 
+    def sync_has_gt(self):
+        model = self.file_list_table.model()
+        for row in model.take_dirty_rows():
+            self.images_dict[self.image_paths[row]]['has_gt'] = model.table_data[row]['has_gt']
+
+    def schedule_dataset_save(self):
         if self.data is None:
             return
+        self.dataset_save_timer.start()
 
-        data = self.data
-        data['images'] = []
-        for path in self.image_paths:
-            image_dict = copy.deepcopy(self.images_dict[path])
-            index = image_dict['index']
-            del image_dict['index']
-            has_gt = self.file_list_table.model().table_data[index]['has_gt']
-            image_dict['has_gt'] = has_gt
-            self.images_dict[path]['has_gt'] = has_gt
-            data['images'].append(image_dict)
-        with open(self.dataset_info_path, 'w') as out_file:
-            json.dump(data, out_file)
-        self.statusBar().showMessage('Saved to  %s' % self.dataset_info_path)
-        self.statusBar().show()
+    def start_dataset_save(self):
+        if self.data is None:
+            return
+        if self.dataset_writer is not None:
+            self.dataset_save_pending = True
+            return
+        self.sync_has_gt()
+        data = {k: v for k, v in self.data.items() if k != 'images'}
+        # The records are shared with the writer: this thread only changes their values, never
+        # their keys, and replaces the list rather than changing it. Journal entries up to here
+        # are in the records being written.
+        self.dataset_writer = DatasetWriter(self.dataset_info_path, data, self.data['images'],
+                                            journal_size(self.dataset_info_path), self)
+        self.dataset_writer.saved.connect(self.on_dataset_saved)
+        self.dataset_writer.failed.connect(self.on_dataset_save_failed)
+        self.dataset_writer.start()
+
+    def wait_dataset_writer(self):
+        if self.dataset_writer is None:
+            return
+        writer = self.dataset_writer
+        self.dataset_writer = None
+        self.dataset_save_pending = False
+        writer.wait()
+
+    def on_dataset_saved(self, file_name, elapsed):
+        if self.sender() is not self.dataset_writer:
+            return
+        writer = self.dataset_writer
+        self.dataset_writer = None
+        # The journal would otherwise replay older values over the saved ones
+        try:
+            truncate_journal(file_name, writer.journal_size)
+        except OSError as e:
+            self.error_message(u'<p><b>%s</b></p><p>Could not trim the journal of <i>%s</i>.' % (e, file_name))
+        self.status('Saved to  %s in %.2f s' % (file_name, elapsed))
+        if self.dataset_save_pending:
+            self.dataset_save_pending = False
+            self.start_dataset_save()
+
+    def on_dataset_save_failed(self, message):
+        if self.sender() is not self.dataset_writer:
+            return
+        self.dataset_writer = None
+        self.dataset_save_pending = False
+        self.error_message(u'<p><b>%s</b></p><p>Could not save <i>%s</i>.' % (message, self.dataset_info_path))
+
+    def replay_dataset_journal(self):
+        changes = read_journal(self.dataset_info_path)
+        if not changes:
+            return
+        values = {}
+        for row, path in enumerate(self.image_paths):
+            data_row = self.images_dict[path]
+            if data_row['id'] in changes:
+                data_row['has_gt'] = values[row] = changes[data_row['id']]
+        # The views and the video list counts follow; these changes are already journaled
+        self.dataset_journal_replaying = True
+        try:
+            self.file_list_table.model().set_has_gt(values)
+        finally:
+            self.dataset_journal_replaying = False
+
+    def import_json_annotations(self):
+        video_path = self.current_video_annotation_path()
+        if video_path is None:
+            return
+        if not self.may_continue():
+            return
+        self.annotation_writer.flush()
+        count = self.annotation_store.import_json(video_path)
+        self.status('Imported %d frames from %s' % (count, video_path))
+        self.open_image_file(self.current_index, self.image_file_path)
+
+    def export_json_annotations(self):
+        video_path = self.current_video_annotation_path()
+        if video_path is None:
+            return
+        self.annotation_writer.flush()
+        count = self.annotation_store.export_json(video_path)
+        self.status('Exported %d frames to %s' % (count, video_path))
+
+    def interpolate_track(self):
+        shape = self.canvas.selectedShape
+        if shape is None or self.current_image is None:
+            self.error_message('Error: Select a box of the track to interpolate.')
+            return
+        if not self.category_set_name or not self.dataset_root_path:
+            self.error_message('Error: Dataset may not be loaded.')
+            return
+        # Untracked boxes all share the default id, they are not one track
+        if not is_track_id(shape.track_id):
+            self.error_message('Error: The selected box has no track id.')
+            return
+        method, ok = QInputDialog.getItem(self, 'Interpolate track', 'Method:', INTERPOLATION_METHODS, 0, False)
+        if not ok:
+            return
+
+        # The current frame is a keyframe as soon as it is on disk
+        if self.dirty:
+            self.save_label_list()
+        self.annotation_writer.flush()
+
+        track_id = shape.track_id
+        video_id = self.current_image['video_id']
+        directory = annotation_directory(self.dataset_root_path, self.category_set_name,
+                                         self.video_index.name(video_id))
+        paths = self.video_frame_paths(video_id)
+        frames = []
+        for path in paths:
+            annotation_path = frame_annotation_path(directory, path)
+            annotations = None
+            if self.annotation_store.exists(annotation_path):
+                annotations = self.annotation_store.load(annotation_path)
+                if isinstance(annotations, dict):
+                    annotations = list(annotations.values())
+            frames.append((self.images_dict[path]['id'], annotations))
+
+        changed = fill_track(frames, track_id, method)
+        if not changed:
+            self.status('Track %s needs boxes on two frames to interpolate' % track_id)
+            return
+        try:
+            self.annotation_store.save_many([(frame_annotation_path(directory, paths[position]), annotations)
+                                             for position, annotations in changed])
+        except Exception as e:
+            self.error_message(u'<p><b>%s</b></p><p>Could not save the interpolated frames.' % e)
+            return
+        for position, annotations in changed:
+            self.annotation_index.edit(paths[position], annotations)
+        self.update_track_presence(video_id, [(paths[position], annotations) for position, annotations in changed])
+        self.status('Interpolated %d frames of track %s' % (len(changed), track_id))
+        self.open_image_file(self.current_index, self.image_file_path)
+
+    def current_video_annotation_path(self):
+        if not isinstance(self.annotation_store, SqliteAnnotationStore):
+            self.error_message('Error: Annotations are not stored per video.')
+            return None
+        annotation_path = self.generate_annotation_path()
+        if not annotation_path:
+            self.error_message('Error: Dataset may not be loaded.')
+            return None
+        return os.path.dirname(annotation_path)
 
     def export_canvas(self):
         if not self.category_set_name:
@@ -1454,52 +2217,28 @@ class MainWindow(QMainWindow):
     def generate_canvas_path(self):
         if not self.dataset_root_path:
             return None
-        canvas_path = os.path.join(self.dataset_root_path, 'Canvases')
-        if not os.path.exists(canvas_path):
-            os.makedirs(canvas_path)
+        canvas_path = self.directories.ensure(os.path.join(self.dataset_root_path, 'Canvases'))
         if not self.category_set_name:
             return None
         canvas_path = os.path.join(canvas_path, self.category_set_name)
-        if not os.path.exists(canvas_path):
-            os.makedirs(canvas_path)
-        video_name = None
-        if self.video is not None:
-            for video in self.video:
-                if self.current_image['video_id'] == video['id']:
-                    video_name = video['name']
-                    break
-        if video_name is not None:
-            canvas_path = os.path.join(canvas_path, video_name)
-            if not os.path.exists(canvas_path):
-                os.makedirs(canvas_path)
-        return canvas_path
+        name = self.video_index.name(self.current_image['video_id'])
+        if name is not None:
+            canvas_path = os.path.join(canvas_path, name)
+        return self.directories.ensure(canvas_path)
 
     def generate_annotation_path(self):
         if not self.dataset_root_path:
             return None
-        annotation_path = os.path.join(self.dataset_root_path, 'Annotations')
-        if not os.path.exists(annotation_path):
-            os.makedirs(annotation_path)
         if not self.category_set_name:
             return None
-        annotation_path = os.path.join(annotation_path, self.category_set_name)
-        if not os.path.exists(annotation_path):
-            os.makedirs(annotation_path)
-        video_name = None
-        if self.video is not None:
-            for video in self.video:
-                if self.current_image['video_id'] == video['id']:
-                    video_name = video['name']
-                    break
-        if video_name is not None:
-            annotation_path = os.path.join(annotation_path, video_name)
-            if not os.path.exists(annotation_path):
-                os.makedirs(annotation_path)
+        name = None
+        if self.current_image is not None:
+            name = self.video_index.name(self.current_image['video_id'])
+        annotation_path = self.directories.ensure(
+            annotation_directory(self.dataset_root_path, self.category_set_name, name))
         if not self.image_file_path:
             return None
-        image_name, _ = os.path.splitext(
-            os.path.basename(self.image_file_path))
-        return os.path.join(annotation_path, image_name + '.json')
+        return frame_annotation_path(annotation_path, self.image_file_path)
 
     # endregion
 
@@ -1513,22 +2252,40 @@ class MainWindow(QMainWindow):
         shape = self.uid_to_shapes_dict[uid]
         self.canvas.selectShape(shape)
 
-    def on_label_list_table_item_data_changed(self, row_index, column_index):
-        row = row_index.row()
-        column = column_index.column()
-        cell_data = self.label_list_table.model().table_data[row]
-        shape = self.uid_to_shapes_dict[cell_data['uid']]
-
-        if column == 0:
+    def on_label_list_table_item_data_changed(self, top_left, bottom_right):
+        # Bulk updates of the model report a range of rows and columns
+        for row in range(top_left.row(), bottom_right.row() + 1):
+            cell_data = self.label_list_table.model().table_data[row]
             shape = self.uid_to_shapes_dict[cell_data['uid']]
-            self.canvas.setShapeVisible(shape, cell_data['visible'])
-        else:
-            # shape.line_color = generate_color_by_text(cell_data['category'])
-            shape.line_color = self.generate_color(cell_data['category'])
-            shape.category = cell_data['category']
-            shape.track_id = cell_data['track_id']
+
+            if top_left.column() == 0:
+                self.canvas.setShapeVisible(shape, cell_data['visible'])
+            if bottom_right.column() > 0:
+                # shape.line_color = generate_color_by_text(cell_data['category'])
+                shape.line_color = self.generate_color(cell_data['category'])
+                shape.category = cell_data['category']
+                shape.track_id = cell_data['track_id']
+                shape.confirmed = cell_data['confirmed']
+                self.clear_interpolated(shape)
+        self.set_dirty()
+
+    def on_shape_moved(self):
+        shape = self.canvas.hShape if self.canvas.selectedVertex() else self.canvas.selectedShape
+        if shape is not None:
+            self.clear_interpolated(shape)
         self.set_dirty()
 
+    def clear_interpolated(self, shape):
+        """An interpolated box edited by the user becomes a keyframe."""
+        if not shape.interpolated:
+            return
+        shape.interpolated = False
+        data_row = self.label_list_table.model().get_data(self.shapes_to_uids_dict.get(shape))
+        if data_row is not None:
+            data_row['interpolated'] = False
+            self.label_list_table.viewport().update()
+        self.canvas.update()
+
     # endregion
 
     # region File List Table Events
@@ -1537,7 +2294,19 @@ class MainWindow(QMainWindow):
         indexes = self.file_list_table.selectionModel().selectedIndexes()
         if len(indexes) == 0:
             return
-        current_index = indexes[0].row()
+        self.open_frame(indexes[0].row())
+
+    def on_video_tree_double_clicked(self, index):
+        # A video opens at its first frame
+        path = self.video_tree_model.path_of(index)
+        if path is not None and path != self.image_file_path:
+            self.open_frame(self.images_dict[path]['index'])
+
+    def on_filmstrip_clicked(self, index):
+        if index.row() != self.current_index:
+            self.open_frame(index.row())
+
+    def open_frame(self, current_index):
         path = self.image_paths[current_index]
         if self.auto_saving_option.isChecked() and self.dirty:
             self.save_label_list()
@@ -1548,8 +2317,14 @@ class MainWindow(QMainWindow):
         self.open_image_file(current_index, path)
 
     def on_file_list_table_item_data_changed(self, row_index, column_index):
-        if self.auto_saving_option.isChecked():
-            self.save_dataset()
+        if self.data is None or self.dataset_journal_replaying:
+            return
+        if self.journal_dataset_option.isChecked():
+            model = self.file_list_table.model()
+            cell_data = model.table_data[row_index.row()]
+            append_journal(self.dataset_info_path, [{'id': cell_data['id'], 'has_gt': cell_data['has_gt']}])
+        elif self.auto_saving_option.isChecked():
+            self.schedule_dataset_save()
         # row = row_index.row()
         # column = column_index.column()
         # cell_data = self.file_list_table.model().table_data[row]
@@ -1559,6 +2334,183 @@ class MainWindow(QMainWindow):
 
 
 
+    # endregion
+
+    # region Frame Search
+
+    def start_annotation_indexer(self):
+        """Index the annotations of every frame in the background, starting
+        from the cached index of the dataset."""
+        self.stop_annotation_indexer()
+        self.annotation_index = AnnotationIndex()
+        self.track_presences = {}
+        self.show_track_timeline()
+        if not self.category_set_name or not self.dataset_root_path or not self.dataset_info_path:
+            return
+        videos = defaultdict(list)
+        for path in self.all_image_paths:
+            videos[self.images_dict[path].get('video_id')].append(path)
+        tasks = [(annotation_directory(self.dataset_root_path, self.category_set_name, self.video_index.name(video_id)),
+                  frames)
+                 for video_id, frames in videos.items()]
+        cache_path = annotation_index_path(self.dataset_info_path, self.category_set_name, self.annotation_store_name())
+        self.annotation_indexer = AnnotationIndexer(self.annotation_index, cache_path, tasks,
+                                                    self.annotation_store_name(), self)
+        self.annotation_indexer.progress.connect(self.on_annotation_index_progress)
+        self.annotation_indexer.indexed.connect(self.on_annotations_indexed)
+        self.annotation_indexer.finished.connect(self.on_annotation_indexer_finished)
+        self.annotation_indexer.finished.connect(self.annotation_indexer.deleteLater)
+        self.annotation_indexer.start()
+
+    def on_annotation_indexer_finished(self):
+        # Also reached when indexing failed, without indexed
+        if self.sender() is self.annotation_indexer:
+            self.annotation_indexer = None
+
+    def stop_annotation_indexer(self):
+        if self.annotation_indexer is None:
+            return
+        indexer = self.annotation_indexer
+        self.annotation_indexer = None
+        indexer.requestInterruption()
+        indexer.wait()
+
+    def on_annotation_index_progress(self, done, total):
+        if self.sender() is not self.annotation_indexer:
+            return
+        self.status('Indexing annotations: %d / %d videos' % (done, total))
+
+    def on_annotations_indexed(self):
+        if self.sender() is not self.annotation_indexer:
+            return
+        self.annotation_indexer = None
+        self.status('Indexed the annotations of %d frames' % len(self.annotation_index))
+        # Presences made while indexing may miss frames
+        self.track_presences = {}
+        self.show_track_timeline()
+
+    def search_frames(self):
+        if not self.all_image_paths:
+            return
+        try:
+            criteria, has_gt = self.frame_query_criteria(self.frame_search.text())
+        except ValueError as e:
+            self.status('Invalid search: %s' % e)
+            return
+
+        self.sync_has_gt()
+        matches = self.annotation_index.query(criteria, self.all_image_paths)
+        paths = [path for path in self.all_image_paths
+                 if path in matches and (has_gt is None or bool(self.images_dict[path]['has_gt']) == has_gt)]
+        self.show_frames(paths)
+
+        message = '%d of %d frames' % (len(paths), len(self.all_image_paths))
+        if self.annotation_indexer is not None:
+            message += ', still indexing annotations'
+        self.status(message)
+
+    def frame_query_criteria(self, text):
+        """Index criteria of a search, and the has_gt value it asks for, None for any."""
+        criteria = []
+        has_gt = None
+        for field, value in parse_frame_query(text):
+            if field in ('category', 'category_id'):
+                criteria.append(('category_id', query_category_id(value, self.names_to_categories_dict)))
+            elif field in ('second_category', 'second_category_id'):
+                criteria.append(('second_category_id', query_category_id(value, self.names_to_second_categories_dict)))
+            elif field in ('third_category', 'third_category_id'):
+                criteria.append(('third_category_id', query_category_id(value, self.names_to_third_categories_dict)))
+            elif field in ('track', 'track_id'):
+                criteria.append(('track_id', value))
+            elif field in ('trackable', 'annotated'):
+                criteria.append((field, parse_query_bool(value)))
+            elif field == 'has_gt':
+                has_gt = parse_query_bool(value)
+            else:
+                raise ValueError('Unknown field %s' % field)
+        return criteria, has_gt
+
+    def show_frames(self, paths):
+        """Show only `paths` in the file list, the video list and the
+        filmstrip; the dataset keeps every frame. The current frame stays
+        open even when it is hidden."""
+        model = self.file_list_table.model()
+        self.sync_has_gt()
+        missing = set(path for row, path in enumerate(self.image_paths) if model.is_missing(row))
+        for path in self.image_paths:
+            # Set rather than removed, the dataset writer may be encoding the record
+            self.images_dict[path]['index'] = None
+
+        self.image_paths = []
+        self.video_index.clear_frames()
+        rows = []
+        for path in paths:
+            image_dict = self.images_dict[path]
+            image_dict['index'] = len(self.image_paths)
+            self.image_paths.append(path)
+            self.video_index.add_frame(image_dict.get('video_id'), path)
+            rows.append(FileListTableModel.make_row(image_dict['id'], image_dict['has_gt'], image_dict['file_name'],
+                                                    path in missing))
+        model.reset_with(rows)
+
+        current_index = self.images_dict[self.image_file_path].get('index') if self.image_file_path else None
+        self.current_index = -1 if current_index is None else current_index
+        model.setCurrentRow(self.current_index)
+        if current_index is not None:
+            self.filmstrip.showFrame(current_index)
+            video_tree_index = self.video_tree_model.index_of_path(self.image_file_path)
+            self.video_tree.setCurrentIndex(video_tree_index)
+            self.video_tree.scrollTo(video_tree_index)
+
+    def video_frame_paths(self, video_id):
+        """Every frame of a video, including those hidden by a search."""
+        if len(self.image_paths) == len(self.all_image_paths):
+            return self.video_index.frame_paths(video_id)
+        return [path for path in self.all_image_paths if self.images_dict[path].get('video_id') == video_id]
+
+    # endregion
+
+    # region Track Timeline
+
+    def track_presence(self, video_id):
+        presence = self.track_presences.get(video_id)
+        if presence is None:
+            presence = TrackPresence.from_index(self.annotation_index, self.video_frame_paths(video_id))
+            self.track_presences[video_id] = presence
+        return presence
+
+    def show_track_timeline(self):
+        if self.current_image is None:
+            self.track_timeline.setPresence(None)
+            return
+        presence = self.track_presence(self.current_image.get('video_id'))
+        position = presence.positions.get(self.image_file_path)
+        if presence is self.track_timeline.presence:
+            self.track_timeline.setPosition(position)
+        else:
+            self.track_timeline.setPresence(presence, position)
+
+    def update_track_presence(self, video_id, frames):
+        """Show the tracks of saved (path, annotations) frames of a video."""
+        presence = self.track_presences.get(video_id)
+        if presence is None:
+            # Made from the index, which already has them, when shown
+            return
+        for path, annotations in frames:
+            presence.set_frame(path, [annotation_track_id(annotation) for annotation in annotations])
+        if presence is self.track_timeline.presence:
+            self.track_timeline.refresh()
+
+    def on_track_timeline_clicked(self, position):
+        path = self.track_timeline.presence.frame_paths[position]
+        if path == self.image_file_path:
+            return
+        current_index = self.images_dict[path].get('index')
+        if current_index is None:
+            self.status('Frame %d is hidden by the search' % (position + 1))
+            return
+        self.open_frame(current_index)
+
     # endregion
 
     # region Navigations
@@ -1578,7 +2530,8 @@ class MainWindow(QMainWindow):
         file_path = None
 
         current_index = -1
-        if self.image_file_path is None:
+        # The current frame may be hidden by a search
+        if self.image_file_path is None or self.images_dict[self.image_file_path].get('index') is None:
             file_path = self.image_paths[0]
             current_index = 0
         else:
@@ -1586,8 +2539,11 @@ class MainWindow(QMainWindow):
             if current_index >= 0:
                 file_path = self.image_paths[current_index]
 
-        if file_path:
-            self.open_image_file(current_index, file_path)
+        # Missing frames are skipped
+        while file_path and not self.open_image_file_propagated(current_index, file_path) and \
+                self.file_list_table.model().is_missing(current_index):
+            current_index -= 1
+            file_path = self.image_paths[current_index] if current_index >= 0 else None
 
     def open_next_image(self):
         if self.auto_saving_option.isChecked() and self.dirty:
@@ -1604,7 +2560,8 @@ class MainWindow(QMainWindow):
         file_path = None
 
         current_index = -1
-        if self.image_file_path is None:
+        # The current frame may be hidden by a search
+        if self.image_file_path is None or self.images_dict[self.image_file_path].get('index') is None:
             file_path = self.image_paths[0]
             current_index = 0
         else:
@@ -1612,8 +2569,11 @@ class MainWindow(QMainWindow):
             if current_index < len(self.image_paths):
                 file_path = self.image_paths[current_index]
 
-        if file_path:
-            self.open_image_file(current_index, file_path)
+        # Missing frames are skipped
+        while file_path and not self.open_image_file_propagated(current_index, file_path) and \
+                self.file_list_table.model().is_missing(current_index):
+            current_index += 1
+            file_path = self.image_paths[current_index] if current_index < len(self.image_paths) else None
 
     # endregion
 
@@ -1633,6 +2593,12 @@ def get_main_app(argv=[]):
     Standard boilerplate Qt application code.
     Do everything but app.exec_() -- so that we can test the application in one thread
     """
+    settings = Settings()
+    settings.load()
+    if settings.get(SETTING_CANVAS_RENDERER) == 'software-opengl':
+        # Mesa llvmpipe, or the ANGLE/opengl32sw fallback on Windows
+        os.environ.setdefault('LIBGL_ALWAYS_SOFTWARE', '1')
+        QCoreApplication.setAttribute(Qt.AA_UseSoftwareOpenGL)
     app = QApplication(argv)
     app.setApplicationName(__appname__)
     app.setWindowIcon(new_icon("app"))
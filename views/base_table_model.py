@@ -3,6 +3,17 @@ from PyQt5.QtCore import *
 from PyQt5.QtWidgets import *
 
 
+def row_ranges(rows):
+    """Split sorted row numbers into (first, last) runs of consecutive rows."""
+    ranges = []
+    for row in rows:
+        if ranges and ranges[-1][1] == row - 1:
+            ranges[-1][1] = row
+        else:
+            ranges.append([row, row])
+    return [tuple(r) for r in ranges]
+
+
 class BaseTableModel(QAbstractTableModel):
     __currentRow = -1
     table_data = []
@@ -11,6 +22,7 @@ class BaseTableModel(QAbstractTableModel):
     def __init__(self, parent=None, header_labels=[]):
         QAbstractTableModel.__init__(self, parent)
         self.header_labels = header_labels
+        self.table_data = []
 
     def data(self, index, role=Qt.DisplayRole):
         if index.row() == self.__currentRow:
@@ -20,6 +32,9 @@ class BaseTableModel(QAbstractTableModel):
                 return QVariant(QColor(Qt.white))
         return QVariant()
 
+    def currentRow(self):
+        return self.__currentRow
+
     def setCurrentRow(self, row):
         self.__currentRow = row
         self.layoutChanged.emit()
@@ -36,5 +51,19 @@ class BaseTableModel(QAbstractTableModel):
         return len(self.table_data)
 
     def clear(self):
-        self.table_data = []
-        self.layoutChanged.emit()
+        self.reset_with([])
+
+    def extend(self, rows):
+        """Append rows, notifying the views once for the whole batch."""
+        if not rows:
+            return
+        first = len(self.table_data)
+        self.beginInsertRows(QModelIndex(), first, first + len(rows) - 1)
+        self.table_data.extend(rows)
+        self.endInsertRows()
+
+    def reset_with(self, rows):
+        """Replace every row, notifying the views once."""
+        self.beginResetModel()
+        self.table_data = list(rows)
+        self.endResetModel()
@@ -1,7 +1,11 @@
+from array import array
+
 from PyQt5.QtGui import *
 from PyQt5.QtCore import *
 from PyQt5.QtWidgets import *
 
+from libs.spatial_index import GridIndex
+from libs.tile_pyramid import PYRAMID_MIN_SIZE, PyramidBuilder, TilePyramid, pyramid_level
 from libs.utils import distance
 
 from views.shape import *
@@ -32,6 +36,8 @@ class Canvas(QWidget):
         # Initialise local state.
         self.mode = self.EDIT
         self.shapes = []
+        # Bounding boxes of self.shapes, for hit-testing
+        self.shape_index = GridIndex()
         self.current = None
         self.selectedShape = None  # save the selected shape here
         self.selectedShapeCopy = None
@@ -42,6 +48,9 @@ class Canvas(QWidget):
         self.offsets = QPointF(), QPointF()
         self.scale = 1.0
         self.pixmap = QPixmap()
+        # Downscaled tiles of large pixmaps, for zoomed out views
+        self.pyramid = None
+        self.pyramid_builder = None
         self.visible = {}
         self._hideBackround = False
         self.hideBackround = False
@@ -110,6 +119,7 @@ class Canvas(QWidget):
         # Polygon drawing.
         if self.drawing():
             self.overrideCursor(CURSOR_DRAW)
+            self.updateDrawing()
             if self.current:
                 color = self.drawingLineColor
                 if self.outOfPixmap(pos):
@@ -141,31 +151,34 @@ class Canvas(QWidget):
                 self.current.highlightClear()
             else:
                 self.prevPoint = pos
-            self.repaint()
+            self.updateDrawing()
             return
 
         # Polygon copy moving.
         if Qt.RightButton & ev.buttons():
             if self.selectedShapeCopy and self.prevPoint:
                 self.overrideCursor(CURSOR_MOVE)
+                self.updateShape(self.selectedShapeCopy)
                 self.boundedMoveShape(self.selectedShapeCopy, pos)
-                self.repaint()
+                self.updateShape(self.selectedShapeCopy)
             elif self.selectedShape:
                 self.selectedShapeCopy = self.selectedShape.copy()
-                self.repaint()
+                self.updateShape(self.selectedShapeCopy)
             return
 
         # Polygon/Vertex moving.
         if Qt.LeftButton & ev.buttons():
             if self.selectedVertex():
+                self.updateShape(self.hShape)
                 self.boundedMoveVertex(pos)
                 self.shape_moved.emit()
-                self.repaint()
+                self.updateShape(self.hShape)
             elif self.selectedShape and self.prevPoint:
                 self.overrideCursor(CURSOR_MOVE)
+                self.updateShape(self.selectedShape)
                 self.boundedMoveShape(self.selectedShape, pos)
                 self.shape_moved.emit()
-                self.repaint()
+                self.updateShape(self.selectedShape)
             return
 
         # Just hovering over the canvas, 2 posibilities:
@@ -173,7 +186,10 @@ class Canvas(QWidget):
         # - Highlight vertex
         # Update shape/vertex fill and tooltip value accordingly.
         self.setToolTip("Image")
-        for shape in reversed([s for s in self.shapes if self.isVisible(s)]):
+        previous = self.hVertex, self.hShape
+        previous_rect = self.shapeRect(self.hShape)
+        candidates = self.shape_index.query(pos.x(), pos.y(), self.epsilon)
+        for shape in [s for s in candidates if self.isVisible(s)]:
             # Look for a nearby vertex to highlight. If that fails,
             # check if we happen to be inside a shape.
             index = shape.nearestVertex(pos, self.epsilon)
@@ -185,7 +201,6 @@ class Canvas(QWidget):
                 self.overrideCursor(CURSOR_POINT)
                 self.setToolTip("Click & drag to move point")
                 self.setStatusTip(self.toolTip())
-                self.update()
                 break
             elif shape.containsPoint(pos):
                 if self.selectedVertex():
@@ -195,14 +210,16 @@ class Canvas(QWidget):
                                 shape.category)
                 self.setStatusTip(self.toolTip())
                 self.overrideCursor(CURSOR_GRAB)
-                self.update()
                 break
         else:  # Nothing found, clear highlights, reset state.
             if self.hShape:
                 self.hShape.highlightClear()
-                self.update()
             self.hVertex, self.hShape = None, None
             self.overrideCursor(CURSOR_DEFAULT)
+        if previous != (self.hVertex, self.hShape):
+            # Only the shapes losing or gaining the highlight need repainting
+            self.updateImageRect(previous_rect)
+            self.updateShape(self.hShape)
 
     def mousePressEvent(self, ev):
         pos = self.transformPos(ev.pos())
@@ -213,11 +230,11 @@ class Canvas(QWidget):
             else:
                 self.selectShapePoint(pos)
                 self.prevPoint = pos
-                self.repaint()
+                self.update()
         elif ev.button() == Qt.RightButton and self.editing():
             self.selectShapePoint(pos)
             self.prevPoint = pos
-            self.repaint()
+            self.update()
 
     def mouseReleaseEvent(self, ev):
         if ev.button() == Qt.RightButton:
@@ -244,12 +261,13 @@ class Canvas(QWidget):
         #del shape.fill_color
         #del shape.line_color
         if copy:
-            self.shapes.append(shape)
+            self.addShape(shape)
             self.selectedShape.selected = False
             self.selectedShape = shape
             self.repaint()
         else:
-            self.selectedShape.points = [p for p in shape.points]
+            self.selectedShape.coords = array('d', shape.coords)
+            self.indexShape(self.selectedShape)
         self.selectedShapeCopy = None
 
     def hideBackroundShapes(self, value):
@@ -309,7 +327,7 @@ class Canvas(QWidget):
             shape.highlightVertex(index, shape.MOVE_VERTEX)
             self.selectShape(shape)
             return
-        for shape in reversed(self.shapes):
+        for shape in self.shape_index.query(point.x(), point.y()):
             if self.isVisible(shape) and shape.containsPoint(point):
                 self.selectShape(shape)
                 self.calculateOffsets(shape, point)
@@ -356,6 +374,7 @@ class Canvas(QWidget):
             rshift = QPointF(0, shiftPos.y())
         shape.moveVertexBy(rindex, rshift)
         shape.moveVertexBy(lindex, lshift)
+        self.indexShape(shape)
 
     def boundedMoveShape(self, shape, pos):
         if self.outOfPixmap(pos):
@@ -375,6 +394,7 @@ class Canvas(QWidget):
         dp = pos - self.prevPoint
         if dp:
             shape.moveBy(dp)
+            self.indexShape(shape)
             self.prevPoint = pos
             return True
         return False
@@ -391,6 +411,7 @@ class Canvas(QWidget):
         if self.selectedShape:
             shape = self.selectedShape
             self.shapes.remove(self.selectedShape)
+            self.shape_index.remove(shape)
             self.selectedShape = None
             self.update()
             return shape
@@ -400,7 +421,7 @@ class Canvas(QWidget):
             return None
         shape = self.selectedShape.copy()
         self.deSelectShape()
-        self.shapes.append(shape)
+        self.addShape(shape)
         shape.selected = True
         self.selectedShape = shape
         self.boundedShiftShape(shape)
@@ -420,7 +441,46 @@ class Canvas(QWidget):
         if not self.pixmap:
             return super(Canvas, self).paintEvent(event)
         self.paint(self._painter, self.scale,
-                   self.scale, self.offsetToCenter())
+                   self.scale, self.offsetToCenter(), event.rect())
+
+    def imageToWidgetRect(self, rect):
+        """Convert a rectangle in image coordinates to the widget pixels it covers."""
+        s = self.scale
+        offset = self.offsetToCenter()
+        rect = QRectF((rect.x() + offset.x()) * s, (rect.y() + offset.y()) * s,
+                      rect.width() * s, rect.height() * s)
+        return rect.toAlignedRect().adjusted(-4, -4, 4, 4)
+
+    def updateImageRect(self, rect):
+        if not rect.isNull():
+            self.update(self.imageToWidgetRect(rect))
+
+    def shapeRect(self, shape):
+        if shape is None:
+            return QRectF()
+        Shape.scale = self.scale
+        return shape.paintRect(self.line_thickness, self.font_size)
+
+    def updateShape(self, shape):
+        """Schedule a repaint of the area covered by `shape` only."""
+        self.updateImageRect(self.shapeRect(shape))
+
+    def updateDrawing(self):
+        """Schedule a repaint of the shape being drawn, its rubber band and the crosshair."""
+        Shape.scale = self.scale
+        if self.current:
+            self.updateImageRect(self.current.paintRect())
+            if len(self.line) == 2:
+                self.updateImageRect(self.line.paintRect())
+                rect = QRectF(self.line[0], self.line[1]).normalized()
+                self.updateImageRect(rect.adjusted(-1, -1, 1, 1))
+        if not self.prevPoint.isNull():
+            s = self.scale
+            offset = self.offsetToCenter()
+            x = int((self.prevPoint.x() + offset.x()) * s)
+            y = int((self.prevPoint.y() + offset.y()) * s)
+            self.update(QRect(x - 2, 0, 5, self.height()))
+            self.update(QRect(0, y - 2, self.width(), 5))
 
     def transformPos(self, point):
         """Convert from widget-logical coordinates to painter-logical coordinates."""
@@ -441,14 +501,14 @@ class Canvas(QWidget):
 
     def finalise(self):
         assert self.current
-        if self.current.points[0] == self.current.points[-1]:
+        if self.current[0] == self.current[-1]:
             self.current = None
             self.drawingPolygon.emit(False)
             self.update()
             return
 
         self.current.close()
-        self.shapes.append(self.current)
+        self.addShape(self.current)
         self.current = None
         self.setHiding(False)
         self.new_shape.emit()
@@ -558,28 +618,18 @@ class Canvas(QWidget):
             self.moveOnePixel('Down')
 
     def moveOnePixel(self, direction):
+        self.updateShape(self.selectedShape)
         if direction == 'Left' and not self.moveOutOfBound(QPointF(-1.0, 0)):
-            self.selectedShape.points[0] += QPointF(-1.0, 0)
-            self.selectedShape.points[1] += QPointF(-1.0, 0)
-            self.selectedShape.points[2] += QPointF(-1.0, 0)
-            self.selectedShape.points[3] += QPointF(-1.0, 0)
+            self.selectedShape.moveBy(QPointF(-1.0, 0))
         elif direction == 'Right' and not self.moveOutOfBound(QPointF(1.0, 0)):
-            self.selectedShape.points[0] += QPointF(1.0, 0)
-            self.selectedShape.points[1] += QPointF(1.0, 0)
-            self.selectedShape.points[2] += QPointF(1.0, 0)
-            self.selectedShape.points[3] += QPointF(1.0, 0)
+            self.selectedShape.moveBy(QPointF(1.0, 0))
         elif direction == 'Up' and not self.moveOutOfBound(QPointF(0, -1.0)):
-            self.selectedShape.points[0] += QPointF(0, -1.0)
-            self.selectedShape.points[1] += QPointF(0, -1.0)
-            self.selectedShape.points[2] += QPointF(0, -1.0)
-            self.selectedShape.points[3] += QPointF(0, -1.0)
+            self.selectedShape.moveBy(QPointF(0, -1.0))
         elif direction == 'Down' and not self.moveOutOfBound(QPointF(0, 1.0)):
-            self.selectedShape.points[0] += QPointF(0, 1.0)
-            self.selectedShape.points[1] += QPointF(0, 1.0)
-            self.selectedShape.points[2] += QPointF(0, 1.0)
-            self.selectedShape.points[3] += QPointF(0, 1.0)
+            self.selectedShape.moveBy(QPointF(0, 1.0))
+        self.indexShape(self.selectedShape)
         self.shape_moved.emit()
-        self.repaint()
+        self.updateShape(self.selectedShape)
 
     def moveOutOfBound(self, step):
         points = [p1+p2 for p1, p2 in zip(self.selectedShape.points, [step]*4)]
@@ -597,6 +647,7 @@ class Canvas(QWidget):
     def undoLastLine(self):
         assert self.shapes
         self.current = self.shapes.pop()
+        self.shape_index.remove(self.current)
         self.current.set_open()
         self.line.points = [self.current[-1], self.current[0]]
         self.drawingPolygon.emit(True)
@@ -604,6 +655,7 @@ class Canvas(QWidget):
     def resetAllLines(self):
         assert self.shapes
         self.current = self.shapes.pop()
+        self.shape_index.remove(self.current)
         self.current.set_open()
         self.line.points = [self.current[-1], self.current[0]]
         self.drawingPolygon.emit(True)
@@ -611,19 +663,62 @@ class Canvas(QWidget):
         self.drawingPolygon.emit(False)
         self.update()
 
-    def loadPixmap(self, pixmap):
+    def loadPixmap(self, pixmap, image=None):
         self.pixmap = pixmap
+        self.buildPyramid(image)
         self.shapes = []
+        self.shape_index.clear()
         self.repaint()
 
+    def buildPyramid(self, image=None):
+        """Start downscaling the pixmap in the background when it is large;
+        the full resolution pixmap is drawn until the pyramid is ready."""
+        self.stopPyramidBuilder()
+        self.pyramid = None
+        if max(self.pixmap.width(), self.pixmap.height()) <= PYRAMID_MIN_SIZE:
+            return
+        if image is None:
+            image = self.pixmap.toImage()
+        self.pyramid_builder = PyramidBuilder(image, self)
+        self.pyramid_builder.built.connect(self.onPyramidBuilt)
+        self.pyramid_builder.finished.connect(self.pyramid_builder.deleteLater)
+        self.pyramid_builder.start()
+
+    def stopPyramidBuilder(self):
+        if self.pyramid_builder is None:
+            return
+        builder = self.pyramid_builder
+        self.pyramid_builder = None
+        builder.requestInterruption()
+        builder.wait()
+
+    def onPyramidBuilt(self, levels):
+        if self.sender() is not self.pyramid_builder:
+            return
+        self.pyramid_builder = None
+        self.pyramid = TilePyramid(self.pixmap.size(), levels)
+        if self.scale <= 0.5:
+            self.update()
+
     def load_shapes(self, shapes):
         self.shapes = list(shapes)
+        self.shape_index.clear()
+        for shape in self.shapes:
+            self.shape_index.insert(shape, shape.bounds())
         self.current = None
         self.repaint()
 
+    def addShape(self, shape):
+        self.shapes.append(shape)
+        self.shape_index.insert(shape, shape.bounds())
+
+    def indexShape(self, shape):
+        """Keep the index in sync after the points of `shape` changed."""
+        self.shape_index.update(shape, shape.bounds())
+
     def setShapeVisible(self, shape, value):
         self.visible[shape] = value
-        self.repaint()
+        self.updateShape(shape)
 
     def currentCursor(self):
         cursor = QApplication.overrideCursor()
@@ -644,6 +739,8 @@ class Canvas(QWidget):
     def resetState(self):
         self.restoreCursor()
         self.pixmap = QPixmap()
+        self.stopPyramidBuilder()
+        self.pyramid = None
         self.update()
 
     def setDrawingShapeToSquare(self, status):
@@ -658,7 +755,7 @@ class Canvas(QWidget):
 
         image.save(file_path)
 
-    def paint(self, p, scale_x=1, scale_y=1, translate=QPointF(0, 0)):
+    def paint(self, p, scale_x=1, scale_y=1, translate=QPointF(0, 0), rect=None):
         p.begin(self)
         p.setRenderHint(QPainter.Antialiasing)
         p.setRenderHint(QPainter.HighQualityAntialiasing)
@@ -667,12 +764,35 @@ class Canvas(QWidget):
         p.scale(scale_x, scale_y)
         p.translate(translate)
 
-        p.drawPixmap(0, 0, self.pixmap)
         Shape.scale = self.scale
+        if rect is None:
+            exposed = None
+            p.drawPixmap(0, 0, self.pixmap)
+        else:
+            # Only the exposed part of the pixmap and the shapes crossing it are drawn
+            exposed = QRectF(rect.x() / scale_x - translate.x(), rect.y() / scale_y - translate.y(),
+                             rect.width() / scale_x, rect.height() / scale_y)
+            level = pyramid_level(scale_x, len(self.pyramid.levels)) if self.pyramid is not None else 0
+            if level > 0:
+                # Zoomed out: the tiles of the closest downscaled level cost about as much as the viewport
+                self.pyramid.draw(p, level, exposed.intersected(QRectF(self.pixmap.rect())))
+            else:
+                source = exposed.toAlignedRect().intersected(self.pixmap.rect())
+                p.drawPixmap(QRectF(source), self.pixmap, QRectF(source))
         for shape in self.shapes:
             if (shape.selected or not self._hideBackround) and self.isVisible(shape):
+                if exposed is not None and \
+                        not shape.paintRect(self.line_thickness, self.font_size).intersects(exposed):
+                    continue
                 shape.fill = shape.selected or shape == self.hShape
                 shape.paint(p, self.line_thickness, self.font_size)
+        self.paintDrawing(p)
+        self.updateBackground()
+
+        p.end()
+
+    def paintDrawing(self, p):
+        """Paint the shape being drawn, the copy being moved and the crosshair."""
         if self.current:
             self.current.paint(p)
             self.line.paint(p)
@@ -697,6 +817,7 @@ class Canvas(QWidget):
             p.drawLine(0, self.prevPoint.y(),
                        self.pixmap.width(), self.prevPoint.y())
 
+    def updateBackground(self):
         self.setAutoFillBackground(True)
         if self.verified:
             pal = self.palette()
@@ -706,5 +827,3 @@ class Canvas(QWidget):
             pal = self.palette()
             pal.setColor(self.backgroundRole(), QColor(232, 232, 232, 255))
             self.setPalette(pal)
-
-        p.end()
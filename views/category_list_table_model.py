@@ -2,8 +2,10 @@ from PyQt5.QtGui import *
 from PyQt5.QtCore import *
 from PyQt5.QtWidgets import *
 
+from views.base_table_model import BaseTableModel
 
-class CategoryListTableModel(QAbstractTableModel):
+
+class CategoryListTableModel(BaseTableModel):
     def __init__(self, parent=None):
         QAbstractTableModel.__init__(self, parent)
         self.header_labels = ['ID', 'Category']
@@ -21,14 +23,13 @@ class CategoryListTableModel(QAbstractTableModel):
     def rowCount(self, parent):
         return len(self.table_data)
 
-    def clear(self):
-        self.table_data = []
-        self.layoutChanged.emit()
+    @staticmethod
+    def make_row(id, category):
+        return {'id': id,
+                'category': category}
 
     def append(self, id, category):
-        self.table_data.append({'id': id,
-                                'category': category})
-        self.layoutChanged.emit()
+        self.extend([self.make_row(id, category)])
 
     def data(self, index, role=Qt.DisplayRole):
         if not index.isValid():
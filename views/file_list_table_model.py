@@ -2,19 +2,54 @@ from PyQt5.QtGui import *
 from PyQt5.QtCore import *
 from PyQt5.QtWidgets import *
 
-from views.base_table_model import BaseTableModel
+from views.base_table_model import BaseTableModel, row_ranges
 
 
 class FileListTableModel(BaseTableModel):
 
     def __init__(self, parent=None):
         BaseTableModel.__init__(self, parent, ['ID', 'Has GT', 'File name'])
+        self.dirty_rows = set()
+
+    @staticmethod
+    def make_row(id, has_gt, file_name, missing=False):
+        return {'id': id,
+                'has_gt': has_gt,
+                'file_name': file_name,
+                'missing': missing}
 
     def append(self, id, has_gt, file_name):
-        self.table_data.append({'id': id,
-                                'has_gt': has_gt,
-                                'file_name': file_name})
-        self.layoutChanged.emit()
+        self.extend([self.make_row(id, has_gt, file_name)])
+
+    def reset_with(self, rows):
+        self.dirty_rows = set()
+        super(FileListTableModel, self).reset_with(rows)
+
+    def set_missing(self, rows):
+        """Flag the frames found missing on disk."""
+        rows = sorted(row for row in set(rows) if not self.table_data[row]['missing'])
+        for row in rows:
+            self.table_data[row]['missing'] = True
+        last_column = self.columnCount(QModelIndex()) - 1
+        for first, last in row_ranges(rows):
+            self.dataChanged.emit(self.index(first, 0), self.index(last, last_column))
+
+    def set_has_gt(self, values):
+        """Set has_gt of rows from a row -> value dict, e.g. replayed from the
+        journal; the rows are not marked dirty."""
+        for row, has_gt in values.items():
+            self.table_data[row]['has_gt'] = has_gt
+        last_column = self.columnCount(QModelIndex()) - 1
+        for first, last in row_ranges(sorted(values)):
+            self.dataChanged.emit(self.index(first, 0), self.index(last, last_column))
+
+    def is_missing(self, row):
+        return self.table_data[row]['missing']
+
+    def take_dirty_rows(self):
+        """Return the rows edited since the last call."""
+        rows, self.dirty_rows = self.dirty_rows, set()
+        return rows
 
     def data(self, index, role=Qt.DisplayRole):
         if not index.isValid():
@@ -31,7 +66,12 @@ class FileListTableModel(BaseTableModel):
             elif col == 2:
                 content = data_row['file_name']
             return content
-        return super(FileListTableModel, self).data(index, role)
+        if role == Qt.ToolTipRole and data_row['missing']:
+            return 'Missing frame'
+        value = super(FileListTableModel, self).data(index, role)
+        if role == Qt.ForegroundRole and data_row['missing'] and not value.isValid():
+            return QVariant(QColor(Qt.red))
+        return value
 
     def setData(self, index, value, role):
         if not index.isValid():
@@ -40,6 +80,7 @@ class FileListTableModel(BaseTableModel):
         column = index.column()
         if role == Qt.CheckStateRole and column == 1:
             self.table_data[row]['has_gt'] = value == Qt.Checked
+            self.dirty_rows.add(row)
             self.dataChanged.emit(index, index)
             return True
         elif role == Qt.EditRole:
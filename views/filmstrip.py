@@ -0,0 +1,67 @@
+import os
+
+from PyQt5.QtGui import *
+from PyQt5.QtCore import *
+from PyQt5.QtWidgets import *
+
+
+class FilmstripModel(QIdentityProxyModel):
+    """The file list as thumbnails.
+
+    Rows follow the file list model; thumbnails are only asked for when a
+    view paints them, i.e. for the visible frames.
+    """
+
+    def __init__(self, loader, path_of, row_of, parent=None):
+        super(FilmstripModel, self).__init__(parent)
+        self.loader = loader
+        self.path_of = path_of
+        self.row_of = row_of
+        self.loader.thumbnail_loaded.connect(self.on_thumbnail_loaded)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        if role == Qt.DecorationRole:
+            return self.loader.thumbnail(self.path_of(index.row()))
+        if role == Qt.DisplayRole:
+            return os.path.basename(self.path_of(index.row()))
+        if role == Qt.ToolTipRole:
+            return self.path_of(index.row())
+        if role in (Qt.BackgroundColorRole, Qt.ForegroundRole):
+            return super(FilmstripModel, self).data(index, role)
+        return None
+
+    def on_thumbnail_loaded(self, path):
+        row = self.row_of(path)
+        if row is None or row >= self.rowCount():
+            return
+        index = self.index(row, 0)
+        self.dataChanged.emit(index, index, [Qt.DecorationRole])
+
+
+class Filmstrip(QListView):
+    """Single row of frame thumbnails."""
+
+    def __init__(self, loader, parent=None):
+        super(Filmstrip, self).__init__(parent)
+        self.loader = loader
+        size = loader.size
+        self.setViewMode(QListView.IconMode)
+        self.setFlow(QListView.LeftToRight)
+        self.setWrapping(False)
+        self.setMovement(QListView.Static)
+        self.setResizeMode(QListView.Adjust)
+        self.setUniformItemSizes(True)
+        self.setIconSize(QSize(size, size))
+        self.setGridSize(QSize(size + 8, size + 24))
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOn)
+        self.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.setMinimumHeight(size + 48)
+        # Thumbnails scrolled out of view are not worth generating anymore
+        self.horizontalScrollBar().valueChanged.connect(self.loader.cancel)
+
+    def showFrame(self, row):
+        index = self.model().index(row, 0)
+        self.setCurrentIndex(index)
+        self.scrollTo(index, QAbstractItemView.PositionAtCenter)
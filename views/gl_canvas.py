@@ -0,0 +1,310 @@
+from array import array
+
+from PyQt5.QtGui import *
+from PyQt5.QtCore import *
+from PyQt5.QtWidgets import *
+
+from views.canvas import Canvas
+from views.shape import Shape
+
+CANVAS_RENDERERS = ('raster', 'opengl', 'software-opengl')
+
+# Larger frames are downscaled to fit in one texture
+MAX_TEXTURE_SIZE = 8192
+
+GL_POINTS = 0x0000
+GL_LINES = 0x0001
+GL_TRIANGLE_STRIP = 0x0005
+GL_FLOAT = 0x1406
+GL_BLEND = 0x0BE2
+GL_SRC_ALPHA = 0x0302
+GL_ONE_MINUS_SRC_ALPHA = 0x0303
+GL_COLOR_BUFFER_BIT = 0x4000
+
+IMAGE_VERTEX_SHADER = '''
+attribute vec2 position;
+attribute vec2 texcoord;
+uniform mat4 matrix;
+varying vec2 v_texcoord;
+void main() {
+    v_texcoord = texcoord;
+    gl_Position = matrix * vec4(position, 0.0, 1.0);
+}
+'''
+
+IMAGE_FRAGMENT_SHADER = '''
+uniform sampler2D frame;
+varying vec2 v_texcoord;
+void main() {
+    gl_FragColor = texture2D(frame, v_texcoord);
+}
+'''
+
+SHAPE_VERTEX_SHADER = '''
+attribute vec2 position;
+attribute vec4 color;
+uniform mat4 matrix;
+varying vec4 v_color;
+void main() {
+    v_color = color;
+    gl_Position = matrix * vec4(position, 0.0, 1.0);
+}
+'''
+
+SHAPE_FRAGMENT_SHADER = '''
+varying vec4 v_color;
+void main() {
+    gl_FragColor = v_color;
+}
+'''
+
+
+def opengl_available():
+    context = QOpenGLContext()
+    return context.create()
+
+
+def create_canvas(renderer, *args, **kwargs):
+    """The canvas for a renderer of CANVAS_RENDERERS, falling back to the
+    QPainter canvas when no OpenGL context can be created."""
+    if renderer != 'raster' and opengl_available():
+        return GLCanvas(*args, **kwargs)
+    return Canvas(*args, **kwargs)
+
+
+def color_components(color):
+    return color.redF(), color.greenF(), color.blueF(), color.alphaF()
+
+
+class GLCanvasView(QOpenGLWidget):
+    """Renders a GLCanvas: the frame is a mipmapped texture and the plain
+    boxes and their vertices go to one vertex buffer, drawn with one call
+    each. Boxes that need more than an outline (selected, highlighted,
+    unconfirmed or labelled ones) and the drawing overlay are painted on top
+    with QPainter, as on the QPainter canvas."""
+
+    def __init__(self, canvas):
+        super(GLCanvasView, self).__init__(canvas)
+        self.canvas = canvas
+        self.gl = None
+        self.image_program = None
+        self.shape_program = None
+        self.texture = None
+        self.image = None
+        self.image_dirty = False
+        self.image_vertices = QOpenGLBuffer(QOpenGLBuffer.VertexBuffer)
+        self.shape_vertices = QOpenGLBuffer(QOpenGLBuffer.VertexBuffer)
+        self.setAttribute(Qt.WA_TransparentForMouseEvents)
+        self.setFocusPolicy(Qt.NoFocus)
+
+    def setImage(self, image):
+        self.image = image
+        self.image_dirty = True
+        self.update()
+
+    def initializeGL(self):
+        profile = QOpenGLVersionProfile()
+        profile.setVersion(2, 0)
+        self.gl = self.context().versionFunctions(profile)
+        self.gl.initializeOpenGLFunctions()
+        self.image_program = self.makeProgram(IMAGE_VERTEX_SHADER, IMAGE_FRAGMENT_SHADER)
+        self.shape_program = self.makeProgram(SHAPE_VERTEX_SHADER, SHAPE_FRAGMENT_SHADER)
+        self.image_vertices.create()
+        self.shape_vertices.create()
+        self.shape_vertices.setUsagePattern(QOpenGLBuffer.StreamDraw)
+        self.context().aboutToBeDestroyed.connect(self.cleanupGL)
+
+    def makeProgram(self, vertex_shader, fragment_shader):
+        program = QOpenGLShaderProgram(self)
+        program.addShaderFromSourceCode(QOpenGLShader.Vertex, vertex_shader)
+        program.addShaderFromSourceCode(QOpenGLShader.Fragment, fragment_shader)
+        program.link()
+        return program
+
+    def cleanupGL(self):
+        self.makeCurrent()
+        if self.texture is not None:
+            self.texture.destroy()
+            self.texture = None
+        self.image_vertices.destroy()
+        self.shape_vertices.destroy()
+        self.doneCurrent()
+
+    def uploadImage(self):
+        self.image_dirty = False
+        if self.texture is not None:
+            self.texture.destroy()
+            self.texture = None
+        if self.image is None or self.image.isNull():
+            return
+        image = self.image
+        if max(image.width(), image.height()) > MAX_TEXTURE_SIZE:
+            image = image.scaled(MAX_TEXTURE_SIZE, MAX_TEXTURE_SIZE, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+        self.texture = QOpenGLTexture(image)
+        self.texture.setMinMagFilters(QOpenGLTexture.LinearMipMapLinear, QOpenGLTexture.Linear)
+        self.texture.setWrapMode(QOpenGLTexture.ClampToEdge)
+        # The quad keeps the full resolution size whatever the texture size
+        w, h = self.image.width(), self.image.height()
+        data = array('f', [0, 0, 0, 0, w, 0, 1, 0, 0, h, 0, 1, w, h, 1, 1])
+        self.image_vertices.bind()
+        self.image_vertices.allocate(data, len(data) * data.itemsize)
+        self.image_vertices.release()
+
+    def matrix(self):
+        """Image to clip coordinates; the view only covers the visible part of the canvas."""
+        canvas = self.canvas
+        offset = canvas.offsetToCenter()
+        matrix = QMatrix4x4()
+        matrix.ortho(0, self.width(), self.height(), 0, -1, 1)
+        matrix.translate(-self.x(), -self.y())
+        matrix.scale(canvas.scale, canvas.scale)
+        matrix.translate(offset.x(), offset.y())
+        return matrix
+
+    def batchedShapes(self):
+        """Split the visible shapes into those drawn from the vertex buffer and
+        those painted with QPainter."""
+        canvas = self.canvas
+        batched = []
+        painted = []
+        for shape in canvas.shapes:
+            if not ((shape.selected or not canvas._hideBackround) and canvas.isVisible(shape)):
+                continue
+            shape.fill = shape.selected or shape == canvas.hShape
+            if shape.fill or not shape.confirmed or shape.interpolated or shape.paintLabel:
+                painted.append(shape)
+            elif shape.coords:
+                batched.append(shape)
+        return batched, painted
+
+    def shapeVertices(self, shapes):
+        """(x, y, r, g, b, a) of the outline segments, then of the vertices."""
+        lines = array('f')
+        points = array('f')
+        vertex_color = color_components(Shape.vertex_fill_color)
+        for shape in shapes:
+            color = color_components(shape.line_color)
+            c = shape.coords
+            n = len(c) // 2
+            segments = n if shape.is_closed() else n - 1
+            for i in range(segments):
+                j = (i + 1) % n
+                lines.extend((c[2 * i], c[2 * i + 1]) + color)
+                lines.extend((c[2 * j], c[2 * j + 1]) + color)
+            for i in range(n):
+                points.extend((c[2 * i], c[2 * i + 1]) + vertex_color)
+        return lines, points
+
+    def paintGL(self):
+        canvas = self.canvas
+        gl = self.gl
+        background = canvas.palette().color(canvas.backgroundRole())
+        gl.glClearColor(background.redF(), background.greenF(), background.blueF(), 1.0)
+        gl.glClear(GL_COLOR_BUFFER_BIT)
+        if not canvas.pixmap:
+            return
+        if self.image_dirty:
+            self.uploadImage()
+        gl.glEnable(GL_BLEND)
+        gl.glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+        matrix = self.matrix()
+
+        if self.texture is not None:
+            program = self.image_program
+            program.bind()
+            program.setUniformValue('matrix', matrix)
+            program.setUniformValue('frame', 0)
+            self.texture.bind(0)
+            self.image_vertices.bind()
+            program.enableAttributeArray('position')
+            program.enableAttributeArray('texcoord')
+            program.setAttributeBuffer('position', GL_FLOAT, 0, 2, 16)
+            program.setAttributeBuffer('texcoord', GL_FLOAT, 8, 2, 16)
+            gl.glDrawArrays(GL_TRIANGLE_STRIP, 0, 4)
+            program.disableAttributeArray('position')
+            program.disableAttributeArray('texcoord')
+            self.image_vertices.release()
+            self.texture.release(0)
+            program.release()
+
+        Shape.scale = canvas.scale
+        batched, painted = self.batchedShapes()
+        lines, points = self.shapeVertices(batched)
+        if lines or points:
+            program = self.shape_program
+            program.bind()
+            program.setUniformValue('matrix', matrix)
+            data = lines + points
+            self.shape_vertices.bind()
+            self.shape_vertices.allocate(data, len(data) * data.itemsize)
+            program.enableAttributeArray('position')
+            program.enableAttributeArray('color')
+            program.setAttributeBuffer('position', GL_FLOAT, 0, 2, 24)
+            program.setAttributeBuffer('color', GL_FLOAT, 8, 4, 24)
+            # Same on screen size as the QPainter canvas
+            gl.glLineWidth(batched[0].penWidth(canvas.line_thickness) * canvas.scale)
+            gl.glDrawArrays(GL_LINES, 0, len(lines) // 6)
+            gl.glPointSize(Shape.point_size)
+            gl.glDrawArrays(GL_POINTS, len(lines) // 6, len(points) // 6)
+            program.disableAttributeArray('position')
+            program.disableAttributeArray('color')
+            self.shape_vertices.release()
+            program.release()
+
+        p = QPainter(self)
+        p.setRenderHint(QPainter.Antialiasing)
+        p.setRenderHint(QPainter.HighQualityAntialiasing)
+        p.translate(-self.x(), -self.y())
+        p.scale(canvas.scale, canvas.scale)
+        p.translate(canvas.offsetToCenter())
+        for shape in painted:
+            shape.paint(p, canvas.line_thickness, canvas.font_size)
+        canvas.paintDrawing(p)
+        p.end()
+
+
+class GLCanvas(Canvas):
+    """The canvas rendered with OpenGL.
+
+    Input handling and state are those of Canvas; drawing goes to a
+    GLCanvasView child that covers the visible part of the canvas only,
+    so its framebuffer never exceeds the viewport whatever the zoom.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(GLCanvas, self).__init__(*args, **kwargs)
+        self.view = GLCanvasView(self)
+
+    def placeView(self):
+        parent = self.parentWidget()
+        if parent is None:
+            rect = self.rect()
+        else:
+            rect = QRect(self.mapFromParent(QPoint(0, 0)), parent.size()).intersected(self.rect())
+        if rect != self.view.geometry():
+            self.view.setGeometry(rect)
+
+    def loadPixmap(self, pixmap, image=None):
+        self.view.setImage(image if image is not None else pixmap.toImage())
+        super(GLCanvas, self).loadPixmap(pixmap, image)
+
+    def buildPyramid(self, image=None):
+        # Mipmaps of the texture take the place of the tile pyramid
+        self.pyramid = None
+
+    def resetState(self):
+        self.view.setImage(None)
+        super(GLCanvas, self).resetState()
+
+    def paintEvent(self, event):
+        self.updateBackground()
+        self.placeView()
+        self.view.update()
+
+    def moveEvent(self, event):
+        super(GLCanvas, self).moveEvent(event)
+        self.placeView()
+
+    def resizeEvent(self, event):
+        super(GLCanvas, self).resizeEvent(event)
+        self.placeView()
@@ -2,25 +2,58 @@ from PyQt5.QtGui import *
 from PyQt5.QtCore import *
 from PyQt5.QtWidgets import *
 
-from views.base_table_model import BaseTableModel
+from views.base_table_model import BaseTableModel, row_ranges
 
 
 class LabelListTableModel(BaseTableModel):
+    # Column showing each key of a row
+    columns = {'visible': 0,
+               'id': 1,
+               'track_id': 2,
+               'trackable': 3,
+               'category': 4,
+               'second_category': 5,
+               'third_category': 6}
+
     def __init__(self, parent=None):
         BaseTableModel.__init__(self, parent,
                                 ['', 'ID', 'Tracking ID', 'Trackable', 'Category', 'Second Category', 'Third Category'])
+        self.uid_rows = {}
+
+    @staticmethod
+    def make_row(uid, label, id=-1, track_id=-1, trackable=True, second_category=None, third_category=None,
+                 confirmed=True, interpolated=False):
+        return {'uid': uid,
+                'category': str(label),  # 4
+                'id': id,
+                'track_id': track_id,  # 2
+                'trackable': trackable,  # 3 check box, mặc định là True
+                'second_category': second_category,  # 5 combo box, mặc định là dòng đầu
+                'third_category': third_category,  # 6 combo box, mặc định là dòng đầu
+                'visible': True,
+                'checked': False,
+                'confirmed': confirmed,  # False for detector candidates
+                'interpolated': interpolated}  # True for boxes filled in by track interpolation
 
     def append(self, uid, label, id=-1, track_id=-1, trackable=True, second_category=None, third_category=None):
-        self.table_data.append({'uid': uid,
-                                'category': str(label),  # 4
-                                'id': id,
-                                'track_id': track_id,  # 2
-                                'trackable': trackable,  # 3 check box, mặc định là True
-                                'second_category': second_category,  # 5 combo box, mặc định là dòng đầu
-                                'third_category': third_category,  # 6 combo box, mặc định là dòng đầu
-                                'visible': True,
-                                'checked': False})
-        self.layoutChanged.emit()
+        self.extend([self.make_row(uid, label, id, track_id, trackable, second_category, third_category)])
+
+    def extend(self, rows):
+        first = len(self.table_data)
+        super(LabelListTableModel, self).extend(rows)
+        for row, data_row in enumerate(rows, first):
+            self.uid_rows[data_row['uid']] = row
+
+    def reset_with(self, rows):
+        super(LabelListTableModel, self).reset_with(rows)
+        self.reindex()
+
+    def reindex(self, first=0):
+        """Rebuild the uid -> row index from row `first` on."""
+        if first == 0:
+            self.uid_rows = {}
+        for row in range(first, len(self.table_data)):
+            self.uid_rows[self.table_data[row]['uid']] = row
 
     def data(self, index, role=Qt.DisplayRole):
         if not index.isValid():
@@ -45,6 +78,12 @@ class LabelListTableModel(BaseTableModel):
             return content
         if role == Qt.TextAlignmentRole:
             return Qt.AlignCenter
+        if role == Qt.FontRole and not data_row.get('confirmed', True):
+            font = QFont()
+            font.setItalic(True)
+            return font
+        if role == Qt.ForegroundRole and data_row.get('interpolated') and row != self.currentRow():
+            return QColor(Qt.gray)
         return super(LabelListTableModel, self).data(index, role)
 
     def setData(self, index, value, role):
@@ -96,32 +135,59 @@ class LabelListTableModel(BaseTableModel):
         return fl
 
     def remove_row(self, uid):
-        row = self.get_row(uid)
-        if row == -1:
+        self.remove_rows([uid])
+
+    def remove_rows(self, uids):
+        """Remove the rows of `uids`, one rowsRemoved per run of consecutive rows."""
+        rows = sorted(set(self.get_row(uid) for uid in uids) - {-1})
+        if not rows:
+            return
+        for first, last in reversed(row_ranges(rows)):
+            self.beginRemoveRows(QModelIndex(), first, last)
+            del self.table_data[first:last + 1]
+            self.endRemoveRows()
+        for uid in uids:
+            self.uid_rows.pop(uid, None)
+        self.reindex(rows[0])
+
+    def update_rows(self, changes):
+        """Apply {uid: {key: value}} and emit one dataChanged per run of
+        consecutive rows, spanning the columns of the changed keys. Keys
+        without a column of their own span every column."""
+        rows = []
+        columns = set()
+        for uid, values in changes.items():
+            row = self.get_row(uid)
+            if row == -1:
+                continue
+            self.table_data[row].update(values)
+            rows.append(row)
+            for key in values:
+                if key in self.columns:
+                    columns.add(self.columns[key])
+                else:
+                    columns.update(range(len(self.header_labels)))
+        if not rows or not columns:
             return
-        del self.table_data[row]
-        self.layoutChanged.emit()
+        for first, last in row_ranges(sorted(rows)):
+            self.dataChanged.emit(self.index(first, min(columns)), self.index(last, max(columns)))
 
     def toggle_visible_all(self, visible):
-        for row in range(0, len(self.table_data)):
-            index = self.index(row, 0)
-            self.setData(index,
-                         Qt.Checked if visible else Qt.Unchecked,
-                         Qt.EditRole)
+        self.update_rows({r['uid']: {'visible': visible} for r in self.table_data})
 
     def get_row(self, uid):
-        row = 0
-        for r in self.table_data:
-            if r['uid'] == uid:
-                break
-            row += 1
-        return -1 if row == len(self.table_data) else row
+        row = self.uid_rows.get(uid)
+        if row is None or row >= len(self.table_data) or self.table_data[row]['uid'] != uid:
+            if row is None and len(self.uid_rows) == len(self.table_data):
+                return -1
+            # table_data was reordered behind the model's back
+            self.reindex()
+            row = self.uid_rows.get(uid)
+        return -1 if row is None else row
 
     def get_data(self, uid):
-        for r in self.table_data:
-            if r['uid'] == uid:
-                return r
-        return None
+        row = self.get_row(uid)
+        return None if row == -1 else self.table_data[row]
 
 
 class LabelListTableComboBoxDelegate(QItemDelegate):
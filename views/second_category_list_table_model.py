@@ -23,14 +23,13 @@ class SecondCategoryListTableModel(BaseTableModel):
     def rowCount(self, parent):
         return len(self.table_data)
 
-    def clear(self):
-        self.table_data = []
-        self.layoutChanged.emit()
+    @staticmethod
+    def make_row(id, name):
+        return {'id': id,
+                'name': name}
 
     def append(self, id, name):
-        self.table_data.append({'id': id,
-                                'name': name})
-        self.layoutChanged.emit()
+        self.extend([self.make_row(id, name)])
 
     def data(self, index, role=Qt.DisplayRole):
         if not index.isValid():
@@ -1,4 +1,5 @@
-import sys
+from array import array
+from math import hypot
 
 from PyQt5.QtGui import *
 from PyQt5.QtCore import *
@@ -8,16 +9,67 @@ from libs.utils import *
 
 MIN_Y_LABEL = 10
 
+_label_fonts = {}
+_label_metrics = {}
+_pens = {}
+_brushes = {}
 
-class Shape:
+
+def label_font(font_size):
+    font = _label_fonts.get(font_size)
+    if font is None:
+        font = _label_fonts[font_size] = QFont()
+        font.setPointSize(font_size)
+        font.setBold(True)
+    return font
+
+
+def label_metrics(font_size):
+    metrics = _label_metrics.get(font_size)
+    if metrics is None:
+        metrics = _label_metrics[font_size] = QFontMetricsF(label_font(font_size))
+    return metrics
+
+
+def shape_pen(color, width, style=Qt.SolidLine):
+    """Pens are shared between the shapes drawn alike, e.g. of the same category."""
+    key = color.rgba(), width, int(style)
+    pen = _pens.get(key)
+    if pen is None:
+        pen = _pens[key] = QPen(color)
+        pen.setWidth(width)
+        pen.setStyle(style)
+    return pen
+
+
+def shape_brush(color):
+    key = color.rgba()
+    brush = _brushes.get(key)
+    if brush is None:
+        brush = _brushes[key] = QBrush(color)
+    return brush
+
+
+class Shape(object):
+    """An annotation box.
+
+    The points are kept as flat (x, y) pairs in a float array; `points` and
+    item access build QPointF views on demand, so idle shapes carry no Qt
+    objects besides the paint cache.
+    """
     P_SQUARE, P_ROUND = range(2)
 
     MOVE_VERTEX, NEAR_VERTEX = range(2)
 
+    __slots__ = ('category', 'track_id', 'coords', 'fill', 'selected', 'difficult', 'paintLabel', 'confirmed',
+                 'interpolated',
+                 '_line_color', '_fill_color', '_highlightIndex', '_highlightMode', '_closed',
+                 '_cache_key', '_pen', '_line_path', '_vrtx_path', '_label_pos', '_paint_rect')
+
     # The following class variables influence the drawing
     # of _all_ shape objects.
-    line_color = DEFAULT_LINE_COLOR
-    fill_color = DEFAULT_FILL_COLOR
+    default_line_color = DEFAULT_LINE_COLOR
+    default_fill_color = DEFAULT_FILL_COLOR
     select_line_color = DEFAULT_SELECT_LINE_COLOR
     select_fill_color = DEFAULT_SELECT_FILL_COLOR
     vertex_fill_color = DEFAULT_VERTEX_FILL_COLOR
@@ -26,42 +78,90 @@ class Shape:
     point_size = 8
     scale = 1.0
 
+    _highlightSettings = {
+        NEAR_VERTEX: (4, P_ROUND),
+        MOVE_VERTEX: (1.5, P_SQUARE),
+    }
+
     def __init__(self, line_color=None, difficult=False, paintLabel=False, category='', track_id='-1'):
         self.category = category
         self.track_id = track_id
-        self.points = []
+        self.coords = array('d')
         self.fill = False
         self.selected = False
         self.difficult = difficult
         self.paintLabel = paintLabel
+        # Candidates of a detector stay unconfirmed until the user accepts them
+        self.confirmed = True
+        # Boxes filled in between the keyframes of a track
+        self.interpolated = False
+
+        self._line_color = line_color or None
+        self._fill_color = None
 
         self._highlightIndex = None
         self._highlightMode = self.NEAR_VERTEX
-        self._highlightSettings = {
-            self.NEAR_VERTEX: (4, self.P_ROUND),
-            self.MOVE_VERTEX: (1.5, self.P_SQUARE),
-        }
 
         self._closed = False
 
-        if line_color:
-            self.line_color = line_color
+        self._cache_key = None
+        self._pen = None
+        self._line_path = None
+        self._vrtx_path = None
+        self._label_pos = None
+        self._paint_rect = None
+
+    @property
+    def line_color(self):
+        return self.default_line_color if self._line_color is None else self._line_color
+
+    @line_color.setter
+    def line_color(self, color):
+        self._line_color = color
+
+    @property
+    def fill_color(self):
+        return self.default_fill_color if self._fill_color is None else self._fill_color
+
+    @fill_color.setter
+    def fill_color(self, color):
+        self._fill_color = color
+
+    @property
+    def points(self):
+        c = self.coords
+        return [QPointF(c[i], c[i + 1]) for i in range(0, len(c), 2)]
+
+    @points.setter
+    def points(self, points):
+        coords = array('d')
+        for p in points:
+            coords.append(p.x())
+            coords.append(p.y())
+        self.coords = coords
+
+    def setBox(self, x1, y1, x2, y2):
+        """Replace the points by the corners of a box, clockwise from (x1, y1)."""
+        self.coords = array('d', (x1, y1, x2, y1, x2, y2, x1, y2))
 
     def close(self):
         self._closed = True
 
     def reachMaxPoints(self):
-        if len(self.points) >= 4:
+        if len(self) >= 4:
             return True
         return False
 
     def addPoint(self, point):
         if not self.reachMaxPoints():
-            self.points.append(point)
+            self.coords.append(point.x())
+            self.coords.append(point.y())
 
     def popPoint(self):
-        if self.points:
-            return self.points.pop()
+        if self.coords:
+            y = self.coords.pop()
+            x = self.coords.pop()
+            return QPointF(x, y)
         return None
 
     def is_closed(self):
@@ -71,77 +171,110 @@ class Shape:
         self._closed = False
 
     def paint(self, painter, line_thickness=DEFAULT_LINE_THICKNESS, font_size=DEFAULT_FONT_SIZE):
-        if not self.points:
+        if not self.coords:
             return
 
-        color = self.select_line_color if self.selected else self.line_color
-        pen = QPen(color)
+        self.updateCache(line_thickness, font_size)
+        painter.setPen(self._pen)
+
+        painter.drawPath(self._line_path)
+        painter.drawPath(self._vrtx_path)
+        vertex_fill_color = self.hvertex_fill_color if self._highlightIndex is not None else self.vertex_fill_color
+        painter.fillPath(self._vrtx_path, shape_brush(vertex_fill_color))
+
+        # Draw text at the top-left
+        if self.paintLabel:
+            painter.setFont(label_font(font_size))
+            painter.drawText(self._label_pos, self.labelText())
+
+        if self.fill:
+            color = self.select_fill_color if self.selected else self.fill_color
+            painter.fillPath(self._line_path, shape_brush(color))
+
+    def labelText(self):
+        return '#%s: %s' % (self.track_id, self.category)
+
+    def penWidth(self, line_thickness):
         # Try using integer sizes for smoother drawing(?)
-        pen_width = max(1, int(round(2.0 / self.scale))) * line_thickness
-        pen.setWidth(pen_width)
-        painter.setPen(pen)
+        return max(1, int(round(2.0 / self.scale))) * line_thickness
+
+    def updateCache(self, line_thickness, font_size):
+        """Rebuild the paths, pen and label position only when the points,
+        selection, highlight, scale or drawing settings changed."""
+        color = self.select_line_color if self.selected else self.line_color
+        key = (self.coords.tobytes(), self._closed, self.selected, self.confirmed, self.interpolated, color.rgba(),
+               self._highlightIndex, self._highlightMode, self.scale, line_thickness, font_size)
+        if key == self._cache_key:
+            return
+        self._cache_key = key
+
+        pen_width = self.penWidth(line_thickness)
+        if not self.confirmed:
+            style = Qt.DashLine
+        elif self.interpolated:
+            style = Qt.DotLine
+        else:
+            style = Qt.SolidLine
+        self._pen = shape_pen(color, pen_width, style)
 
         line_path = QPainterPath()
         vrtx_path = QPainterPath()
 
-        line_path.moveTo(self.points[0])
+        c = self.coords
+        line_path.moveTo(c[0], c[1])
         # Uncommenting the following line will draw 2 paths
         # for the 1st vertex, and make it non-filled, which
         # may be desirable.
         #self.drawVertex(vrtx_path, 0)
 
-        for i, p in enumerate(self.points):
-            line_path.lineTo(p)
+        for i in range(len(self)):
+            line_path.lineTo(c[2 * i], c[2 * i + 1])
             self.drawVertex(vrtx_path, i)
         if self.is_closed():
-            line_path.lineTo(self.points[0])
-
-        painter.drawPath(line_path)
-        painter.drawPath(vrtx_path)
-        painter.fillPath(vrtx_path, self.vertex_fill_color)
-
-        # Draw text at the top-left
-        if self.paintLabel:
-            min_x = sys.maxsize
-            min_y = sys.maxsize
-            for point in self.points:
-                min_x = min(min_x, point.x())
-                min_y = min(min_y, point.y())
-            if min_x != sys.maxsize and min_y != sys.maxsize:
-                font = QFont()
-                font.setPointSize(font_size)
-                font.setBold(True)
-                painter.setFont(font)
-                if min_y < MIN_Y_LABEL:
-                    min_y += MIN_Y_LABEL
-                painter.drawText(min_x, min_y - (pen_width * 2 / 3),
-                                 '#%s: %s' % (self.track_id, self.category))
-
-        if self.fill:
-            color = self.select_fill_color if self.selected else self.fill_color
-            painter.fillPath(line_path, color)
+            line_path.lineTo(c[0], c[1])
+        self._line_path = line_path
+        self._vrtx_path = vrtx_path
+
+        # Text goes at the top-left of the points
+        min_x = line_path.boundingRect().x()
+        min_y = line_path.boundingRect().y()
+        if min_y < MIN_Y_LABEL:
+            min_y += MIN_Y_LABEL
+        self._label_pos = QPointF(min_x, min_y - (pen_width * 2 / 3))
+
+        rect = line_path.boundingRect().united(vrtx_path.boundingRect())
+        self._paint_rect = rect.adjusted(-pen_width, -pen_width, pen_width, pen_width)
+
+    def paintRect(self, line_thickness=DEFAULT_LINE_THICKNESS, font_size=DEFAULT_FONT_SIZE):
+        """Area covered by `paint`, in image coordinates."""
+        if not self.coords:
+            return QRectF()
+        self.updateCache(line_thickness, font_size)
+        if not self.paintLabel:
+            return self._paint_rect
+        metrics = label_metrics(font_size)
+        label_rect = metrics.boundingRect(self.labelText()).translated(self._label_pos)
+        return self._paint_rect.united(label_rect)
 
     def drawVertex(self, path, i):
         d = self.point_size / self.scale
         shape = self.point_type
-        point = self.points[i]
+        x, y = self.coords[2 * i], self.coords[2 * i + 1]
         if i == self._highlightIndex:
             size, shape = self._highlightSettings[self._highlightMode]
             d *= size
-        if self._highlightIndex is not None:
-            self.vertex_fill_color = self.hvertex_fill_color
-        else:
-            self.vertex_fill_color = Shape.vertex_fill_color
         if shape == self.P_SQUARE:
-            path.addRect(point.x() - d / 2, point.y() - d / 2, d, d)
+            path.addRect(x - d / 2, y - d / 2, d, d)
         elif shape == self.P_ROUND:
-            path.addEllipse(point, d / 2.0, d / 2.0)
+            path.addEllipse(QPointF(x, y), d / 2.0, d / 2.0)
         else:
             assert False, "unsupported vertex shape"
 
     def nearestVertex(self, point, epsilon):
-        for i, p in enumerate(self.points):
-            if distance(p - point) <= epsilon:
+        c = self.coords
+        px, py = point.x(), point.y()
+        for i in range(len(self)):
+            if hypot(c[2 * i] - px, c[2 * i + 1] - py) <= epsilon:
                 return i
         return None
 
@@ -149,19 +282,31 @@ class Shape:
         return self.makePath().contains(point)
 
     def makePath(self):
-        path = QPainterPath(self.points[0])
-        for p in self.points[1:]:
-            path.lineTo(p)
+        c = self.coords
+        path = QPainterPath(QPointF(c[0], c[1]))
+        for i in range(2, len(c), 2):
+            path.lineTo(c[i], c[i + 1])
         return path
 
     def boundingRect(self):
         return self.makePath().boundingRect()
 
+    def bounds(self):
+        """(x1, y1, x2, y2) of the points."""
+        xs = self.coords[0::2]
+        ys = self.coords[1::2]
+        return min(xs), min(ys), max(xs), max(ys)
+
     def moveBy(self, offset):
-        self.points = [p + offset for p in self.points]
+        dx, dy = offset.x(), offset.y()
+        c = self.coords
+        for i in range(0, len(c), 2):
+            c[i] += dx
+            c[i + 1] += dy
 
     def moveVertexBy(self, i, offset):
-        self.points[i] = self.points[i] + offset
+        self.coords[2 * i] += offset.x()
+        self.coords[2 * i + 1] += offset.y()
 
     def highlightVertex(self, i, action):
         self._highlightIndex = i
@@ -172,22 +317,31 @@ class Shape:
 
     def copy(self):
         shape = Shape(category=self.category)
-        shape.points = [p for p in self.points]
+        shape.coords = array('d', self.coords)
         shape.fill = self.fill
         shape.selected = self.selected
         shape._closed = self._closed
-        if self.line_color != Shape.line_color:
-            shape.line_color = self.line_color
-        if self.fill_color != Shape.fill_color:
-            shape.fill_color = self.fill_color
+        shape._line_color = self._line_color
+        shape._fill_color = self._fill_color
         shape.difficult = self.difficult
+        shape.confirmed = self.confirmed
+        shape.interpolated = self.interpolated
         return shape
 
     def __len__(self):
-        return len(self.points)
+        return len(self.coords) // 2
 
     def __getitem__(self, key):
-        return self.points[key]
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            raise IndexError(key)
+        return QPointF(self.coords[2 * key], self.coords[2 * key + 1])
 
     def __setitem__(self, key, value):
-        self.points[key] = value
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            raise IndexError(key)
+        self.coords[2 * key] = value.x()
+        self.coords[2 * key + 1] = value.y()
@@ -0,0 +1,123 @@
+import numpy as np
+
+from PyQt5.QtGui import *
+from PyQt5.QtCore import *
+from PyQt5.QtWidgets import *
+
+from libs.utils import generate_color_by_text
+
+LABEL_WIDTH = 56
+ROW_HEIGHT = 12
+GAP_COLOR = QColor(220, 30, 30)
+CURRENT_FRAME_COLOR = QColor(4, 110, 229)
+
+
+class TrackTimeline(QWidget):
+    """Tracks of a video as bars across its frames, with the frames missing
+    inside each track in red.
+
+    The bars are one image with a pixel per run of frames, made from the
+    track presence array and only remade when the presence or the width
+    change; the paint events just scale it. Clicking opens a frame.
+    """
+    frame_clicked = pyqtSignal(int)
+
+    def __init__(self, parent=None):
+        super(TrackTimeline, self).__init__(parent)
+        self.presence = None
+        self.position = None
+        # Presence rows of the tracks with boxes, top to bottom
+        self.rows = np.zeros(0, dtype=int)
+        self.image = None
+        self.image_key = None
+        self.setMouseTracking(True)
+        self.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Minimum)
+
+    def setPresence(self, presence, position=None):
+        self.presence = presence
+        self.position = position
+        self.refresh()
+
+    def setPosition(self, position):
+        self.position = position
+        self.update()
+
+    def refresh(self):
+        """Pick up the changes of the presence array."""
+        if self.presence is None:
+            self.rows = np.zeros(0, dtype=int)
+        else:
+            self.rows = np.flatnonzero(self.presence.presence.any(axis=1))
+        self.setMinimumHeight(len(self.rows) * ROW_HEIGHT)
+        self.update()
+
+    def barWidth(self):
+        return max(1, self.width() - LABEL_WIDTH)
+
+    def timelineImage(self):
+        key = (id(self.presence), self.presence.version, self.barWidth())
+        if key == self.image_key:
+            return self.image
+        present, gaps = self.presence.bins(self.barWidth())
+        present, gaps = present[self.rows], gaps[self.rows]
+        colors = np.array([self.trackColor(self.presence.track_ids[row]) for row in self.rows], dtype=np.uint32)
+        pixels = np.zeros(present.shape, dtype=np.uint32)
+        pixels[:] = self.palette().color(QPalette.Base).rgba()
+        pixels[present] = np.broadcast_to(colors[:, None], present.shape)[present]
+        pixels[gaps] = GAP_COLOR.rgba()
+        height, width = pixels.shape
+        # The image must not outlive the array it points to
+        self.image = QImage(pixels.data, width, height, width * 4, QImage.Format_ARGB32).copy()
+        self.image_key = key
+        return self.image
+
+    @staticmethod
+    def trackColor(track_id):
+        color = generate_color_by_text(track_id)
+        return QColor(color.red(), color.green(), color.blue()).rgba()
+
+    def positionAt(self, x):
+        frame_count = self.presence.frame_count
+        return min(frame_count - 1, max(0, (x - LABEL_WIDTH) * frame_count // self.barWidth()))
+
+    def paintEvent(self, event):
+        p = QPainter(self)
+        p.fillRect(event.rect(), self.palette().color(QPalette.Base))
+        if self.presence is None or not len(self.rows) or not self.presence.frame_count:
+            p.end()
+            return
+
+        bars = QRect(LABEL_WIDTH, 0, self.barWidth(), len(self.rows) * ROW_HEIGHT)
+        p.drawImage(bars, self.timelineImage())
+
+        first = max(0, event.rect().top() // ROW_HEIGHT)
+        last = min(len(self.rows) - 1, event.rect().bottom() // ROW_HEIGHT)
+        p.setPen(self.palette().color(QPalette.Text))
+        for i in range(first, last + 1):
+            p.drawText(QRect(0, i * ROW_HEIGHT, LABEL_WIDTH - 4, ROW_HEIGHT), Qt.AlignRight | Qt.AlignVCenter,
+                       self.presence.track_ids[self.rows[i]])
+
+        if self.position is not None:
+            x = LABEL_WIDTH + (2 * self.position + 1) * self.barWidth() // (2 * self.presence.frame_count)
+            p.setPen(QPen(CURRENT_FRAME_COLOR, 1))
+            p.drawLine(x, 0, x, bars.bottom())
+        p.end()
+
+    def mousePressEvent(self, event):
+        if event.button() != Qt.LeftButton or self.presence is None or not self.presence.frame_count:
+            return
+        if event.pos().x() >= LABEL_WIDTH:
+            self.frame_clicked.emit(self.positionAt(event.pos().x()))
+
+    def mouseMoveEvent(self, event):
+        if self.presence is None or not self.presence.frame_count or event.pos().x() < LABEL_WIDTH:
+            return
+        i = event.pos().y() // ROW_HEIGHT
+        if not 0 <= i < len(self.rows):
+            return
+        position = self.positionAt(event.pos().x())
+        row = self.rows[i]
+        state = 'box' if self.presence.presence[row, position] else \
+            'gap' if self.presence.gaps()[row, position] else 'no box'
+        QToolTip.showText(event.globalPos(), 'Track %s, frame %d: %s' %
+                          (self.presence.track_ids[row], position + 1, state), self)
@@ -0,0 +1,243 @@
+import os
+
+from PyQt5.QtGui import *
+from PyQt5.QtCore import *
+from PyQt5.QtWidgets import *
+
+# Frames of a video are handed to the view by chunks of this size
+FETCH_SIZE = 256
+
+
+class VideoNode(object):
+    __slots__ = ('video_id', 'row', 'fetched', 'gt_paths')
+
+    def __init__(self, video_id, row):
+        self.video_id = video_id
+        self.row = row
+        # Frames already exposed to the views
+        self.fetched = 0
+        # Frames with ground truth, None until counted; then kept up to date as frames change
+        self.gt_paths = None
+
+
+class VideoTreeModel(QAbstractItemModel):
+    """The file list grouped by video.
+
+    Frames are the rows of the file list model, found through the video
+    index; they are exposed to the views by chunks as videos are expanded
+    and scrolled, so only the videos being browsed cost anything. Each
+    video shows how many of its frames have ground truth.
+    """
+
+    def __init__(self, file_list_model, video_index, path_of, row_of, parent=None):
+        super(VideoTreeModel, self).__init__(parent)
+        self.file_list_model = file_list_model
+        self.video_index = video_index
+        self.path_of_row = path_of
+        self.row_of = row_of
+        self.nodes = []
+        self.nodes_by_id = {}
+        self.header_labels = ['Video / frame', 'Has GT']
+        file_list_model.modelReset.connect(self.reset_videos)
+        file_list_model.rowsInserted.connect(self.on_rows_inserted)
+        file_list_model.dataChanged.connect(self.on_data_changed)
+
+    def reset_videos(self):
+        self.beginResetModel()
+        self.nodes = []
+        self.nodes_by_id = {}
+        for video_id in self.video_index.frames:
+            self.add_node(video_id)
+        self.endResetModel()
+
+    def add_node(self, video_id):
+        node = self.nodes_by_id[video_id] = VideoNode(video_id, len(self.nodes))
+        self.nodes.append(node)
+        return node
+
+    def frame_count(self, node):
+        return len(self.video_index.frame_paths(node.video_id))
+
+    def frame_row(self, node, position):
+        """Row of a frame in the file list model."""
+        return self.row_of(self.video_index.frame_paths(node.video_id)[position])
+
+    def has_gt_count(self, node):
+        if node.gt_paths is None:
+            table_data = self.file_list_model.table_data
+            node.gt_paths = set(path for path in self.video_index.frame_paths(node.video_id)
+                                if table_data[self.row_of(path)]['has_gt'])
+        return len(node.gt_paths)
+
+    def update_gt(self, node, row):
+        """Follow the has_gt of a file list row; True when the count changed."""
+        if node.gt_paths is None:
+            return False
+        path = self.path_of_row(row)
+        if self.file_list_model.table_data[row]['has_gt']:
+            if path in node.gt_paths:
+                return False
+            node.gt_paths.add(path)
+        else:
+            if path not in node.gt_paths:
+                return False
+            node.gt_paths.discard(path)
+        return True
+
+    def index_of_path(self, path):
+        """Index of a frame, fetching the frames of its video up to it."""
+        position = self.video_index.position(path)
+        if position is None or position[0] not in self.nodes_by_id:
+            return QModelIndex()
+        node = self.nodes_by_id[position[0]]
+        if position[1] >= node.fetched:
+            parent = self.createIndex(node.row, 0, None)
+            while position[1] >= node.fetched:
+                self.fetchMore(parent)
+        return self.createIndex(position[1], 0, node)
+
+    def node_of(self, index):
+        """The video node of a frame index, None for a video index."""
+        return index.internalPointer()
+
+    def path_of(self, index):
+        """Frame path of a frame index, or the first frame of a video."""
+        node = self.node_of(index)
+        if node is None:
+            paths = self.video_index.frame_paths(self.nodes[index.row()].video_id)
+            return paths[0] if paths else None
+        return self.video_index.frame_paths(node.video_id)[index.row()]
+
+    # region Model
+
+    def index(self, row, column, parent=QModelIndex()):
+        if not parent.isValid():
+            if 0 <= row < len(self.nodes):
+                return self.createIndex(row, column, None)
+            return QModelIndex()
+        if self.node_of(parent) is not None:
+            return QModelIndex()
+        node = self.nodes[parent.row()]
+        if 0 <= row < node.fetched:
+            return self.createIndex(row, column, node)
+        return QModelIndex()
+
+    def parent(self, index):
+        if not index.isValid():
+            return QModelIndex()
+        node = self.node_of(index)
+        if node is None:
+            return QModelIndex()
+        return self.createIndex(node.row, 0, None)
+
+    def rowCount(self, parent=QModelIndex()):
+        if not parent.isValid():
+            return len(self.nodes)
+        if parent.column() > 0 or self.node_of(parent) is not None:
+            return 0
+        return self.nodes[parent.row()].fetched
+
+    def columnCount(self, parent=QModelIndex()):
+        return len(self.header_labels)
+
+    def hasChildren(self, parent=QModelIndex()):
+        if not parent.isValid():
+            return len(self.nodes) > 0
+        if parent.column() > 0 or self.node_of(parent) is not None:
+            return False
+        return self.frame_count(self.nodes[parent.row()]) > 0
+
+    def canFetchMore(self, parent):
+        if not parent.isValid() or self.node_of(parent) is not None:
+            return False
+        node = self.nodes[parent.row()]
+        return node.fetched < self.frame_count(node)
+
+    def fetchMore(self, parent):
+        if not self.canFetchMore(parent):
+            return
+        node = self.nodes[parent.row()]
+        count = min(FETCH_SIZE, self.frame_count(node) - node.fetched)
+        self.beginInsertRows(parent, node.fetched, node.fetched + count - 1)
+        node.fetched += count
+        self.endInsertRows()
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.header_labels[section]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        node = self.node_of(index)
+        column = index.column()
+        if node is None:
+            node = self.nodes[index.row()]
+            if role == Qt.DisplayRole:
+                if column == 0:
+                    name = self.video_index.name(node.video_id)
+                    return name if name is not None else str(node.video_id)
+                return '%d / %d' % (self.has_gt_count(node), self.frame_count(node))
+            return None
+
+        data_row = self.file_list_model.table_data[self.frame_row(node, index.row())]
+        if role == Qt.DisplayRole and column == 0:
+            return os.path.basename(data_row['file_name'])
+        if role == Qt.CheckStateRole and column == 1:
+            return Qt.Checked if data_row['has_gt'] else Qt.Unchecked
+        if role == Qt.ForegroundRole and data_row['missing']:
+            return QColor(Qt.red)
+        return None
+
+    def setData(self, index, value, role=Qt.EditRole):
+        node = self.node_of(index)
+        if node is None or role != Qt.CheckStateRole or index.column() != 1:
+            return False
+        # The file list model owns the frames; its dataChanged updates this model
+        source = self.file_list_model.index(self.frame_row(node, index.row()), 1)
+        return self.file_list_model.setData(source, value, role)
+
+    def flags(self, index):
+        flags = super(VideoTreeModel, self).flags(index)
+        if index.isValid() and index.column() == 1 and self.node_of(index) is not None:
+            flags |= Qt.ItemIsUserCheckable
+        return flags
+
+    # endregion
+
+    # region File List Model Events
+
+    def on_rows_inserted(self, parent, first, last):
+        new_videos = []
+        for row in range(first, last + 1):
+            video_id = self.video_of_row(row)
+            if video_id not in self.nodes_by_id and video_id not in new_videos:
+                new_videos.append(video_id)
+            elif video_id in self.nodes_by_id:
+                self.update_gt(self.nodes_by_id[video_id], row)
+        if new_videos:
+            self.beginInsertRows(QModelIndex(), len(self.nodes), len(self.nodes) + len(new_videos) - 1)
+            for video_id in new_videos:
+                self.add_node(video_id)
+            self.endInsertRows()
+
+    def on_data_changed(self, top_left, bottom_right):
+        changed_nodes = set()
+        for row in range(top_left.row(), bottom_right.row() + 1):
+            node = self.nodes_by_id.get(self.video_of_row(row))
+            if node is None:
+                continue
+            if self.update_gt(node, row):
+                changed_nodes.add(node)
+            position = self.video_index.position(self.path_of_row(row))[1]
+            if position < node.fetched:
+                self.dataChanged.emit(self.createIndex(position, 0, node), self.createIndex(position, 1, node))
+        for node in changed_nodes:
+            video = self.createIndex(node.row, 1, None)
+            self.dataChanged.emit(video, video)
+
+    def video_of_row(self, row):
+        return self.video_index.position(self.path_of_row(row))[0]
+
+    # endregion